@@ -0,0 +1,287 @@
+"""Sérialisation rapide, en lecture seule, des listes chaudes de l'API.
+
+Un serializer DRF refait à chaque objet le même travail : parcours des champs,
+résolution des sources, appels de to_representation, dictionnaires ordonnés.
+`plan_for(SerializerClass)` analyse une fois les champs d'un serializer et les
+compile en une liste d'accès directs aux attributs (date ISO, URL de fichier, id
+d'une clé étrangère, serializer imbriqué compilé à son tour...). Le résultat est
+encodé par orjson s'il est installé.
+
+La sortie est identique, octet pour octet, à celle du serializer rendu par le
+JSONRenderer de DRF :
+- les champs non reconnus passent par leur propre to_representation ;
+- les SerializerMethodField appellent la méthode du serializer, sauf si celui-ci
+  définit `fast_<champ>(obj, dump)`, qui peut produire le même résultat en
+  compilant ses serializers imbriqués ;
+- `prepare(objets)` du list_serializer_class est appelé une fois par liste
+  (chargement par lots de l'état du visiteur, compteurs...).
+
+`manage.py benchmark_serializers` compare le coût par objet des deux chemins.
+
+`FastReadMixin.stream_response` exporte tout un queryset en un tableau JSON
+envoyé au fil de l'eau, lu par lots de API_EXPORT_CHUNK_SIZE objets en keyset.
+Sous ASGI (daphne), le flux est un itérateur asynchrone : Django lirait
+d'abord en entier un générateur synchrone avant d'envoyer le premier octet.
+"""
+import json
+from contextlib import nullcontext
+from operator import attrgetter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from rest_framework import fields as drf_fields, relations, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from apps.social.routers import read_replica, replica_requested
+from .pagination import CursorPaginator
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson est optionnel
+    orjson = None
+
+EXPORT_CHUNK_SIZE = getattr(settings, 'API_EXPORT_CHUNK_SIZE', 500)
+
+_plans = {}
+
+
+def dumps(data):
+    """Encoder comme le JSONRenderer de DRF (compact, UTF-8, U+2028/U+2029 échappés)"""
+    if orjson is not None:
+        content = orjson.dumps(data)
+    else:
+        content = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode()
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+    return content
+
+
+class _Dump:
+    """État d'un rendu : contexte et instances de serializers pour les méthodes"""
+
+    def __init__(self, context):
+        self.context = context
+        self.request = context.get('request')
+        self.timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        self.serializers = {}
+
+    def serializer(self, serializer_class):
+        if serializer_class not in self.serializers:
+            self.serializers[serializer_class] = serializer_class(context=self.context)
+        return self.serializers[serializer_class]
+
+    def dump(self, serializer_class, objects):
+        """Rendu d'une liste par un serializer imbriqué (utilisable par `fast_<champ>`)"""
+        return plan_for(serializer_class).rows(objects, self)
+
+
+def _datetime(value, dump):
+    if not value:
+        return None
+    if dump.timezone is not None:
+        value = value.astimezone(dump.timezone) if timezone.is_aware(value) else timezone.make_aware(value, dump.timezone)
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def _file(value, dump):
+    if not value:
+        return None
+    try:
+        url = value.url
+    except AttributeError:
+        return None
+    return dump.request.build_absolute_uri(url) if dump.request is not None else url
+
+
+def _converter(field):
+    """Conversion d'une valeur non nulle, ou None si le champ n'est pas reconnu"""
+    kind = type(field)
+    if kind is drf_fields.DateTimeField and getattr(field, 'format', api_settings.DATETIME_FORMAT) == drf_fields.ISO_8601 \
+            and not hasattr(field, 'timezone'):
+        return _datetime
+    if kind in (drf_fields.FileField, drf_fields.ImageField) and getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+        return _file
+    if kind is drf_fields.IntegerField:
+        return lambda value, dump: int(value)
+    if kind in (drf_fields.CharField, drf_fields.EmailField, drf_fields.URLField):
+        return lambda value, dump: str(value)
+    if kind is drf_fields.BooleanField:
+        return lambda value, dump: bool(value)
+    if kind is drf_fields.ChoiceField:
+        choices = field.choice_strings_to_values
+        return lambda value, dump: value if value == '' else choices.get(str(value), value)
+    if kind is drf_fields.DateField and getattr(field, 'format', api_settings.DATE_FORMAT) == drf_fields.ISO_8601:
+        return lambda value, dump: value.isoformat()
+    if kind is drf_fields.ReadOnlyField:
+        return lambda value, dump: value
+    return None
+
+
+class ReadPlan:
+    """Champs d'un serializer compilés en accès directs"""
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.list_serializer_class = getattr(serializer_class.Meta, 'list_serializer_class', None)
+        serializer = serializer_class()
+        self.accessors = [(field.field_name, self._compile(serializer, field)) for field in serializer._readable_fields]
+
+    def _compile(self, serializer, field):
+        name = field.field_name
+        if isinstance(field, drf_fields.SerializerMethodField):
+            fast = getattr(self.serializer_class, f'fast_{name}', None)
+            if fast is not None:
+                return lambda obj, dump: fast(dump.serializer(self.serializer_class), obj, dump.dump)
+            method = field.method_name
+            return lambda obj, dump: getattr(dump.serializer(self.serializer_class), method)(obj)
+
+        if field.source == '*' or len(field.source_attrs) != 1:
+            return self._fallback(name)
+        source = field.source_attrs[0]
+
+        if isinstance(field, relations.PrimaryKeyRelatedField) and field.use_pk_only_optimization():
+            # Id lu sur la colonne de la clé étrangère, sans charger l'objet
+            get_id = attrgetter(serializer.Meta.model._meta.get_field(source).attname)
+            return lambda obj, dump: get_id(obj)
+
+        if isinstance(field, serializers.BaseSerializer) and not isinstance(field, serializers.ListSerializer):
+            nested = plan_for(type(field))
+            get = attrgetter(source)
+
+            def accessor(obj, dump):
+                value = get(obj)
+                return None if value is None else nested.row(value, dump)
+            return accessor
+
+        convert = _converter(field)
+        if convert is None:
+            return self._fallback(name)
+        get = attrgetter(source)
+
+        def accessor(obj, dump):
+            value = get(obj)
+            return None if value is None else convert(value, dump)
+        return accessor
+
+    def _fallback(self, name):
+        # Champ non reconnu : le champ du serializer (lié au contexte du rendu) fait le travail
+        def accessor(obj, dump):
+            field = dump.serializer(self.serializer_class).fields[name]
+            attribute = field.get_attribute(obj)
+            if (attribute.pk if isinstance(attribute, relations.PKOnlyObject) else attribute) is None:
+                return None
+            return field.to_representation(attribute)
+        return accessor
+
+    def row(self, obj, dump):
+        try:
+            return {name: accessor(obj, dump) for name, accessor in self.accessors}
+        except (AttributeError, KeyError):
+            # Relation absente (profil manquant...) : DRF omet alors le champ
+            return dump.serializer(self.serializer_class).to_representation(obj)
+
+    def rows(self, objects, dump):
+        objects = list(objects)
+        if self.list_serializer_class is not None and hasattr(self.list_serializer_class, 'prepare'):
+            self.serializer_class(many=True, context=dump.context).prepare(objects)
+        return [self.row(obj, dump) for obj in objects]
+
+    def dump_many(self, objects, context):
+        return self.rows(objects, _Dump(context))
+
+    def dump_one(self, obj, context):
+        return self.row(obj, _Dump(context))
+
+
+def plan_for(serializer_class):
+    plan = _plans.get(serializer_class)
+    if plan is None:
+        plan = _plans[serializer_class] = ReadPlan(serializer_class)
+    return plan
+
+
+class FastReadMixin:
+    """Réponses de liste rendues par le plan compilé quand le client attend du JSON.
+
+    Le navigateur de l'API, `?fields=` / `?expand=` et une indentation demandée
+    passent par le serializer DRF habituel.
+    """
+
+    def use_fast_read(self):
+        request = self.request
+        return (
+            isinstance(getattr(request, 'accepted_renderer', None), JSONRenderer)
+            and 'indent' not in request.accepted_media_type
+            and self.all_fields_requested()
+        )
+
+    def all_fields_requested(self):
+        params = self.request.query_params
+        return 'fields' not in params and 'expand' not in params
+
+    def wants_export(self):
+        return self.request.query_params.get('export') in ('1', 'true')
+
+    def list_response(self, objects, serializer_class=None, paginated=True):
+        serializer_class = serializer_class or self.get_serializer_class()
+        context = self.get_serializer_context()
+        if not self.use_fast_read():
+            data = serializer_class(objects, many=True, context=context).data
+            return self.get_paginated_response(data) if paginated else Response(data)
+
+        data = plan_for(serializer_class).dump_many(objects, context)
+        if paginated:
+            data = self.get_paginated_response(data).data
+        response = HttpResponse(dumps(data), content_type=JSONRenderer.media_type)
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def stream_response(self, queryset, serializer_class=None, filename=None):
+        """Tout le queryset en un tableau JSON envoyé par lots (exports)"""
+        serializer_class = serializer_class or self.get_serializer_class()
+        context = self.get_serializer_context()
+        if self.all_fields_requested():
+            dump = _Dump(context)
+            render = lambda objects: plan_for(serializer_class).rows(objects, dump)
+        else:
+            render = lambda objects: serializer_class(objects, many=True, context=context).data
+
+        chunks = _stream(CursorPaginator(queryset, EXPORT_CHUNK_SIZE), render, replica_requested())
+        if isinstance(self.request._request, ASGIRequest):
+            chunks = _astream(chunks)
+        response = StreamingHttpResponse(chunks, content_type=JSONRenderer.media_type)
+        if filename:
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+def _stream(paginator, render, use_replica):
+    # Le flux est lu après la vue : la lecture sur la réplique est rétablie à chaque lot
+    pages = paginator.pages()
+    separator = b''
+    yield b'['
+    while True:
+        with read_replica() if use_replica else nullcontext():
+            page = next(pages, None)
+            rows = render(page.object_list) if page is not None else None
+        if page is None:
+            break
+        if rows:
+            yield separator + b','.join(dumps(row) for row in rows)
+            separator = b','
+    yield b']'
+
+
+async def _astream(chunks):
+    # Chaque lot est lu par sync_to_async dans le thread des vues (connexion et
+    # routage vers la réplique inchangés), puis envoyé avant de lire le suivant
+    read = sync_to_async(next)
+    while (chunk := await read(chunks, None)) is not None:
+        yield chunk
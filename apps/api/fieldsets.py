@@ -0,0 +1,145 @@
+"""Champs partiels (`?fields=`) et relations développées (`?expand=`) dans l'API.
+
+- `?fields=id,content,author.username` limite la réponse à ces champs ; la
+  notation pointée s'applique aux objets imbriqués, un objet cité seul est
+  rendu en entier.
+- `?expand=author,sender` ne développe que les relations citées : les
+  autres relations développables (`Meta.expandable_fields` des serializers)
+  sont rendues par leur id. `?expand=` vide les réduit toutes à leur id.
+
+Sans ces paramètres la réponse est inchangée. Les vues (SparseFieldsViewMixin)
+ne joignent que les relations effectivement développées (`related_fields`), et
+les champs calculés non demandés ne sont pas évalués.
+"""
+from rest_framework import serializers
+
+
+def _parse_fields(value):
+    """'id,author.username' -> {'id': {}, 'author': {'username': {}}} ({} : tous les champs)"""
+    tree = {}
+    for item in value.split(','):
+        node = tree
+        for part in filter(None, (part.strip() for part in item.split('.'))):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _parse_expand(value):
+    """'author.profile' développe aussi 'author'"""
+    paths = set()
+    for item in filter(None, (item.strip() for item in value.split(','))):
+        parts = item.split('.')
+        paths.update('.'.join(parts[:i]) for i in range(1, len(parts) + 1))
+    return paths
+
+
+class FieldSelection:
+    """Champs demandés et relations développées pour une requête"""
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields  # Arbre des champs demandés, None : tous
+        self.expand = expand  # Chemins développés, None : tous
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params if request is not None else {}
+        fields = params.get('fields')
+        expand = params.get('expand')
+        return cls(
+            _parse_fields(fields) if fields else None,
+            _parse_expand(expand) if expand is not None else None,
+        )
+
+    def _node(self, path):
+        node = self.fields
+        for part in filter(None, path.split('.')):
+            if not node:
+                return {}
+            if part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def wants(self, path):
+        """Le champ au chemin `path` (ex. 'author.profile') figure dans la réponse"""
+        return self.fields is None or self._node(path) is not None
+
+    def subfields(self, path):
+        """Noms des champs demandés sous `path` (None : tous)"""
+        if self.fields is None:
+            return None
+        return set(self._node(path) or ()) or None
+
+    def expands(self, path):
+        """La relation au chemin `path` est rendue comme objet imbriqué"""
+        if not self.wants(path):
+            return False
+        return self.expand is None or path in self.expand
+
+    def related_lookups(self, related_fields):
+        """Chemins select_related utiles : `related_fields` associe une relation
+        développable ('' : l'objet lui-même) à ses chemins select_related.
+        """
+        lookups = []
+        for relation, paths in related_fields.items():
+            if relation and not self.expands(relation):
+                continue
+            lookups.extend(lookup for lookup in paths if self.wants(lookup.replace('__', '.')))
+        return lookups
+
+
+class SparseFieldsMixin:
+    """Serializer filtré par la FieldSelection du contexte (`field_selection`).
+
+    Le chemin d'un serializer imbriqué est celui de ses champs parents, précédé de
+    `field_prefix` du contexte pour les serializers construits dans un
+    SerializerMethodField.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self.context.get('field_selection')
+        if selection is None:
+            return fields
+
+        path = self.field_path()
+        allowed = selection.subfields(path)
+        if allowed is not None:
+            fields = {name: field for name, field in fields.items() if name in allowed}
+        for name in getattr(self.Meta, 'expandable_fields', ()):
+            if name in fields and not selection.expands(f'{path}.{name}' if path else name):
+                source = fields[name].source
+                extra = {'source': source} if source and source != name else {}
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, **extra)
+        return fields
+
+    def field_path(self):
+        names = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        prefix = self.context.get('field_prefix')
+        return '.'.join(([prefix] if prefix else []) + names[::-1])
+
+
+class SparseFieldsViewMixin:
+    """Vue qui transmet la FieldSelection de la requête à ses serializers"""
+    # Relation développable -> chemins select_related (voir FieldSelection.related_lookups)
+    related_fields = {}
+
+    def get_field_selection(self):
+        if not hasattr(self, '_field_selection'):
+            self._field_selection = FieldSelection.from_request(getattr(self, 'request', None))
+        return self._field_selection
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['field_selection'] = self.get_field_selection()
+        return context
+
+    def select_related_fields(self, queryset, related_fields=None):
+        """Joindre uniquement les relations développées dans la réponse"""
+        lookups = self.get_field_selection().related_lookups(related_fields or self.related_fields)
+        return queryset.select_related(*lookups) if lookups else queryset
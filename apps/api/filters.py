@@ -0,0 +1,25 @@
+from rest_framework import filters
+
+from apps.social import search
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """SearchFilter appuyé sur l'index plein texte (résultats triés par pertinence)"""
+
+    def filter_queryset(self, request, queryset, view):
+        if queryset.model._meta.label_lower not in search.INDEXES:
+            return super().filter_queryset(request, queryset, view)
+
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return search.ranked(queryset, ' '.join(terms))
+
+
+class SearchAwareOrderingFilter(filters.OrderingFilter):
+    """OrderingFilter qui garde l'ordre de pertinence d'une recherche, sauf `?ordering=` explicite"""
+
+    def get_default_ordering(self, view):
+        if view.request.query_params.get(FullTextSearchFilter.search_param):
+            return None
+        return super().get_default_ordering(view)
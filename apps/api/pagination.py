@@ -0,0 +1,225 @@
+"""Pagination par curseur (keyset) sur (created_at, id).
+
+Chaque page est une simple plage d'index à partir de la dernière clé vue :
+pas de COUNT(*) ni d'OFFSET, la page N coûte autant que la première.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+DEFAULT_ORDERING = ('-created_at', '-id')
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _json_default(value):
+    # isoformat() complet : DjangoJSONEncoder tronque les microsecondes
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(values, reverse=False):
+    payload = json.dumps({'v': values, 'r': int(reverse)}, default=_json_default)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return payload['v'], bool(payload['r'])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+
+
+def _get_value(row, field):
+    """Lire un champ (éventuellement 'a__b') sur une instance ou un dict de values()"""
+    if isinstance(row, dict):
+        return row[field]
+    return reduce(getattr, field.split('__'), row)
+
+
+def _keyset_filter(ordering, values, reverse):
+    """Condition "strictement après la clé" pour un tri lexicographique"""
+    clauses = []
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        descending = field.startswith('-') != reverse
+        clause = Q(**{f'{name}__{"lt" if descending else "gt"}': values[i]})
+        for previous, value in zip(ordering[:i], values):
+            clause &= Q(**{previous.lstrip('-'): value})
+        clauses.append(clause)
+
+    # Borne large sur le premier champ pour garder un parcours d'index
+    first = ordering[0].lstrip('-')
+    descending = ordering[0].startswith('-') != reverse
+    bound = Q(**{f'{first}__{"lte" if descending else "gte"}': values[0]})
+    return bound & reduce(or_, clauses)
+
+
+def _reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+class CursorPage:
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Paginateur keyset pour les vues HTML et l'API.
+
+    L'ordre est celui du queryset (ou du Meta.ordering), complété par l'id.
+    `queryset` peut aussi être une liste de querysets déjà triés selon un ordre
+    total (ex. fil matérialisé + auteurs lus à la volée) : chaque branche est lue
+    par plage puis fusionnée en Python.
+    """
+
+    def __init__(self, queryset, per_page, ordering=None):
+        self.querysets = list(queryset) if isinstance(queryset, (list, tuple)) else [queryset]
+        self.per_page = per_page
+        self.ordering = list(ordering or self.get_ordering())
+
+    def get_ordering(self):
+        queryset = self.querysets[0]
+        if len(self.querysets) > 1:
+            return queryset.query.order_by
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering or DEFAULT_ORDERING)
+        # Toujours terminer par la clé primaire pour un ordre total
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return ordering
+
+    def key(self, row):
+        return [_get_value(row, field.lstrip('-')) for field in self.ordering]
+
+    def page(self, cursor=None):
+        """Page à partir d'un curseur opaque ; lève InvalidCursor si illisible"""
+        values, reverse = decode_cursor(cursor) if cursor else (None, False)
+        if values is not None and len(values) != len(self.ordering):
+            raise InvalidCursor(cursor)
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        rows = []
+        for queryset in self.querysets:
+            if values is not None:
+                queryset = queryset.filter(_keyset_filter(self.ordering, values, reverse))
+            rows.extend(queryset.order_by(*ordering)[:self.per_page + 1])
+
+        if len(self.querysets) > 1:
+            rows = self._merge(rows, ordering)
+
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                next_cursor = encode_cursor(self.key(rows[-1]))
+            if (has_more and reverse) or (values is not None and not reverse):
+                previous_cursor = encode_cursor(self.key(rows[0]), reverse=True)
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+    def pages(self):
+        """Toutes les pages, de la première à la dernière (exports)"""
+        page = self.page()
+        yield page
+        while page.has_next():
+            page = self.page(page.next_cursor)
+            yield page
+
+    def get_page(self, cursor=None):
+        """Comme page(), mais retombe sur la première page si le curseur est invalide"""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+    def _merge(self, rows, ordering):
+        """Trier les lignes des différentes branches et supprimer les doublons"""
+        for field in reversed(ordering):
+            rows.sort(key=lambda row: _get_value(row, field.lstrip('-')), reverse=field.startswith('-'))
+        merged, seen = [], set()
+        for row in rows:
+            key = tuple(self.key(row))
+            if key not in seen:
+                seen.add(key)
+                merged.append(row)
+        return merged
+
+
+class KeysetPagination(BasePagination):
+    """Pagination DRF par curseur opaque, sans requête COUNT"""
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = CursorPaginator(queryset, self.page_size)
+        try:
+            self.page = paginator.page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound('Invalid cursor')
+        return list(self.page)
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self.get_link(self.page.next_cursor)
+
+    def get_previous_link(self):
+        return self.get_link(self.page.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.api.pagination import CursorPaginator
+from apps.posts.models import Post
+from apps.users.models import CustomUser
+
+
+class CursorPaginatorTiesTest(TestCase):
+    """Pages par curseur quand plusieurs lignes partagent le même created_at"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user(username='author', email='author@example.com', password='pw')
+        Post.objects.bulk_create([Post(author=author, content=f'post {i}') for i in range(11)])
+        # Trois groupes d'horodatages identiques, à cheval sur les limites de page
+        now = timezone.now()
+        ids = list(Post.objects.order_by('id').values_list('id', flat=True))
+        for i, post_id in enumerate(ids):
+            Post.objects.filter(id=post_id).update(created_at=now - timedelta(minutes=i // 4))
+        cls.expected = list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def walk(self, paginator):
+        seen, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            seen.extend(post.id for post in page)
+            if not page.has_next():
+                return seen, page
+            cursor = page.next_cursor
+
+    def test_forward_pages_have_no_gap_or_duplicate(self):
+        seen, _ = self.walk(CursorPaginator(Post.objects.order_by('-created_at'), 3))
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_cursor_returns_the_same_pages(self):
+        paginator = CursorPaginator(Post.objects.order_by('-created_at'), 3)
+        _, last = self.walk(paginator)
+        seen, page = [post.id for post in last], last
+        while page.has_previous():
+            page = paginator.page(page.previous_cursor)
+            seen[:0] = [post.id for post in page]
+        self.assertEqual(seen, self.expected)
+
+    def test_merged_branches_keep_a_total_order(self):
+        # Deux branches qui se recoupent (fil matérialisé + auteurs lus à la volée)
+        branches = [
+            Post.objects.filter(id__in=self.expected[::2]).values('id', 'created_at').order_by('-created_at', '-id'),
+            Post.objects.values('id', 'created_at').order_by('-created_at', '-id'),
+        ]
+        paginator = CursorPaginator(branches, 4)
+        seen, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            seen.extend(row['id'] for row in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, self.expected)
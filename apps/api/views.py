@@ -1,24 +1,47 @@
+from django.db import transaction
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.utils.urls import replace_query_param
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
 
 from apps.users.models import CustomUser, Profile
-from apps.users.serializers import UserSerializer, UserCreateSerializer
-from apps.posts.models import Post, Comment, Like
-from apps.posts.serializers import PostSerializer, CommentSerializer, LikeSerializer
+from apps.users.serializers import UserSerializer, UserCreateSerializer, prime_profiles
+from apps.posts.models import Post, Comment, CommentLike, PostLike
+from apps.posts.serializers import (
+    POST_RELATED_FIELDS, PostSerializer, CommentSerializer, post_list_queryset, prime_comments
+)
+from apps.posts.timeline import timeline_post_ids, hydrate_posts
+from apps.posts import tasks as post_tasks, threads, trending
+from .fast import FastReadMixin
+from .fieldsets import SparseFieldsViewMixin
+from .filters import FullTextSearchFilter, SearchAwareOrderingFilter
+from .pagination import InvalidCursor, KeysetPagination
 from apps.social.models import Follow, Notification
+from apps.social import counters, notifier, outbox, tasks as social_tasks
+from apps.social.routers import ReplicaReadMixin
 from apps.social.serializers import FollowSerializer, NotificationSerializer
 
+# Relations dans la réponse -> select_related (voir fieldsets.py)
+USER_RELATED_FIELDS = {'': ['profile']}
+FOLLOW_RELATED_FIELDS = {
+    'follower': ['follower', 'follower__profile'],
+    'following': ['following', 'following__profile'],
+}
 
-class UserViewSet(viewsets.ModelViewSet):
+
+class UserViewSet(ReplicaReadMixin, SparseFieldsViewMixin, FastReadMixin, viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = UserSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [FullTextSearchFilter, SearchAwareOrderingFilter]
     search_fields = ['username', 'email', 'bio']
     ordering_fields = ['date_joined', 'username']
+    related_fields = USER_RELATED_FIELDS
+
+    def get_queryset(self):
+        return self.select_related_fields(super().get_queryset())
 
     def get_permissions(self):
         if self.action == 'create':
@@ -30,182 +53,225 @@ class UserViewSet(viewsets.ModelViewSet):
             return UserCreateSerializer
         return UserSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        user = self.get_object()
+        prime_profiles([user])
+        return Response(self.get_serializer(user).data)
+
     @action(detail=False, methods=['get'])
     def me(self, request):
         """Obtenir les informations de l'utilisateur connecté"""
-        serializer = self.get_serializer(request.user)
+        user = self.get_queryset().get(pk=request.user.pk)
+        prime_profiles([user])
+        serializer = self.get_serializer(user)
         return Response(serializer.data)
 
-    @action(detail=True, methods=['get'])
+    def related_list(self, queryset, serializer_class):
+        """Page par curseur de `queryset`, ou export complet en flux avec `?export=1`"""
+        if self.wants_export():
+            return self.stream_response(queryset, serializer_class, f"user-{self.kwargs['pk']}-{self.action}.json")
+        return self.list_response(self.paginate_queryset(queryset), serializer_class)
+
+    @action(detail=True, methods=['get'], pagination_class=KeysetPagination)
     def posts(self, request, pk=None):
         """Obtenir les posts d'un utilisateur"""
         user = self.get_object()
-        posts = Post.objects.filter(author=user)
-        serializer = PostSerializer(posts, many=True, context={'request': request})
-        return Response(serializer.data)
+        posts = post_list_queryset(Post.objects.filter(author=user), self.get_field_selection())
+        return self.related_list(posts, PostSerializer)
 
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], pagination_class=KeysetPagination)
     def followers(self, request, pk=None):
         """Obtenir les abonnés d'un utilisateur"""
         user = self.get_object()
-        followers = Follow.objects.filter(following=user)
-        serializer = FollowSerializer(followers, many=True)
-        return Response(serializer.data)
+        followers = Follow.objects.filter(following=user).order_by('-created_at', '-id')
+        return self.related_list(self.select_related_fields(followers, FOLLOW_RELATED_FIELDS), FollowSerializer)
 
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], pagination_class=KeysetPagination)
     def following(self, request, pk=None):
         """Obtenir les abonnements d'un utilisateur"""
         user = self.get_object()
-        following = Follow.objects.filter(follower=user)
-        serializer = FollowSerializer(following, many=True)
-        return Response(serializer.data)
+        following = Follow.objects.filter(follower=user).order_by('-created_at', '-id')
+        return self.related_list(self.select_related_fields(following, FOLLOW_RELATED_FIELDS), FollowSerializer)
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ReplicaReadMixin, SparseFieldsViewMixin, FastReadMixin, viewsets.ModelViewSet):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, SearchAwareOrderingFilter]
     filterset_fields = ['post_type', 'author']
     search_fields = ['content']
     ordering_fields = ['created_at', 'likes_count', 'comments_count']
     ordering = ['-created_at']
+    related_fields = POST_RELATED_FIELDS
 
-    def perform_create(self, serializer):
-        post = serializer.save(author=self.request.user)
+    def get_queryset(self):
+        if self.action == 'list':
+            return post_list_queryset(super().get_queryset(), self.get_field_selection())
+        return self.select_related_fields(super().get_queryset())
+
+    def retrieve(self, request, *args, **kwargs):
+        post = self.get_object()
+        if self.get_field_selection().wants('comments'):
+            # Arbre des commentaires, borné en profondeur et par branche, en une requête
+            post.comment_tree = threads.post_tree(post)
+            prime_comments(post.comment_tree)
+        counters.apply_live_counts([post])
+        prime_profiles([post], 'author')
+        return Response(self.get_serializer(post).data)
 
+    def perform_create(self, serializer):
         # Déterminer le type de post
         if self.request.FILES.get('image'):
-            post.post_type = 'image'
+            post_type = 'image'
         elif self.request.FILES.get('video'):
-            post.post_type = 'video'
+            post_type = 'video'
         else:
-            post.post_type = 'text'
-        post.save()
+            post_type = 'text'
+
+        # Compteur de posts et fils mis à jour par le worker de l'outbox
+        with transaction.atomic():
+            post = serializer.save(author=self.request.user, post_type=post_type)
+            outbox.enqueue(post_tasks.post_created, key=post.pk, author_id=self.request.user.id)
 
-        # Mettre à jour le compteur
-        self.request.user.profile.posts_count += 1
-        self.request.user.profile.save()
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            outbox.enqueue(post_tasks.post_deleted, key=instance.pk, author_id=instance.author_id)
+            instance.delete()
 
     @action(detail=False, methods=['get'])
     def feed(self, request):
         """Obtenir le fil d'actualités de l'utilisateur"""
-        following_users = Follow.objects.filter(
-            follower=request.user
-        ).values_list('following', flat=True)
+        # Le fil est fusionné à partir de plusieurs branches : pagination keyset obligatoire
+        page = self.paginate_queryset(timeline_post_ids(request.user))
+        posts = hydrate_posts(page, post_list_queryset(selection=self.get_field_selection()))
+        return self.list_response(posts)
 
-        posts = Post.objects.filter(
-            Q(author__in=following_users) | Q(author=request.user)
-        ).select_related('author', 'author__profile')
-
-        page = self.paginate_queryset(posts)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-
-        serializer = self.get_serializer(posts, many=True)
-        return Response(serializer.data)
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Obtenir les hashtags tendance sur une fenêtre glissante"""
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 50)
+            window = min(int(request.query_params.get('window', trending.DEFAULT_WINDOW)), 24 * 60)
+        except ValueError:
+            return Response(
+                {'error': 'limit and window must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(trending.engine.top(max(limit, 1), max(window, 1)))
 
     @action(detail=True, methods=['post'])
     def like(self, request, pk=None):
         """Liker/unliker un post"""
         post = self.get_object()
-        like, created = Like.objects.get_or_create(
-            user=request.user,
-            content_type='post',
-            post=post
-        )
-
-        if not created:
-            like.delete()
-            post.likes_count -= 1
-            liked = False
-        else:
-            post.likes_count += 1
-            liked = True
-
-            # Créer une notification
-            if post.author != request.user:
-                Notification.objects.create(
-                    recipient=post.author,
-                    sender=request.user,
-                    notification_type='like',
-                    post=post,
-                    message=f"{request.user.username} a aimé votre post"
-                )
-
-        post.save()
+        # Compteur et notification mis à jour par le worker : la réponse donne la valeur attendue
+        likes_count = counters.get_count(post, 'likes_count')
+        with transaction.atomic():
+            # INSERT ... ON CONFLICT DO NOTHING, ou DELETE si le like existait
+            liked, event = PostLike.objects.toggle(request.user.id, post.pk)
+            task = post_tasks.post_liked if liked else post_tasks.post_unliked
+            outbox.enqueue(task, key=event.pk, post_id=post.pk, user_id=request.user.id)
 
         return Response({
             'liked': liked,
-            'likes_count': post.likes_count
+            'likes_count': max(likes_count + (1 if liked else -1), 0)
         })
 
     @action(detail=True, methods=['get'])
     def comments(self, request, pk=None):
         """Obtenir les commentaires d'un post"""
         post = self.get_object()
-        comments = Comment.objects.filter(post=post, parent=None)
-        serializer = CommentSerializer(comments, many=True)
+        tree = threads.post_tree(post)
+        prime_comments(tree)
+        serializer = CommentSerializer(tree, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ReplicaReadMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['post']
     ordering = ['-created_at']
 
+    def get_queryset(self):
+        return threads.comments(super().get_queryset())
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        if self.get_field_selection().wants('replies'):
+            # Réponses de toute la page chargées en une requête
+            page = threads.attach_replies(page)
+        prime_comments(page)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        comment = self.get_object()
+        if self.get_field_selection().wants('replies'):
+            threads.attach_replies([comment])
+        prime_comments([comment])
+        return Response(self.get_serializer(comment).data)
+
+    @action(detail=True, methods=['get'])
+    def replies(self, request, pk=None):
+        """Réponses suivantes d'un commentaire (lien `more_replies`)"""
+        comment = self.get_object()
+        try:
+            page = threads.replies_page(comment, request.query_params.get('cursor'))
+        except InvalidCursor:
+            raise NotFound('Invalid cursor')
+
+        url = request.build_absolute_uri()
+        prime_comments(page.object_list)
+        serializer = self.get_serializer(page.object_list, many=True)
+        return Response({
+            'next': replace_query_param(url, 'cursor', page.next_cursor) if page.next_cursor else None,
+            'previous': replace_query_param(url, 'cursor', page.previous_cursor) if page.previous_cursor else None,
+            'results': serializer.data,
+        })
+
     def perform_create(self, serializer):
-        comment = serializer.save(author=self.request.user)
-
-        # Mettre à jour le compteur
-        comment.post.comments_count += 1
-        comment.post.save()
-
-        # Créer une notification
-        if comment.post.author != self.request.user:
-            Notification.objects.create(
-                recipient=comment.post.author,
-                sender=self.request.user,
-                notification_type='comment',
-                post=comment.post,
-                comment=comment,
-                message=f"{self.request.user.username} a commenté votre post"
-            )
+        # Compteur et notifications mis à jour par le worker de l'outbox
+        with transaction.atomic():
+            comment = serializer.save(author=self.request.user)
+            outbox.enqueue(post_tasks.comment_created, key=comment.pk,
+                           comment_id=comment.pk, post_id=comment.post_id)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            outbox.enqueue(post_tasks.comments_deleted, key=instance.pk, post_id=instance.post_id,
+                           count=threads.subtree_size(instance))
+            instance.delete()
 
     @action(detail=True, methods=['post'])
     def like(self, request, pk=None):
         """Liker/unliker un commentaire"""
         comment = self.get_object()
-        like, created = Like.objects.get_or_create(
-            user=request.user,
-            content_type='comment',
-            comment=comment
-        )
-
-        if not created:
-            like.delete()
-            comment.likes_count -= 1
-            liked = False
-        else:
-            comment.likes_count += 1
-            liked = True
-
-        comment.save()
+        likes_count = counters.get_count(comment, 'likes_count')
+        with transaction.atomic():
+            # INSERT ... ON CONFLICT DO NOTHING, ou DELETE si le like existait
+            liked, event = CommentLike.objects.toggle(request.user.id, comment.pk)
+            task = post_tasks.comment_liked if liked else post_tasks.comment_unliked
+            outbox.enqueue(task, key=event.pk, comment_id=comment.pk, user_id=request.user.id)
 
         return Response({
             'liked': liked,
-            'likes_count': comment.likes_count
+            'likes_count': max(likes_count + (1 if liked else -1), 0)
         })
 
 
-class FollowViewSet(viewsets.ModelViewSet):
+class FollowViewSet(ReplicaReadMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Follow.objects.all()
     serializer_class = FollowSerializer
     permission_classes = [IsAuthenticated]
+    related_fields = FOLLOW_RELATED_FIELDS
+
+    def get_queryset(self):
+        return self.select_related_fields(super().get_queryset())
 
     @action(detail=False, methods=['post'])
     def toggle(self, request):
@@ -232,61 +298,57 @@ class FollowViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        follow, created = Follow.objects.get_or_create(
-            follower=request.user,
-            following=user_to_follow
-        )
-
-        if not created:
-            follow.delete()
-            request.user.profile.following_count -= 1
-            user_to_follow.profile.followers_count -= 1
-            following = False
-        else:
-            request.user.profile.following_count += 1
-            user_to_follow.profile.followers_count += 1
-            following = True
-
-            # Créer une notification
-            Notification.objects.create(
-                recipient=user_to_follow,
-                sender=request.user,
-                notification_type='follow',
-                message=f"{request.user.username} vous suit maintenant"
+        # Compteurs et notification mis à jour par le worker : la réponse donne la valeur attendue
+        followers_count = counters.get_count(user_to_follow.profile, 'followers_count')
+        with transaction.atomic():
+            follow, created = Follow.objects.get_or_create(
+                follower=request.user,
+                following=user_to_follow
             )
 
-        request.user.profile.save()
-        user_to_follow.profile.save()
+            if not created:
+                outbox.enqueue(social_tasks.user_unfollowed, key=follow.pk,
+                               follower_id=request.user.id, following_id=user_to_follow.id)
+                follow.delete()
+                following = False
+            else:
+                outbox.enqueue(social_tasks.user_followed, key=follow.pk,
+                               follower_id=request.user.id, following_id=user_to_follow.id)
+                following = True
 
         return Response({
             'following': following,
-            'followers_count': user_to_follow.profile.followers_count
+            'followers_count': max(followers_count + (1 if following else -1), 0)
         })
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(ReplicaReadMixin, SparseFieldsViewMixin, FastReadMixin, viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    related_fields = {'sender': ['sender', 'sender__profile']}
 
     def get_queryset(self):
-        return Notification.objects.filter(recipient=self.request.user)
+        return self.select_related_fields(Notification.objects.filter(recipient=self.request.user))
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        return self.list_response(page)
 
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         """Obtenir le nombre de notifications non lues"""
-        count = self.get_queryset().filter(is_read=False).count()
-        return Response({'unread_count': count})
+        return Response({'unread_count': notifier.unread_count(request.user)})
 
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """Marquer toutes les notifications comme lues"""
-        self.get_queryset().update(is_read=True)
+        notifier.mark_read(request.user)
         return Response({'message': 'All notifications marked as read'})
 
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         """Marquer une notification comme lue"""
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        notifier.mark_read(request.user, self.get_queryset().filter(pk=notification.pk))
         return Response({'message': 'Notification marked as read'})
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users.models import CustomUser
+from apps.posts.timeline import BACKFILL_PER_AUTHOR, rebuild_timeline
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les fils d'actualités matérialisés à partir des abonnements"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Nom de l'utilisateur à reconstruire (tous par défaut)")
+        parser.add_argument('--per-author', type=int, default=BACKFILL_PER_AUTHOR,
+                            help="Nombre de posts récents conservés par auteur suivi")
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.order_by('id')
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"Utilisateur introuvable : {options['user']}")
+
+        total_users = 0
+        total_entries = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            total_entries += rebuild_timeline(user_id, options['per_author'])
+            total_users += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total_entries} entrées reconstruites pour {total_users} utilisateur(s)"
+        ))
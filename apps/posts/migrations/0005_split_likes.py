@@ -0,0 +1,78 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_likes(apps, schema_editor):
+    """Copier Like vers PostLike / CommentLike ; rejouable, les doublons sont ignorés.
+
+    À relancer dans la migration qui supprimera Like (mise en production suivante)
+    pour reprendre les likes écrits par l'ancien code pendant le déploiement ; les
+    unlikes du nouveau code suppriment aussi la ligne de Like (LikeManager.toggle).
+    """
+    Like = apps.get_model('posts', 'Like')
+    targets = (
+        (apps.get_model('posts', 'PostLike'), 'post'),
+        (apps.get_model('posts', 'CommentLike'), 'comment'),
+    )
+    for model, target in targets:
+        # Garder la date du like d'origine (modèle historique propre à la migration)
+        model._meta.get_field('created_at').auto_now_add = False
+        rows = Like.objects.filter(content_type=target, **{f'{target}__isnull': False}).order_by('pk').values_list(
+            f'{target}_id', 'user_id', 'created_at'
+        )
+        batch = []
+        for target_id, user_id, created_at in rows.iterator(chunk_size=2000):
+            batch.append(model(**{f'{target}_id': target_id}, user_id=user_id, created_at=created_at))
+            if len(batch) >= 2000:
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='like',
+            name='comment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.comment'),
+        ),
+        migrations.AlterField(
+            model_name='like',
+            name='post',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.post'),
+        ),
+        migrations.CreateModel(
+            name='CommentLike',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('comment', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comment_likes', to='posts.comment')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comment_likes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('comment', 'user'), name='commentlike_comment_user_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostLike',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('post', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='post_likes', to='posts.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_likes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('post', 'user'), name='postlike_post_user_uniq')],
+            },
+        ),
+        migrations.RunPython(copy_likes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_threads(apps, schema_editor):
+    """Calculer la racine et la profondeur des réponses existantes"""
+    Comment = apps.get_model('posts', 'Comment')
+    parents = dict(Comment.objects.values_list('id', 'parent_id'))
+    threads = {}
+
+    def locate(comment_id):
+        # (racine, profondeur) ; les racines sont None, 0
+        if comment_id not in threads:
+            parent_id = parents[comment_id]
+            if parent_id is None:
+                threads[comment_id] = (None, 0)
+            else:
+                root_id, depth = locate(parent_id)
+                threads[comment_id] = (root_id or parent_id, depth + 1)
+        return threads[comment_id]
+
+    batch = []
+    for comment_id, parent_id in parents.items():
+        if parent_id is not None:
+            root_id, depth = locate(comment_id)
+            batch.append(Comment(id=comment_id, root_id=root_id, depth=depth))
+    Comment.objects.bulk_update(batch, ['root', 'depth'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_split_likes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='root',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.comment'),
+        ),
+        migrations.RunPython(fill_threads, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['root', 'depth'], name='comment_root_depth_idx'),
+        ),
+    ]
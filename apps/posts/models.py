@@ -1,4 +1,8 @@
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
 from apps.users.models import CustomUser
 
 
@@ -28,6 +32,13 @@ class Post(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        # Index des requêtes chaudes, vérifiés par `manage.py explain_hot_queries`
+        indexes = [
+            # Posts d'un profil, rattrapage du fil à l'abonnement, auteurs lus à la volée
+            models.Index(fields=['author', '-created_at', '-id'], name='post_author_created_idx'),
+            # Liste de l'API et lecture des tendances par plage de dates
+            models.Index(fields=['-created_at', '-id'], name='post_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.author.username}'s post - {self.created_at.strftime('%Y-%m-%d')}"
@@ -48,18 +59,113 @@ class Comment(models.Model):
     author = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='comments')
     content = models.TextField(max_length=500)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    # Racine du fil et profondeur (0 pour un commentaire de premier niveau) : les réponses
+    # d'une page de racines se lisent en une requête (voir threads.py)
+    root = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='+', db_index=False)
+    depth = models.PositiveSmallIntegerField(default=0)
     likes_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Commentaires de premier niveau d'un post (page du post, API)
+            models.Index(fields=['post', '-created_at', '-id'], condition=Q(parent__isnull=True),
+                         name='comment_post_top_idx'),
+            models.Index(fields=['post', '-created_at', '-id'], name='comment_post_created_idx'),
+            # Réponses d'un ensemble de fils, par niveau
+            models.Index(fields=['root', 'depth'], name='comment_root_depth_idx'),
+        ]
 
     def __str__(self):
         return f"Comment by {self.author.username} on {self.post}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.parent_id:
+            self.root_id = self.parent.root_id or self.parent_id
+            self.depth = self.parent.depth + 1
+        super().save(*args, **kwargs)
+
+
+class LikeManager(models.Manager):
+    """Like / unlike sans lecture préalable.
+
+    `toggle` tente un INSERT ... ON CONFLICT DO NOTHING ; si la ligne existait
+    déjà, c'est un unlike : un DELETE. Aucun signal n'est émis, le changement est
+    ajouté directement au flux d'événements.
+    """
+
+    def toggle(self, user_id, target_id):
+        """Retourne (liké ?, événement enregistré)"""
+        from apps.social import events
+
+        target = self.model.target_field
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        created_at = self.model._meta.get_field('created_at').get_db_prep_value(timezone.now(), connection)
+        with transaction.atomic(using=self.db):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {quote(self.model._meta.db_table)} "
+                    f"({quote(f'{target}_id')}, {quote('user_id')}, {quote('created_at')}) "
+                    f"VALUES (%s, %s, %s) ON CONFLICT DO NOTHING",
+                    [target_id, user_id, created_at],
+                )
+                liked = cursor.rowcount == 1
+            if not liked:
+                # Sans signal ni cascade : un seul DELETE
+                self.filter(**{f'{target}_id': target_id}, user_id=user_id).delete()
+                # Et dans l'ancienne table : la copie finale de Like ne doit pas le recréer
+                Like.objects.filter(content_type=target, user_id=user_id, **{f'{target}_id': target_id}).delete()
+            event = events.record('like.created' if liked else 'like.deleted',
+                                  user_id=user_id, content_type=target, **{f'{target}_id': target_id})
+        return liked, event
+
+
+class PostLike(models.Model):
+    # L'index unique (post, user) sert aussi les recherches par post
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='post_likes', db_index=False)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='post_likes')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    target_field = 'post'
+    objects = LikeManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'user'], name='postlike_post_user_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} likes post {self.post_id}"
+
+
+class CommentLike(models.Model):
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='comment_likes', db_index=False)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='comment_likes')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    target_field = 'comment'
+    objects = LikeManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['comment', 'user'], name='commentlike_comment_user_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} likes comment {self.comment_id}"
+
 
 class Like(models.Model):
+    """Ancienne table des likes, remplacée par PostLike / CommentLike (0005).
+
+    Gardée pendant le déploiement : l'ancien code y écrit encore, le nouveau n'y
+    fait que supprimer (unlike, voir LikeManager.toggle). Sa suppression et la
+    copie des likes restants partent dans la mise en production suivante, une
+    fois l'ancien code arrêté partout.
+    """
     LIKE_TYPES = (
         ('post', 'Post'),
         ('comment', 'Comment'),
@@ -67,12 +173,74 @@ class Like(models.Model):
 
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='likes')
     content_type = models.CharField(max_length=10, choices=LIKE_TYPES)
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, null=True, blank=True, related_name='post_likes')
-    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, null=True, blank=True, related_name='comment_likes')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ('user', 'content_type', 'post', 'comment')
 
     def __str__(self):
-        return f"{self.user.username} likes {self.content_type}"
+        return f"{self.user_id} likes {self.content_type}"
+
+
+class TimelineEntry(models.Model):
+    """Entrée du fil d'actualités matérialisé d'un utilisateur"""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    # Dénormalisé pour pouvoir retirer les posts d'un auteur lors d'un unfollow
+    author = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='timeline_user_created_idx'),
+            models.Index(fields=['user', 'author'], name='timeline_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} in {self.user_id}'s timeline"
+
+
+# Flux d'événements (apps.social.events) : écrits dans la transaction de la donnée
+@receiver(post_save, sender=Post)
+def record_post_created(sender, instance, created, **kwargs):
+    if created:
+        from apps.social import events
+        events.record('post.created', post_id=instance.pk, author_id=instance.author_id,
+                      shared_post_id=instance.shared_post_id)
+
+
+@receiver(post_delete, sender=Post)
+def record_post_deleted(sender, instance, **kwargs):
+    from apps.social import events
+    events.record('post.deleted', post_id=instance.pk, author_id=instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def record_comment_created(sender, instance, created, **kwargs):
+    if created:
+        from apps.social import events
+        events.record('comment.created', comment_id=instance.pk, post_id=instance.post_id,
+                      author_id=instance.author_id, parent_id=instance.parent_id)
+
+
+# Le post entre tout de suite dans le fil de son auteur, sans attendre
+# consume_events qui le pousse ensuite aux abonnés (apps.posts.timeline)
+@receiver(post_save, sender=Post)
+def add_to_author_timeline(sender, instance, created, **kwargs):
+    if created:
+        TimelineEntry.objects.bulk_create([TimelineEntry(
+            user_id=instance.author_id,
+            post_id=instance.pk,
+            author_id=instance.author_id,
+            created_at=instance.created_at
+        )], ignore_conflicts=True)
+
+
+@receiver(post_save, sender=Post)
+def count_post_hashtags(sender, instance, created, **kwargs):
+    if created:
+        from .trending import engine
+        engine.add_post(instance.id, instance.content, instance.created_at)
@@ -1,27 +1,120 @@
+from django.conf import settings
+from django.db import models
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Post, Comment, Like
-from apps.users.serializers import UserSerializer
+from . import threads
+from .models import Post, Comment
+from apps.api.fieldsets import FieldSelection, SparseFieldsMixin
+from apps.users.serializers import UserSerializer, prime_profiles
+from apps.social.viewer_state import get_viewer_state
+from apps.social import counters
 
+COMMENT_PREVIEW_SIZE = getattr(settings, 'POST_COMMENT_PREVIEW_SIZE', 3)
 
-class CommentSerializer(serializers.ModelSerializer):
+# Relations d'un post dans la réponse -> select_related (voir apps/api/fieldsets.py)
+POST_RELATED_FIELDS = {'author': ['author', 'author__profile']}
+
+
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
+    replies_count = serializers.SerializerMethodField()
     replies = serializers.SerializerMethodField()
+    more_replies = serializers.SerializerMethodField()
 
     class Meta:
         model = Comment
         fields = ['id', 'post', 'author', 'content', 'parent', 'likes_count',
-                  'created_at', 'updated_at', 'replies']
+                  'created_at', 'updated_at', 'replies_count', 'replies', 'more_replies']
         read_only_fields = ['author', 'created_at', 'updated_at']
+        expandable_fields = ['author']
+
+    def get_replies_count(self, obj):
+        # Annoté par le plan de chargement, sinon compté dans l'arbre chargé
+        count = getattr(obj, 'replies_count', None)
+        return count if count is not None else len(getattr(obj, 'tree_replies', []))
 
     def get_replies(self, obj):
-        if obj.replies.exists():
-            return CommentSerializer(obj.replies.all(), many=True).data
-        return []
+        # Arbre chargé en une requête (threads.py) : aucune requête par commentaire
+        return CommentSerializer(getattr(obj, 'tree_replies', []), many=True, context=self.context).data
+
+    def get_more_replies(self, obj):
+        # Branche coupée par les limites de l'arbre : lien vers la suite
+        if not getattr(obj, 'has_more_replies', False):
+            return None
+        url = reverse('api:comment-replies', args=[obj.pk])
+        if obj.replies_cursor:
+            url = f'{url}?cursor={obj.replies_cursor}'
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class CommentPreviewSerializer(CommentSerializer):
+    """Commentaire affiché dans une liste de posts : sans ses réponses"""
+
+    class Meta(CommentSerializer.Meta):
+        fields = [name for name in CommentSerializer.Meta.fields if name not in ('replies', 'more_replies')]
+
+
+def post_list_queryset(queryset=None, selection=None):
+    """Plan de chargement d'une page de posts : auteurs joints, aperçu des commentaires
+    préchargé avec le nombre de réponses. Le nombre de requêtes ne dépend pas des données.
+
+    Avec une FieldSelection, seules les relations rendues sont chargées.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+    if selection is None:
+        selection = FieldSelection()
+    related = selection.related_lookups(POST_RELATED_FIELDS)
+    if related:
+        queryset = queryset.select_related(*related)
+    if selection.wants('comments'):
+        preview = threads.comments(Comment.objects.filter(parent=None)).order_by(
+            *threads.ORDERING
+        )[:COMMENT_PREVIEW_SIZE]
+        queryset = queryset.prefetch_related(models.Prefetch('comments', queryset=preview, to_attr='comment_preview'))
+    return queryset
+
+
+def prime_post_counts(posts):
+    """Compteurs à jour des posts et des posts partagés qu'ils affichent"""
+    posts = list(posts)
+    counters.apply_live_counts(posts + [post.shared_post for post in posts if post.shared_post_id])
+    return posts
 
 
-class PostSerializer(serializers.ModelSerializer):
+def prime_comments(comments):
+    """Compteurs à jour des commentaires, de leur arbre chargé (tree_replies) et
+    des profils de leurs auteurs, en une lecture du cache"""
+    flat = []
+    pending = list(comments)
+    while pending:
+        comment = pending.pop()
+        flat.append(comment)
+        pending.extend(getattr(comment, 'tree_replies', ()))
+    counters.apply_live_counts(flat)
+    prime_profiles(flat, 'author')
+
+
+class PostListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        self.prepare(iterable)
+        return super().to_representation(iterable)
+
+    def prepare(self, posts):
+        # Charger l'état "liké" et les compteurs de toute la page en une requête
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            get_viewer_state(request.user).prime_posts(posts)
+        counters.apply_live_counts(posts)
+        prime_profiles(posts, 'author')
+        prime_comments(comment for post in posts for comment in getattr(post, 'comment_preview', ()))
+
+
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
+    comments = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
 
     class Meta:
@@ -30,23 +123,25 @@ class PostSerializer(serializers.ModelSerializer):
                   'likes_count', 'comments_count', 'shares_count',
                   'created_at', 'updated_at', 'comments', 'is_liked']
         read_only_fields = ['author', 'post_type', 'created_at', 'updated_at']
+        list_serializer_class = PostListSerializer
+        expandable_fields = ['author']
+
+    def get_comments(self, obj):
+        # Liste : aperçu préchargé par post_list_queryset ; détail : arbre de threads.post_tree
+        context = {**self.context, 'field_prefix': 'comments'}
+        if hasattr(obj, 'comment_preview'):
+            return CommentPreviewSerializer(obj.comment_preview, many=True, context=context).data
+        return CommentSerializer(getattr(obj, 'comment_tree', []), many=True, context=context).data
+
+    def fast_comments(self, obj, dump):
+        # get_comments pour la lecture rapide (apps/api/fast.py)
+        if hasattr(obj, 'comment_preview'):
+            return dump(CommentPreviewSerializer, obj.comment_preview)
+        return self.get_comments(obj)
 
     def get_is_liked(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return Like.objects.filter(
-                user=request.user,
-                content_type='post',
-                post=obj
-            ).exists()
+            return get_viewer_state(request.user).has_liked_post(obj.id)
         return False
 
-
-class LikeSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
-
-    class Meta:
-        model = Like
-        fields = ['id', 'user', 'content_type', 'post', 'comment', 'created_at']
-        read_only_fields = ['user', 'created_at']
-
@@ -0,0 +1,97 @@
+"""Effets de bord des écritures sur les posts, exécutés par le worker de l'outbox.
+
+Chaque tâche reçoit des identifiants : l'objet a pu être supprimé entre le
+dépôt et l'exécution (unlike, suppression du post...). Les compteurs sont
+toujours ajustés, la tâche inverse les rééquilibrant ; les notifications ne
+sont envoyées que si l'action existe encore.
+"""
+from apps.social import counters, notifier
+from apps.users.models import CustomUser, Profile
+from .models import Comment, CommentLike, Post, PostLike
+
+
+def _count_post(author_id, delta):
+    profile = Profile.objects.filter(user_id=author_id).only('pk').first()
+    if profile is not None:
+        counters.increment(profile, 'posts_count', delta)
+
+
+def post_created(author_id):
+    _count_post(author_id, 1)
+
+
+def post_deleted(author_id):
+    _count_post(author_id, -1)
+
+
+def post_liked(post_id, user_id):
+    counters.increment(Post(pk=post_id), 'likes_count')
+    like = PostLike.objects.filter(post_id=post_id, user_id=user_id).select_related(
+        'user', 'post__author'
+    ).first()
+    if like is not None:
+        notifier.notify('post_like', like.post.author, like.user, like.post, post=like.post)
+
+
+def post_unliked(post_id, user_id):
+    counters.increment(Post(pk=post_id), 'likes_count', -1)
+    post = Post.objects.filter(pk=post_id).only('pk', 'author_id').first()
+    if post is not None:
+        notifier.retract('post_like', CustomUser(pk=post.author_id), CustomUser(pk=user_id), post)
+
+
+def comment_liked(comment_id, user_id):
+    counters.increment(Comment(pk=comment_id), 'likes_count')
+    like = CommentLike.objects.filter(comment_id=comment_id, user_id=user_id).select_related(
+        'user', 'comment__author', 'comment__post'
+    ).first()
+    if like is not None:
+        comment = like.comment
+        notifier.notify('comment_like', comment.author, like.user, comment, post=comment.post, comment=comment)
+
+
+def comment_unliked(comment_id, user_id):
+    counters.increment(Comment(pk=comment_id), 'likes_count', -1)
+    comment = Comment.objects.filter(pk=comment_id).only('pk', 'author_id').first()
+    if comment is not None:
+        notifier.retract('comment_like', CustomUser(pk=comment.author_id), CustomUser(pk=user_id), comment)
+
+
+def comment_created(comment_id, post_id):
+    counters.increment(Post(pk=post_id), 'comments_count')
+    comment = Comment.objects.filter(pk=comment_id).select_related(
+        'author', 'post__author', 'parent__author'
+    ).first()
+    if comment is None:
+        return
+    post = comment.post
+    notifier.notify('post_comment', post.author, comment.author, post, post=post, comment=comment)
+    if comment.parent is not None:
+        notifier.notify('comment_reply', comment.parent.author, comment.author, comment.parent,
+                        post=post, comment=comment)
+
+
+def comments_deleted(post_id, count):
+    # Un commentaire supprimé emporte ses réponses en cascade
+    counters.increment(Post(pk=post_id), 'comments_count', -count)
+
+
+def post_shared(shared_post_id, original_post_id, user_id):
+    counters.increment(Post(pk=original_post_id), 'shares_count')
+    _count_post(user_id, 1)
+    if not Post.objects.filter(pk=shared_post_id).exists():
+        return
+    original_post = Post.objects.filter(pk=original_post_id).select_related('author').first()
+    user = CustomUser.objects.filter(pk=user_id).first()
+    if original_post is not None and user is not None:
+        notifier.notify('post_share', original_post.author, user, original_post, post=original_post)
+
+
+def post_unshared(original_post_id, user_id):
+    _count_post(user_id, -1)
+    if original_post_id is None:
+        return
+    counters.increment(Post(pk=original_post_id), 'shares_count', -1)
+    original_post = Post.objects.filter(pk=original_post_id).only('pk', 'author_id').first()
+    if original_post is not None:
+        notifier.retract('post_share', CustomUser(pk=original_post.author_id), CustomUser(pk=user_id), original_post)
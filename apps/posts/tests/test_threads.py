@@ -0,0 +1,96 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.posts import threads
+from apps.posts.serializers import COMMENT_PREVIEW_SIZE
+from apps.posts.models import Comment, Post
+from apps.users.models import CustomUser
+
+
+class CommentTreeQueryCountTest(TestCase):
+    """Le nombre de requêtes ne dépend pas de la forme des arbres de commentaires"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='reader', email='reader@example.com', password='pw')
+        cls.others = [
+            CustomUser.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='pw')
+            for i in range(3)
+        ]
+        cls.shapes = {
+            'empty': cls.make_post([]),
+            'flat': cls.make_post([[] for _ in range(12)]),
+            'deep': cls.make_post([cls.chain(8)]),
+            'wide': cls.make_post([[[[], []] for _ in range(8)] for _ in range(3)]),
+        }
+
+    @classmethod
+    def chain(cls, depth):
+        return [cls.chain(depth - 1)] if depth else []
+
+    @classmethod
+    def make_post(cls, tree):
+        """`tree` : liste des commentaires de premier niveau, chacun étant la liste de ses réponses"""
+        post = Post.objects.create(author=cls.user, content='post')
+
+        def add(children, parent, level):
+            for i, replies in enumerate(children):
+                comment = Comment.objects.create(
+                    post=post, parent=parent, author=cls.others[(level + i) % 3], content=f'{level}-{i}'
+                )
+                add(replies, comment, level + 1)
+
+        add(tree, None, 0)
+        return post
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def queries(self, url):
+        # Premier appel : caches (compteurs, graphe) remplis, seul le rendu est mesuré
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(context)
+
+    def assert_same_for_every_shape(self, url_for):
+        counts = {name: self.queries(url_for(post)) for name, post in self.shapes.items()}
+        # Sans commentaire, les requêtes des réponses et des auteurs peuvent être évitées
+        empty = counts.pop('empty')
+        self.assertEqual(len(set(counts.values())), 1, counts)
+        self.assertLessEqual(empty, counts['flat'])
+
+    def test_api_post_detail(self):
+        self.assert_same_for_every_shape(lambda post: f'/api/posts/{post.pk}/')
+
+    def test_api_comment_list(self):
+        self.assert_same_for_every_shape(lambda post: f'/api/comments/?post={post.pk}')
+
+    def test_api_post_comments(self):
+        self.assert_same_for_every_shape(lambda post: f'/api/posts/{post.pk}/comments/')
+
+    def test_post_detail_page(self):
+        self.assert_same_for_every_shape(lambda post: f'/post/{post.pk}/')
+
+    def test_api_post_list_previews_are_bounded(self):
+        results = self.client.get('/api/posts/').json()['results']
+        self.assertEqual(len(results), len(self.shapes))
+        for post in results:
+            self.assertLessEqual(len(post['comments']), COMMENT_PREVIEW_SIZE)
+            for comment in post['comments']:
+                self.assertNotIn('replies', comment)
+
+    def test_tree_is_bounded(self):
+        deep = threads.post_tree(self.shapes['deep'])
+        node, levels = deep[0], 0
+        while node.tree_replies:
+            node, levels = node.tree_replies[0], levels + 1
+        self.assertEqual(levels, threads.MAX_DEPTH)
+        self.assertTrue(node.has_more_replies)
+
+        wide = threads.post_tree(self.shapes['wide'])
+        self.assertEqual(len(wide), 3)
+        for root in wide:
+            self.assertEqual(len(root.tree_replies), threads.REPLIES_PER_BRANCH)
+            self.assertTrue(root.has_more_replies)
@@ -0,0 +1,143 @@
+"""Arbres de commentaires chargés en une requête.
+
+Chaque réponse connaît la racine de son fil et sa profondeur (Comment.root,
+Comment.depth) : les réponses d'une page de commentaires se lisent en une seule
+requête triée par niveau, puis sont reliées en Python en O(n). Chaque
+commentaire chargé reçoit :
+- `tree_replies` : ses réponses affichées ;
+- `has_more_replies` / `replies_cursor` : d'autres réponses existent, à lire
+  avec `replies_page(comment, cursor)` (curseur None : depuis le début, la
+  branche a été coupée par la limite de profondeur) ;
+- `replies_count` : son nombre de réponses directes.
+
+Deux limites bornent la taille d'un arbre : la profondeur (`max_depth`, relative
+aux commentaires demandés) et le nombre de réponses par branche (`per_branch`,
+appliqué dans la requête par une fonction de fenêtre). `None` désactive une limite.
+"""
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value, Window
+from django.db.models.functions import Coalesce, RowNumber
+
+from apps.api.pagination import CursorPaginator, encode_cursor
+from .models import Comment
+
+MAX_DEPTH = getattr(settings, 'COMMENT_TREE_MAX_DEPTH', 3)
+REPLIES_PER_BRANCH = getattr(settings, 'COMMENT_TREE_REPLIES_PER_BRANCH', 5)
+
+ORDERING = ('-created_at', '-id')
+
+
+def with_replies_count(queryset):
+    """Annoter le nombre de réponses directes (sous-requête, sans GROUP BY)"""
+    counts = Comment.objects.filter(parent=OuterRef('pk')).order_by().values('parent').annotate(
+        count=Count('*')
+    ).values('count')
+    return queryset.annotate(replies_count=Coalesce(Subquery(counts), Value(0)))
+
+
+def comments(queryset=None):
+    """Commentaires prêts pour l'arbre : auteurs joints, réponses comptées"""
+    if queryset is None:
+        queryset = Comment.objects.all()
+    return with_replies_count(queryset.select_related('author', 'author__profile'))
+
+
+def subtree_size(comment):
+    """Nombre de commentaires supprimés avec `comment` (lui et toutes ses réponses), en une requête"""
+    rows = Comment.objects.filter(
+        root_id=comment.root_id or comment.id, depth__gt=comment.depth
+    ).order_by('depth').values_list('id', 'parent_id')
+    subtree = {comment.id}
+    for comment_id, parent_id in rows:
+        if parent_id in subtree:
+            subtree.add(comment_id)
+    return len(subtree)
+
+
+def _ranked(queryset, per_branch, keep=None):
+    """Garder au plus per_branch + 1 réponses par parent (la dernière signale la suite)"""
+    if per_branch is None:
+        return queryset
+    queryset = queryset.annotate(sibling_rank=Window(
+        RowNumber(), partition_by=[F('parent_id')], order_by=[F('created_at').desc(), F('id').desc()]
+    ))
+    limit = Q(sibling_rank__lte=per_branch + 1)
+    return queryset.filter((limit | keep) if keep is not None else limit)
+
+
+def _reset(comment, level):
+    comment.tree_replies = []
+    comment.has_more_replies = False
+    comment.replies_cursor = None
+    comment.tree_level = level
+
+
+def _link(nodes, rows, max_depth, per_branch):
+    """Relier les lignes (triées par profondeur puis ORDERING) sous les commentaires demandés"""
+    by_id = {}
+    for node in nodes:
+        _reset(node, 0)
+        by_id[node.id] = node
+
+    for row in rows:
+        parent = by_id.get(row.parent_id)
+        # Hors des branches demandées, ou commentaire demandé lui-même
+        if parent is None or row.id in by_id:
+            continue
+        if max_depth is not None and parent.tree_level >= max_depth:
+            continue
+        if per_branch is not None and len(parent.tree_replies) >= per_branch:
+            last = parent.tree_replies[-1]
+            parent.has_more_replies = True
+            parent.replies_cursor = encode_cursor([last.created_at, last.id])
+            continue
+        _reset(row, parent.tree_level + 1)
+        parent.tree_replies.append(row)
+        by_id[row.id] = row
+
+    # Branches coupées par la limite de profondeur
+    if max_depth is not None:
+        for comment in by_id.values():
+            if comment.tree_level == max_depth and comment.replies_count:
+                comment.has_more_replies = True
+    return nodes
+
+
+def attach_replies(nodes, max_depth=MAX_DEPTH, per_branch=REPLIES_PER_BRANCH):
+    """Attacher leurs réponses à une page de commentaires (chargés par `comments()`), en une requête"""
+    nodes = list(nodes)
+    if not nodes or max_depth == 0:
+        return _link(nodes, [], max_depth, per_branch)
+
+    rows = Comment.objects.filter(
+        root_id__in={node.root_id or node.id for node in nodes},
+        depth__gt=min(node.depth for node in nodes),
+    )
+    if max_depth is not None:
+        rows = rows.filter(depth__lte=max(node.depth for node in nodes) + max_depth)
+    rows = _ranked(comments(rows), per_branch).order_by('depth', *ORDERING)
+    return _link(nodes, rows, max_depth, per_branch)
+
+
+def post_tree(post, max_depth=MAX_DEPTH, per_branch=REPLIES_PER_BRANCH):
+    """Tous les commentaires de premier niveau d'un post et leurs réponses, en une requête"""
+    rows = Comment.objects.filter(post=post)
+    if max_depth is not None:
+        rows = rows.filter(depth__lte=max_depth)
+    # La limite par branche ne s'applique pas aux commentaires de premier niveau
+    rows = list(_ranked(comments(rows), per_branch, keep=Q(parent=None)).order_by('depth', *ORDERING))
+    roots = [row for row in rows if row.parent_id is None]
+    return _link(roots, rows, max_depth, per_branch)
+
+
+def replies_page(comment, cursor=None, max_depth=MAX_DEPTH, per_branch=REPLIES_PER_BRANCH):
+    """Page suivante des réponses d'un commentaire (« voir plus de réponses »), de
+    per_branch réponses avec leurs propres réponses.
+
+    Lève InvalidCursor si le curseur est illisible.
+    """
+    paginator = CursorPaginator(comments(comment.replies.all()), per_branch, ORDERING)
+    page = paginator.page(cursor)
+    depth = max_depth - 1 if max_depth is not None else None
+    page.object_list = attach_replies(page.object_list, depth, per_branch)
+    return page
@@ -0,0 +1,147 @@
+"""Fil d'actualités matérialisé.
+
+Chaque post entre dans le fil de son auteur dès sa création (signal de
+apps.posts.models), puis est poussé (fan-out) dans celui de ses abonnés par
+TimelineConsumer, qui suit le flux d'événements (posts créés, abonnements) :
+le worker `manage.py consume_events` doit tourner (voir Procfile).
+Les auteurs très suivis ne sont pas poussés : leurs posts sont lus à la volée
+puis fusionnés avec le fil précalculé.
+"""
+from django.conf import settings
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from apps.social.events import Consumer
+from apps.social.models import Follow
+from apps.users.models import Profile
+from .models import Post, TimelineEntry
+
+FANOUT_THRESHOLD = getattr(settings, 'TIMELINE_FANOUT_THRESHOLD', 5000)
+BACKFILL_PER_AUTHOR = getattr(settings, 'TIMELINE_BACKFILL_PER_AUTHOR', 50)
+BATCH_SIZE = 1000
+TIMELINE_ORDERING = ('-created_at', '-post_id')
+
+
+def is_high_fanout(author_id):
+    """Vérifier si les posts de l'auteur doivent être lus à la volée"""
+    return Profile.objects.filter(
+        user_id=author_id,
+        followers_count__gte=FANOUT_THRESHOLD
+    ).exists()
+
+
+def _push(user_ids, posts):
+    """Insérer les posts dans les fils des utilisateurs, par lots"""
+    batch = []
+    for user_id in user_ids:
+        for post_id, author_id, created_at in posts:
+            batch.append(TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                created_at=created_at
+            ))
+            if len(batch) >= BATCH_SIZE:
+                TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Pousser un nouveau post dans le fil de son auteur et de ses abonnés"""
+    posts = [(post.id, post.author_id, post.created_at)]
+    _push([post.author_id], posts)
+
+    if not is_high_fanout(post.author_id):
+        follower_ids = Follow.objects.filter(
+            following_id=post.author_id
+        ).values_list('follower_id', flat=True)
+        _push(follower_ids.iterator(chunk_size=BATCH_SIZE), posts)
+
+
+def follow_edge_added(follower_id, following_id):
+    """Ajouter les posts récents d'un auteur au fil d'un nouvel abonné"""
+    if is_high_fanout(following_id):
+        return
+
+    posts = Post.objects.filter(author_id=following_id).order_by('-created_at').values_list(
+        'id', 'author_id', 'created_at'
+    )[:BACKFILL_PER_AUTHOR]
+    _push([follower_id], list(posts))
+
+
+def follow_edge_removed(follower_id, following_id):
+    """Retirer les posts d'un auteur du fil d'un ancien abonné"""
+    TimelineEntry.objects.filter(user_id=follower_id, author_id=following_id).delete()
+
+
+class TimelineConsumer(Consumer):
+    """Fan-out des posts et mise à jour des fils selon les abonnements.
+
+    Rejouable : les insertions ignorent les entrées existantes.
+    """
+    name = 'timeline'
+    kinds = {'post.created', 'follow.created', 'follow.deleted'}
+
+    def handle(self, events):
+        post_ids = [event.data['post_id'] for event in events if event.kind == 'post.created']
+        posts = Post.objects.in_bulk(post_ids)
+
+        for event in events:
+            if event.kind == 'post.created':
+                # Post supprimé depuis : rien à pousser
+                post = posts.get(event.data['post_id'])
+                if post is not None:
+                    fan_out_post(post)
+            elif event.kind == 'follow.created':
+                follow_edge_added(event.data['follower_id'], event.data['following_id'])
+            else:
+                follow_edge_removed(event.data['follower_id'], event.data['following_id'])
+
+
+def rebuild_timeline(user_id, per_author=BACKFILL_PER_AUTHOR):
+    """Reconstruire entièrement le fil d'un utilisateur"""
+    following_ids = Follow.objects.filter(
+        follower_id=user_id
+    ).exclude(
+        following__profile__followers_count__gte=FANOUT_THRESHOLD
+    ).values_list('following_id', flat=True)
+
+    posts = Post.objects.filter(
+        Q(author_id__in=following_ids) | Q(author_id=user_id)
+    ).annotate(
+        rank=Window(RowNumber(), partition_by=F('author_id'), order_by=F('created_at').desc())
+    ).filter(rank__lte=per_author).values_list('id', 'author_id', 'created_at')
+
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    posts = list(posts)
+    _push([user_id], posts)
+    return len(posts)
+
+
+def timeline_post_ids(user):
+    """Branches (post_id, created_at) du fil, triées du plus récent au plus ancien.
+
+    À paginer avec CursorPaginator, qui lit chaque branche par plage de clés
+    puis les fusionne.
+    """
+    entries = TimelineEntry.objects.filter(user=user).values('post_id', 'created_at')
+
+    # Mode hybride : les auteurs très suivis sont lus au moment de la lecture
+    pulled_authors = Follow.objects.filter(
+        follower=user,
+        following__profile__followers_count__gte=FANOUT_THRESHOLD
+    ).values_list('following_id', flat=True)
+    pulled = Post.objects.filter(author_id__in=pulled_authors).values('created_at', post_id=F('id'))
+
+    return [entries.order_by(*TIMELINE_ORDERING), pulled.order_by(*TIMELINE_ORDERING)]
+
+
+def hydrate_posts(rows, queryset=None):
+    """Charger les posts d'une page d'identifiants en une seule requête, dans l'ordre"""
+    if queryset is None:
+        queryset = Post.objects.select_related('author', 'author__profile')
+    post_ids = [row['post_id'] for row in rows]
+    posts = queryset.in_bulk(post_ids)
+    return [posts[post_id] for post_id in post_ids if post_id in posts]
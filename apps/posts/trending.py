@@ -0,0 +1,169 @@
+"""Tendances : hashtags les plus utilisés sur une fenêtre glissante.
+
+Les hashtags sont comptés dans des seaux d'une minute (depuis le début de l'heure
+précédente, pour couvrir l'heure entamée) et d'une heure (dernières 24 h). Chaque seau est un count-min sketch de taille fixe accompagné
+d'une petite liste de candidats ; le top-K d'une fenêtre est obtenu par un tas sur
+ces candidats, sans GROUP BY sur la table des posts.
+
+Le moteur vit en mémoire dans chaque processus. Les posts créés par le processus
+sont comptés immédiatement (signal post_save) ; ceux des autres processus sont lus
+par plage de created_at au plus toutes les TRENDING_SYNC_SECONDS.
+"""
+import heapq
+import re
+import threading
+import time
+from array import array
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+HASHTAG_RE = re.compile(r'#(\w+)')
+SKETCH_WIDTH = 1024
+SKETCH_DEPTH = 4
+CANDIDATES_PER_BUCKET = 50
+MINUTE_BUCKETS = 60
+HOUR_BUCKETS = 24
+DEFAULT_WINDOW = getattr(settings, 'TRENDING_WINDOW_MINUTES', 24 * 60)
+SYNC_SECONDS = getattr(settings, 'TRENDING_SYNC_SECONDS', 30)
+
+
+def extract_hashtags(content):
+    """Hashtags distincts d'un texte, en minuscules"""
+    return {tag.lower() for tag in HASHTAG_RE.findall(content or '')}
+
+
+class CountMinSketch:
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.table = array('I', bytes(4 * width * depth))
+
+    def _cells(self, key):
+        for row in range(self.depth):
+            yield row * self.width + hash((row, key)) % self.width
+
+    def add(self, key, count=1):
+        """Incrémenter la clé et retourner sa nouvelle estimation"""
+        estimate = None
+        for cell in self._cells(key):
+            self.table[cell] += count
+            value = self.table[cell]
+            estimate = value if estimate is None else min(estimate, value)
+        return estimate
+
+    def estimate(self, key):
+        return min(self.table[cell] for cell in self._cells(key))
+
+
+class Bucket:
+    def __init__(self):
+        self.sketch = CountMinSketch()
+        self.candidates = {}
+
+    def add(self, tag):
+        estimate = self.sketch.add(tag)
+        if tag in self.candidates or len(self.candidates) < CANDIDATES_PER_BUCKET:
+            self.candidates[tag] = estimate
+            return
+        # Remplacer le candidat le plus faible s'il est dépassé
+        weakest = min(self.candidates, key=self.candidates.get)
+        if estimate > self.candidates[weakest]:
+            del self.candidates[weakest]
+            self.candidates[tag] = estimate
+
+
+class TrendingEngine:
+    def __init__(self):
+        self.minutes = {}
+        self.hours = {}
+        self.counted = {}
+        self.synced_until = None
+        self.next_sync = 0
+        self.results = {}
+        self.lock = threading.Lock()
+
+    def add_post(self, post_id, content, created_at):
+        tags = extract_hashtags(content)
+        if not tags:
+            return
+        minute = int(created_at.timestamp() // 60)
+        with self.lock:
+            if post_id in self.counted or minute <= self._now_minute() - HOUR_BUCKETS * 60:
+                return
+            self.counted[post_id] = minute
+            self.results.clear()
+            for tag in tags:
+                self.minutes.setdefault(minute, Bucket()).add(tag)
+                self.hours.setdefault(minute // 60, Bucket()).add(tag)
+
+    def top(self, limit=5, window=DEFAULT_WINDOW):
+        """Les `limit` hashtags les plus utilisés sur les `window` dernières minutes"""
+        self._sync()
+        now = self._now_minute()
+        start = now - window + 1
+        with self.lock:
+            # Résultat mémorisé tant qu'aucun post n'est compté dans la même minute
+            key = (limit, window, now)
+            if key in self.results:
+                return self.results[key]
+            self.results.clear()
+            self._expire(now)
+            # Seaux minute depuis le début de l'heure entamée il y a MINUTE_BUCKETS minutes,
+            # seaux horaires avant : aucune minute de la fenêtre n'est perdue ni comptée deux fois
+            # (l'heure la plus ancienne, partiellement dans la fenêtre, compte au prorata)
+            boundary = self._minute_boundary(now)
+            buckets = [(bucket, 1) for minute, bucket in self.minutes.items() if minute >= max(start, boundary)]
+            buckets += [
+                (bucket, min((hour * 60 + 60 - start) / 60, 1)) for hour, bucket in self.hours.items()
+                if hour * 60 < boundary and hour * 60 + 59 >= start
+            ]
+
+            candidates = set()
+            for bucket, _ in buckets:
+                candidates.update(bucket.candidates)
+            scores = (
+                (round(sum(bucket.sketch.estimate(tag) * weight for bucket, weight in buckets)), tag)
+                for tag in candidates
+            )
+            self.results[key] = [{'tag': tag, 'count': count} for count, tag in heapq.nlargest(limit, scores)]
+            return self.results[key]
+
+    def _now_minute(self):
+        return int(time.time() // 60)
+
+    def _minute_boundary(self, now):
+        return (now - MINUTE_BUCKETS + 1) // 60 * 60
+
+    def _expire(self, now):
+        for minute in [m for m in self.minutes if m < self._minute_boundary(now)]:
+            del self.minutes[minute]
+        # L'heure entamée il y a HOUR_BUCKETS heures reste en partie dans la fenêtre
+        for hour in [h for h in self.hours if h < now // 60 - HOUR_BUCKETS]:
+            del self.hours[hour]
+        for post_id in [p for p, m in self.counted.items() if m <= now - HOUR_BUCKETS * 60]:
+            del self.counted[post_id]
+
+    def _sync(self):
+        """Compter les posts créés par les autres processus depuis la dernière lecture"""
+        if time.monotonic() < self.next_sync:
+            return
+        self.next_sync = time.monotonic() + SYNC_SECONDS
+
+        from .models import Post
+        if self.synced_until:
+            # Recouvrement pour les transactions validées après coup ; les doublons sont ignorés
+            since = self.synced_until - timedelta(seconds=SYNC_SECONDS)
+        else:
+            since = timezone.now() - timedelta(hours=HOUR_BUCKETS)
+        latest = self.synced_until or since
+        # Plage sur l'index de created_at ; les posts sans hashtag sont écartés en Python
+        rows = Post.objects.filter(created_at__gte=since).order_by('created_at')
+        for post_id, content, created_at in rows.values_list('id', 'content', 'created_at').iterator():
+            self.add_post(post_id, content, created_at)
+            latest = max(latest, created_at)
+        self.synced_until = latest
+
+
+engine = TrendingEngine()
@@ -1,24 +1,32 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.http import JsonResponse
-from django.db.models import Q
-from django.core.paginator import Paginator
-from .models import Post, Comment, Like
-from apps.social.models import Follow, Notification
+from . import tasks, threads
+from .models import Post, Comment, CommentLike, PostLike
+from .timeline import timeline_post_ids, hydrate_posts
+from apps.social import counters, outbox
+from apps.social.routers import replica_view
+from apps.api.pagination import CursorPaginator
 from .forms import PostForm, CommentForm
+from .serializers import prime_comments, prime_post_counts
 
 
 @login_required
+@replica_view
 def feed(request):
     """Fil d'actualités avec les posts des utilisateurs suivis"""
-    following_users = Follow.objects.filter(follower=request.user).values_list('following', flat=True)
-    posts = Post.objects.filter(
-        Q(author__in=following_users) | Q(author=request.user)
-    ).select_related('author', 'author__profile').prefetch_related('comments', 'post_likes')
-
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = CursorPaginator(timeline_post_ids(request.user), 10)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+
+    # Une seule requête pour charger les posts de la page
+    page_obj.object_list = hydrate_posts(
+        page_obj.object_list,
+        Post.objects.select_related('author', 'author__profile').prefetch_related('comments', 'post_likes')
+    )
+    request.viewer_state.prime_posts(page_obj)
+    prime_post_counts(page_obj)
+    counters.apply_live_counts([request.user.profile])
 
     context = {
         'posts': page_obj,
@@ -44,11 +52,10 @@ def create_post(request):
             else:
                 post.post_type = 'text'
 
-            post.save()
-
-            # Mettre à jour le compteur de posts
-            request.user.profile.posts_count += 1
-            request.user.profile.save()
+            # Compteur de posts et fils mis à jour par le worker de l'outbox
+            with transaction.atomic():
+                post.save()
+                outbox.enqueue(tasks.post_created, key=post.pk, author_id=request.user.id)
 
             return redirect('posts:feed')
     else:
@@ -58,35 +65,11 @@ def create_post(request):
 
 
 @login_required
+@replica_view
 def post_detail(request, pk):
     """Détails d'un post avec commentaires"""
     post = get_object_or_404(Post, pk=pk)
 
-    # Récupérer uniquement les commentaires de premier niveau (sans parent)
-    comments = post.comments.filter(parent=None).select_related(
-        'author',
-        'author__profile'
-    ).prefetch_related('replies', 'replies__author', 'replies__author__profile').order_by('-created_at')
-
-    # Pagination des commentaires
-    paginator = Paginator(comments, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
-    # Vérifier si l'utilisateur a liké le post
-    user_liked_post = Like.objects.filter(
-        user=request.user,
-        content_type='post',
-        post=post
-    ).exists()
-
-    # Récupérer les IDs des commentaires likés par l'utilisateur
-    user_liked_comments = Like.objects.filter(
-        user=request.user,
-        content_type='comment',
-        comment__post=post
-    ).values_list('comment_id', flat=True)
-
     if request.method == 'POST':
         form = CommentForm(request.POST)
         if form.is_valid():
@@ -97,47 +80,36 @@ def post_detail(request, pk):
             # Gérer les réponses aux commentaires
             parent_id = request.POST.get('parent_id')
             if parent_id:
-                parent_comment = get_object_or_404(Comment, id=parent_id)
-                comment.parent = parent_comment
-
-            comment.save()
-
-            # Mettre à jour le compteur
-            post.comments_count = post.comments.count()
-            post.save()
-
-            # Créer une notification
-            if post.author != request.user:
-                Notification.objects.create(
-                    recipient=post.author,
-                    sender=request.user,
-                    notification_type='comment',
-                    post=post,
-                    comment=comment,
-                    message=f"{request.user.username} a commenté votre post"
-                )
-
-            # Notification pour réponse à un commentaire
-            if parent_id and parent_comment.author != request.user:
-                Notification.objects.create(
-                    recipient=parent_comment.author,
-                    sender=request.user,
-                    notification_type='comment',
-                    post=post,
-                    comment=comment,
-                    message=f"{request.user.username} a répondu à votre commentaire"
-                )
+                comment.parent = get_object_or_404(Comment, id=parent_id)
+
+            # Compteur et notifications mis à jour par le worker de l'outbox
+            with transaction.atomic():
+                comment.save()
+                outbox.enqueue(tasks.comment_created, key=comment.pk, comment_id=comment.pk, post_id=post.pk)
 
             return redirect('posts:post_detail', pk=pk)
     else:
         form = CommentForm()
 
+    # Page de commentaires de premier niveau, puis leurs réponses en une requête
+    # (la page n'affiche qu'un niveau de réponses)
+    comments = threads.comments(post.comments.filter(parent=None)).order_by(*threads.ORDERING)
+    paginator = CursorPaginator(comments, 10)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    threads.attach_replies(page_obj, max_depth=1, per_branch=None)
+
+    # État "liké" du post et des commentaires de la page : une requête par relation
+    request.viewer_state.prime_posts([post])
+    prime_post_counts([post])
+    prime_comments(page_obj)
+    request.viewer_state.prime_comments(page_obj)
+    request.viewer_state.prime_comments(reply for comment in page_obj for reply in comment.tree_replies)
+
     context = {
         'post': post,
         'comments': page_obj,
         'form': form,
-        'user_liked_post': user_liked_post,
-        'user_liked_comments': list(user_liked_comments),
+        'user_liked_post': request.viewer_state.has_liked_post(post.id),
     }
     return render(request, 'posts/post_detail.html', context)
 
@@ -147,37 +119,17 @@ def like_post(request, pk):
     """Liker/unliker un post"""
     if request.method == 'POST':
         post = get_object_or_404(Post, pk=pk)
-        like, created = Like.objects.get_or_create(
-            user=request.user,
-            content_type='post',
-            post=post
-        )
-
-        if not created:
-            # Unlike
-            like.delete()
-            post.likes_count -= 1
-            liked = False
-        else:
-            # Like
-            post.likes_count += 1
-            liked = True
-
-            # Créer une notification
-            if post.author != request.user:
-                Notification.objects.create(
-                    recipient=post.author,
-                    sender=request.user,
-                    notification_type='like',
-                    post=post,
-                    message=f"{request.user.username} a aimé votre post"
-                )
-
-        post.save()
+        # Compteur et notification mis à jour par le worker : la réponse donne la valeur attendue
+        likes_count = counters.get_count(post, 'likes_count')
+        with transaction.atomic():
+            # INSERT ... ON CONFLICT DO NOTHING, ou DELETE si le like existait
+            liked, event = PostLike.objects.toggle(request.user.id, post.pk)
+            task = tasks.post_liked if liked else tasks.post_unliked
+            outbox.enqueue(task, key=event.pk, post_id=post.pk, user_id=request.user.id)
 
         return JsonResponse({
             'liked': liked,
-            'likes_count': post.likes_count
+            'likes_count': max(likes_count + (1 if liked else -1), 0)
         })
 
     return JsonResponse({'error': 'Method not allowed'}, status=405)
@@ -188,38 +140,17 @@ def like_comment(request, pk):
     """Liker/unliker un commentaire"""
     if request.method == 'POST':
         comment = get_object_or_404(Comment, pk=pk)
-        like, created = Like.objects.get_or_create(
-            user=request.user,
-            content_type='comment',
-            comment=comment
-        )
-
-        if not created:
-            # Unlike
-            like.delete()
-            comment.likes_count -= 1
-            liked = False
-        else:
-            # Like
-            comment.likes_count += 1
-            liked = True
-
-            # Créer une notification
-            if comment.author != request.user:
-                Notification.objects.create(
-                    recipient=comment.author,
-                    sender=request.user,
-                    notification_type='like',
-                    comment=comment,
-                    post=comment.post,
-                    message=f"{request.user.username} a aimé votre commentaire"
-                )
-
-        comment.save()
+        # Compteur et notification mis à jour par le worker : la réponse donne la valeur attendue
+        likes_count = counters.get_count(comment, 'likes_count')
+        with transaction.atomic():
+            # INSERT ... ON CONFLICT DO NOTHING, ou DELETE si le like existait
+            liked, event = CommentLike.objects.toggle(request.user.id, comment.pk)
+            task = tasks.comment_liked if liked else tasks.comment_unliked
+            outbox.enqueue(task, key=event.pk, comment_id=comment.pk, user_id=request.user.id)
 
         return JsonResponse({
             'liked': liked,
-            'likes_count': comment.likes_count
+            'likes_count': max(likes_count + (1 if liked else -1), 0)
         })
 
     return JsonResponse({'error': 'Method not allowed'}, status=405)
@@ -230,10 +161,12 @@ def delete_post(request, pk):
     """Supprimer un post"""
     post = get_object_or_404(Post, pk=pk, author=request.user)
     if request.method == 'POST':
-        request.user.profile.posts_count -= 1
-        request.user.profile.save()
-        post.delete()
+        # Compteur de posts mis à jour par le worker de l'outbox, comme à la création
+        with transaction.atomic():
+            outbox.enqueue(tasks.post_deleted, key=post.pk, author_id=request.user.id)
+            post.delete()
         return redirect('posts:feed')
+    prime_post_counts([post])
     return render(request, 'posts/delete_confirm.html', {'post': post})
 
 
@@ -244,12 +177,11 @@ def delete_comment(request, pk):
     post_id = comment.post.id
 
     if request.method == 'POST':
-        # Mettre à jour le compteur
-        post = comment.post
-        post.comments_count = post.comments.count() - 1
-        post.save()
-
-        comment.delete()
+        # Compteur mis à jour par le worker de l'outbox (les réponses sont supprimées en cascade)
+        with transaction.atomic():
+            outbox.enqueue(tasks.comments_deleted, key=comment.pk, post_id=post_id,
+                           count=threads.subtree_size(comment))
+            comment.delete()
         return redirect('posts:post_detail', pk=post_id)
 
     return render(request, 'posts/delete_comment_confirm.html', {'comment': comment})
@@ -290,36 +222,23 @@ def share_post(request, pk):
             # Partage avec commentaire personnalisé
             content = user_comment if user_comment else f"A partagé le post de {original_post.author.username}"
 
-        shared_post = Post.objects.create(
-            author=request.user,
-            content=content,
-            post_type='shared',
-            shared_post=original_post,
-            is_shared=True
-        )
-
-        # Incrémenter le compteur de partages du post original
-        original_post.shares_count += 1
-        original_post.save()
-
-        # Mettre à jour le compteur de posts de l'utilisateur
-        request.user.profile.posts_count += 1
-        request.user.profile.save()
-
-        # Créer une notification pour l'auteur du post original
-        if original_post.author != request.user:
-            Notification.objects.create(
-                recipient=original_post.author,
-                sender=request.user,
-                notification_type='like',  # Utiliser 'like' ou créer un nouveau type 'share'
-                post=original_post,
-                message=f"{request.user.username} a partagé votre post"
+        # Compteurs et notification mis à jour par le worker : la réponse donne la valeur attendue
+        shares_count = counters.get_count(original_post, 'shares_count')
+        with transaction.atomic():
+            shared_post = Post.objects.create(
+                author=request.user,
+                content=content,
+                post_type='shared',
+                shared_post=original_post,
+                is_shared=True
             )
+            outbox.enqueue(tasks.post_shared, key=shared_post.pk, shared_post_id=shared_post.pk,
+                           original_post_id=original_post.pk, user_id=request.user.id)
 
         # Retourner en JSON pour AJAX
         return JsonResponse({
             'success': True,
-            'shares_count': original_post.shares_count,
+            'shares_count': shares_count + 1,
             'shared_post_id': shared_post.id,
             'message': 'Post partagé avec succès',
             'redirect_url': f'/users/profile/{request.user.username}/'
@@ -342,21 +261,17 @@ def unshare_post(request, pk):
 
     if request.method == 'POST':
         original_post = shared_post.shared_post
+        shares_count = max(counters.get_count(original_post, 'shares_count') - 1, 0) if original_post else 0
 
-        # Décrémenter le compteur
-        if original_post:
-            original_post.shares_count -= 1
-            original_post.save()
-
-        # Mettre à jour le compteur de posts de l'utilisateur
-        request.user.profile.posts_count -= 1
-        request.user.profile.save()
-
-        shared_post.delete()
+        # Compteurs et notification mis à jour par le worker de l'outbox
+        with transaction.atomic():
+            outbox.enqueue(tasks.post_unshared, key=shared_post.pk,
+                           original_post_id=original_post.pk if original_post else None, user_id=request.user.id)
+            shared_post.delete()
 
         return JsonResponse({
             'success': True,
-            'shares_count': original_post.shares_count if original_post else 0
+            'shares_count': shares_count
         })
 
     return JsonResponse({'error': 'Method not allowed'}, status=405)
\ No newline at end of file
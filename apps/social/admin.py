@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Follow, Notification, Conversation, Message
+from .models import Follow, Notification, Conversation, Message, OutboxTask, Event, EventCheckpoint
 
 
 @admin.register(Follow)
@@ -22,3 +22,21 @@ class ConversationAdmin(admin.ModelAdmin):
 class MessageAdmin(admin.ModelAdmin):
 	list_display = ('id', 'conversation', 'sender', 'created_at')
 	search_fields = ('sender__username', 'content')
+
+
+@admin.register(OutboxTask)
+class OutboxTaskAdmin(admin.ModelAdmin):
+	list_display = ('id', 'task', 'status', 'attempts', 'run_after', 'created_at')
+	list_filter = ('status', 'task')
+	search_fields = ('idempotency_key',)
+
+
+@admin.register(Event)
+class EventAdmin(admin.ModelAdmin):
+	list_display = ('id', 'kind', 'created_at')
+	list_filter = ('kind',)
+
+
+@admin.register(EventCheckpoint)
+class EventCheckpointAdmin(admin.ModelAdmin):
+	list_display = ('consumer', 'position', 'updated_at')
@@ -0,0 +1,124 @@
+"""Écriture groupée des événements du chat.
+
+Les consumers d'un processus déposent messages et accusés (remis / lu) dans un
+tampon commun, vidé toutes les CHAT_WRITER_DELAY_MS millisecondes (ou dès
+CHAT_WRITER_MAX_BATCH messages) :
+- les messages sont insérés par bulk_create dans une seule transaction ;
+- les accusés sont fusionnés en « jusqu'au message X » par (conversation, lecteur),
+  soit une mise à jour de filigrane (voir inbox.mark_up_to) ;
+- la diffusion se fait par un seul group_send par conversation et par lot.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from . import inbox
+
+logger = logging.getLogger(__name__)
+
+DELAY = getattr(settings, 'CHAT_WRITER_DELAY_MS', 5) / 1000
+MAX_BATCH = getattr(settings, 'CHAT_WRITER_MAX_BATCH', 200)
+ACK_KINDS = ('delivered', 'read')
+
+
+def group_name(conversation_id):
+    return f'chat_{conversation_id}'
+
+
+class ChatWriter:
+    def __init__(self, loop):
+        self.loop = loop
+        self.messages = []
+        self.acks = {}
+        self.handle = None
+
+    def add_message(self, conversation_id, sender, content, temp_id=None, reply_channel=None):
+        self.messages.append((conversation_id, sender, content, temp_id, reply_channel))
+        if len(self.messages) >= MAX_BATCH:
+            self._flush_soon(0)
+        else:
+            self._flush_soon(DELAY)
+
+    def add_ack(self, kind, conversation_id, user, message_id):
+        """Accusé « jusqu'à message_id » : seul le plus grand id par lecteur est gardé"""
+        key = (kind, conversation_id, user.id)
+        current = self.acks.get(key)
+        if current is None or message_id > current[0]:
+            self.acks[key] = (message_id, user.username)
+        self._flush_soon(DELAY)
+
+    def _flush_soon(self, delay):
+        if self.handle is not None:
+            if delay:
+                return
+            self.handle.cancel()
+        self.handle = self.loop.call_later(delay, lambda: asyncio.ensure_future(self.flush()))
+
+    async def flush(self):
+        self.handle = None
+        messages, self.messages = self.messages, []
+        acks, self.acks = self.acks, {}
+        if not messages and not acks:
+            return
+
+        try:
+            events = await database_sync_to_async(self._persist)(messages, acks)
+        except Exception:
+            logger.exception("Échec de l'écriture de %d message(s) du chat", len(messages))
+            events = {}
+            for conversation_id, sender, content, temp_id, reply_channel in messages:
+                if reply_channel:
+                    await get_channel_layer().send(reply_channel, {
+                        'type': 'chat.broadcast',
+                        'payload': {'event': 'error', 'error': 'Message non enregistré', 'temp_id': temp_id},
+                    })
+
+        channel_layer = get_channel_layer()
+        for conversation_id, payloads in events.items():
+            await channel_layer.group_send(group_name(conversation_id), {
+                'type': 'chat.batch',
+                'payloads': payloads,
+            })
+
+    def _persist(self, messages, acks):
+        """Enregistrer le lot et retourner les événements à diffuser par conversation"""
+        events = defaultdict(list)
+
+        if messages:
+            saved = inbox.create_messages([(conversation_id, sender, content)
+                                           for conversation_id, sender, content, _, _ in messages])
+            for message, (_, _, _, temp_id, _) in zip(saved, messages):
+                payload = {'event': 'new_message', 'message': inbox.serialize_message(message)}
+                if temp_id:
+                    payload['temp_id'] = temp_id
+                events[message.conversation_id].append(payload)
+
+        for (kind, conversation_id, user_id), (message_id, username) in acks.items():
+            moved, at = inbox.mark_up_to(kind, conversation_id, user_id, message_id)
+            if moved:
+                events[conversation_id].append({
+                    'event': f'{kind}_up_to',
+                    'user': username,
+                    'message_id': message_id,
+                    'at': at.isoformat(),
+                })
+        return events
+
+
+_writers = {}
+
+
+def get_writer():
+    """Tampon du processus, lié à la boucle asyncio courante"""
+    loop = asyncio.get_running_loop()
+    writer = _writers.get(loop)
+    if writer is None:
+        # Une seule boucle en production ; on oublie celles qui sont fermées (tests)
+        for closed in [key for key in _writers if key.is_closed()]:
+            del _writers[closed]
+        writer = _writers[loop] = ChatWriter(loop)
+    return writer
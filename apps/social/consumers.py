@@ -1,15 +1,22 @@
 import json
+import logging
+
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.utils import timezone
 
-from .models import Conversation, Message
+from apps.api.pagination import InvalidCursor
+from . import inbox, notifier
+from .chat_writer import ACK_KINDS, get_writer, group_name
+from .models import Conversation
+
+logger = logging.getLogger(__name__)
 
 
 class ChatConsumer(AsyncJsonWebsocketConsumer):
     async def connect(self):
         self.conversation_id = self.scope['url_route']['kwargs']['conversation_id']
-        self.group_name = f'chat_{self.conversation_id}'
+        self.group_name = group_name(self.conversation_id)
+        self.participant = None
 
         # Join group
         await self.channel_layer.group_add(self.group_name, self.channel_name)
@@ -43,95 +50,115 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
 
     async def receive_json(self, content, **kwargs):
         """Handle incoming JSON messages with different actions:
-        - action: 'send' -> create Message and broadcast 'new_message' (includes temp_id if provided)
-        - action: 'delivered' -> mark message delivered and broadcast 'delivered'
-        - action: 'read' -> mark message read and broadcast 'read'
+        - action: 'send' -> queue the Message; the writer broadcasts 'new_message' (includes temp_id if provided)
+        - action: 'delivered' -> mark messages delivered up to message_id and broadcast 'delivered_up_to'
+        - action: 'read' -> mark messages read up to message_id and broadcast 'read_up_to'
+        - action: 'history' -> reply with a page of older messages ('before' cursor)
+          or the messages after 'since' (message id), to this socket only
         """
-        print(f"[DEBUG] receive_json: {content}")  # Debugging
         user = self.scope.get('user')
         if not user or not user.is_authenticated:
-            print(f"[DEBUG] User not authenticated")
             return
 
         action = content.get('action')
-        print(f"[DEBUG] action: {action}")
+        logger.debug("action %s (conversation %s)", action, self.conversation_id)
+
+        if action in ('send', 'delivered', 'read', 'history') and not await self._is_participant(user):
+            await self.send_json({'event': 'error', 'error': 'Conversation introuvable'})
+            return
 
         if action == 'send':
             message_text = content.get('message', '').strip()
             temp_id = content.get('temp_id')
-            print(f"[DEBUG] send: message_text={message_text}, temp_id={temp_id}")
             if not message_text:
                 return
-            message = await database_sync_to_async(self._save_message)(user, message_text)
-            print(f"[DEBUG] Message saved: {message.id}")
-
-            payload = {
-                'event': 'new_message',
-                'message': {
-                    'id': message.id,
-                    'sender': user.username,
-                    'content': message.content,
-                    'created_at': message.created_at.isoformat(),
-                    'delivered_at': message.delivered_at.isoformat() if message.delivered_at else None,
-                    'read_at': message.read_at.isoformat() if message.read_at else None,
-                }
-            }
-            if temp_id:
-                payload['temp_id'] = temp_id
-
-            print(f"[DEBUG] Sending payload: {payload}")
-            await self.channel_layer.group_send(self.group_name, {'type': 'chat.broadcast', 'payload': payload})
-
-        elif action == 'delivered':
-            message_id = content.get('message_id')
-            print(f"[DEBUG] delivered: message_id={message_id}")
-            if not message_id:
-                return
-            msg = await database_sync_to_async(self._mark_delivered)(message_id)
-            if msg:
-                payload = {
-                    'event': 'delivered',
-                    'message': {'id': msg.id, 'delivered_at': msg.delivered_at.isoformat()}
-                }
-                await self.channel_layer.group_send(self.group_name, {'type': 'chat.broadcast', 'payload': payload})
-
-        elif action == 'read':
-            message_id = content.get('message_id')
-            print(f"[DEBUG] read: message_id={message_id}")
-            if not message_id:
+            # Enregistré et diffusé par lot (voir chat_writer.py)
+            get_writer().add_message(self.conversation_id, user, message_text, temp_id, self.channel_name)
+
+        elif action in ACK_KINDS:
+            # Accusé « jusqu'à ce message » : les accusés rapprochés sont fusionnés
+            try:
+                message_id = int(content.get('message_id'))
+            except (TypeError, ValueError):
                 return
-            msg = await database_sync_to_async(self._mark_read)(message_id)
-            if msg:
-                payload = {
-                    'event': 'read',
-                    'message': {'id': msg.id, 'read_at': msg.read_at.isoformat()}
-                }
-                await self.channel_layer.group_send(self.group_name, {'type': 'chat.broadcast', 'payload': payload})
+            get_writer().add_ack(action, self.conversation_id, user, message_id)
+
+        elif action == 'history':
+            # Page de messages plus anciens (before) ou rattrapage après reconnexion (since)
+            try:
+                limit = min(int(content.get('limit', inbox.HISTORY_PAGE_SIZE)), inbox.HISTORY_MAX_PAGE_SIZE)
+            except (TypeError, ValueError):
+                limit = inbox.HISTORY_PAGE_SIZE
+            payload = await database_sync_to_async(self._history)(
+                user, content.get('before'), content.get('since'), max(limit, 1)
+            )
+            await self.send_json(payload)
 
     async def chat_broadcast(self, event):
         # Send payload JSON to WebSocket
         await self.send_json(event['payload'])
 
-    def _save_message(self, user, text):
-        conv = Conversation.objects.get(id=self.conversation_id)
-        return Message.objects.create(conversation=conv, sender=user, content=text, created_at=timezone.now())
+    async def chat_batch(self, event):
+        # Un lot du ChatWriter : un message WebSocket par événement
+        for payload in event['payloads']:
+            await self.send_json(payload)
+
+    async def _is_participant(self, user):
+        # Vérifié une fois par connexion plutôt qu'à chaque message
+        if self.participant is None:
+            self.participant = await database_sync_to_async(
+                Conversation.objects.filter(id=self.conversation_id, participants=user).exists
+            )()
+        return self.participant
+
+    def _history(self, user, before, since, limit):
+        if since:
+            try:
+                since = int(since)
+            except (TypeError, ValueError):
+                return {'event': 'error', 'error': 'Message introuvable'}
+            result = inbox.messages_since(self.conversation_id, since, limit)
+            if result is None:
+                return {'event': 'error', 'error': 'Message introuvable'}
+            messages, has_more = result
+            return {
+                'event': 'history',
+                'mode': 'since',
+                'messages': [inbox.serialize_message(m) for m in messages],
+                'has_more': has_more,
+            }
 
-    def _mark_delivered(self, message_id):
-        try:
-            m = Message.objects.get(id=message_id)
-            if not m.delivered_at:
-                m.delivered_at = timezone.now()
-                m.save()
-            return m
-        except Message.DoesNotExist:
-            return None
-
-    def _mark_read(self, message_id):
         try:
-            m = Message.objects.get(id=message_id)
-            if not m.read_at:
-                m.read_at = timezone.now()
-                m.save()
-            return m
-        except Message.DoesNotExist:
-            return None
+            messages, previous_cursor = inbox.message_history(self.conversation_id, before, limit)
+        except InvalidCursor:
+            return {'event': 'error', 'error': 'Curseur invalide'}
+        return {
+            'event': 'history',
+            'mode': 'before',
+            'messages': [inbox.serialize_message(m) for m in messages],
+            'before': previous_cursor,
+            'has_more': previous_cursor is not None,
+        }
+
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """Pousse les nouvelles notifications et le nombre de non lues de l'utilisateur"""
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if not user or not user.is_authenticated:
+            await self.close()
+            return
+
+        self.group_name = notifier.group_name(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        count = await database_sync_to_async(notifier.unread_count)(user)
+        await self.send_json({'event': 'unread', 'unread_count': count})
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def notification_push(self, event):
+        await self.send_json(event['payload'])
@@ -0,0 +1,161 @@
+"""Compteurs d'engagement à écriture différée.
+
+Un like, un partage ou un abonnement n'écrit qu'une ligne dans CounterDelta
+(INSERT pur, sans verrou sur la ligne du post). `flush()` agrège périodiquement
+ces deltas dans les colonnes des modèles ; les lectures passent par le cache,
+qui contient la valeur de la colonne plus les deltas en attente.
+"""
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import CounterDelta, Follow
+
+COUNTER_FIELDS = {
+    'posts.post': ('likes_count', 'comments_count', 'shares_count'),
+    'posts.comment': ('likes_count',),
+    'users.profile': ('followers_count', 'following_count', 'posts_count'),
+}
+CACHE_TIMEOUT = getattr(settings, 'COUNTER_CACHE_TIMEOUT', 300)
+
+
+def _label(instance):
+    label = instance._meta.label_lower
+    if label not in COUNTER_FIELDS:
+        raise ValueError(f"Aucun compteur défini pour {label}")
+    return label
+
+
+def _cache_key(label, object_id, field):
+    return f'counter:{label}:{object_id}:{field}'
+
+
+def increment(instance, field, delta=1):
+    """Enregistrer un incrément (ou décrément) de compteur"""
+    label = _label(instance)
+    if field not in COUNTER_FIELDS[label]:
+        raise ValueError(f"{field} n'est pas un compteur de {label}")
+
+    CounterDelta.objects.create(model=label, object_id=instance.pk, field=field, delta=delta)
+    # Après validation seulement : une tâche de l'outbox annulée ne doit pas fausser le cache
+    transaction.on_commit(lambda: _incr_cached(_cache_key(label, instance.pk, field), delta))
+
+
+def _incr_cached(key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Pas encore en cache : la prochaine lecture recalculera la valeur
+        pass
+
+
+def decrement(instance, field):
+    increment(instance, field, -1)
+
+
+def apply_live_counts(instances, fields=None):
+    """Remplacer les compteurs des instances par leur valeur à jour (cache + deltas)"""
+    instances = list(instances)
+    if not instances:
+        return instances
+
+    label = _label(instances[0])
+    fields = fields or COUNTER_FIELDS[label]
+    # Une même ligne peut apparaître plusieurs fois (auteur de plusieurs posts)
+    by_pk = {}
+    for instance in instances:
+        by_pk.setdefault(instance.pk, []).append(instance)
+    keys = {_cache_key(label, pk, field): (pk, field) for pk in by_pk for field in fields}
+    cached = cache.get_many(keys.keys())
+
+    missing = [key for key in keys if key not in cached]
+    if missing:
+        pending = CounterDelta.objects.filter(
+            model=label,
+            object_id__in={keys[key][0] for key in missing},
+            field__in=fields
+        ).values('object_id', 'field').annotate(total=Sum('delta'))
+        totals = {(row['object_id'], row['field']): row['total'] for row in pending}
+
+        fresh = {}
+        for key in missing:
+            pk, field = keys[key]
+            fresh[key] = getattr(by_pk[pk][0], field) + totals.get((pk, field), 0)
+        cache.set_many(fresh, CACHE_TIMEOUT)
+        cached.update(fresh)
+
+    for key, (pk, field) in keys.items():
+        for instance in by_pk[pk]:
+            setattr(instance, field, cached[key])
+    return instances
+
+
+def get_count(instance, field):
+    """Valeur à jour d'un compteur"""
+    apply_live_counts([instance], [field])
+    return getattr(instance, field)
+
+
+def flush():
+    """Agréger les deltas en attente dans les colonnes des modèles"""
+    batch = uuid.uuid4()
+    updated = 0
+    with transaction.atomic():
+        # Réserver les deltas : deux agrégations concurrentes ne traitent pas les mêmes lignes
+        CounterDelta.objects.filter(batch__isnull=True).update(batch=batch)
+        claimed = CounterDelta.objects.filter(batch=batch)
+
+        totals = claimed.values('model', 'object_id', 'field').annotate(total=Sum('delta'))
+        for row in totals.iterator():
+            if not row['total']:
+                continue
+            model = apps.get_model(row['model'])
+            updated += model.objects.filter(pk=row['object_id']).update(
+                **{row['field']: F(row['field']) + row['total']}
+            )
+        claimed.delete()
+    return updated
+
+
+def _count_subquery(queryset, column, outer='pk'):
+    """Sous-requête COUNT(*) des lignes dont `column` vaut `outer`, 0 si aucune ligne"""
+    counts = queryset.filter(**{column: OuterRef(outer)}).order_by().values(column).annotate(
+        total=Count('pk')
+    ).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def reconcile():
+    """Recalculer tous les compteurs depuis PostLike, CommentLike, Follow, Post et Comment.
+
+    Les valeurs encore en cache restent servies jusqu'à leur expiration
+    (COUNTER_CACHE_TIMEOUT).
+    """
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    PostLike = apps.get_model('posts', 'PostLike')
+    CommentLike = apps.get_model('posts', 'CommentLike')
+    Profile = apps.get_model('users', 'Profile')
+
+    with transaction.atomic():
+        CounterDelta.objects.all().delete()
+        Post.objects.update(
+            likes_count=_count_subquery(PostLike.objects.all(), 'post'),
+            comments_count=_count_subquery(Comment.objects.all(), 'post'),
+            shares_count=_count_subquery(Post.objects.filter(is_shared=True), 'shared_post'),
+        )
+        Comment.objects.update(
+            likes_count=_count_subquery(CommentLike.objects.all(), 'comment'),
+        )
+
+        # Les profils sont liés à l'utilisateur, pas à leur propre clé primaire
+        Profile.objects.update(
+            followers_count=_count_subquery(Follow.objects.all(), 'following', 'user_id'),
+            following_count=_count_subquery(Follow.objects.all(), 'follower', 'user_id'),
+            posts_count=_count_subquery(Post.objects.all(), 'author', 'user_id'),
+        )
@@ -0,0 +1,104 @@
+"""Flux d'événements du domaine et consommateurs.
+
+Chaque écriture métier (post créé, like, abonnement, message...) ajoute un Event
+dans la même transaction, depuis les signaux des modèles : l'événement existe si
+et seulement si l'écriture est validée. L'id de l'événement est sa position dans
+le flux.
+
+Un consommateur (sous-classe de Consumer, déclarée dans EVENT_CONSUMERS) lit le
+flux par lots à partir de sa position enregistrée dans EventCheckpoint ; le
+traitement d'un lot et l'avancée de la position sont validés ensemble.
+`manage.py consume_events` fait tourner les consommateurs, et `--reset` permet
+de rejouer le flux pour reconstruire une donnée dérivée.
+
+Les ids sont attribués à l'insertion mais validés dans le désordre : un trou
+dans la suite peut être une transaction encore en cours. La lecture s'arrête au
+premier trou tant que l'événement suivant a moins de EVENT_GAP_TIMEOUT_SECONDS ;
+au-delà, l'id manquant est considéré comme annulé.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Event, EventCheckpoint
+
+BATCH_SIZE = getattr(settings, 'EVENT_BATCH_SIZE', 500)
+GAP_TIMEOUT = timedelta(seconds=getattr(settings, 'EVENT_GAP_TIMEOUT_SECONDS', 30))
+RETENTION = timedelta(days=getattr(settings, 'EVENT_RETENTION_DAYS', 30))
+
+
+def record(kind, **data):
+    """Ajouter un événement au flux (dans la transaction en cours)"""
+    return Event.objects.create(kind=kind, data=data)
+
+
+def record_many(kind, items):
+    """Ajouter plusieurs événements de même nature en une requête"""
+    now = timezone.now()
+    return Event.objects.bulk_create([Event(kind=kind, data=data, created_at=now) for data in items])
+
+
+class Consumer:
+    """Consommateur du flux : `handle` reçoit les événements d'un lot, dans l'ordre.
+
+    `handle` doit supporter d'être rejoué (après `--reset`) sur des données déjà
+    traitées.
+    """
+    name = None
+    kinds = None  # Natures d'événements traitées (toutes si None)
+
+    def handle(self, events):
+        raise NotImplementedError
+
+
+def get_consumers():
+    return [import_string(path)() for path in getattr(settings, 'EVENT_CONSUMERS', [])]
+
+
+def read(after, limit=BATCH_SIZE):
+    """Événements suivant la position `after`, sans franchir un trou récent"""
+    events = []
+    expected = after + 1
+    horizon = timezone.now() - GAP_TIMEOUT
+    for event in Event.objects.filter(pk__gt=after).order_by('pk')[:limit]:
+        if event.pk != expected and event.created_at > horizon:
+            break
+        events.append(event)
+        expected = event.pk + 1
+    return events
+
+
+def run_batch(consumer, limit=BATCH_SIZE):
+    """Traiter le lot suivant d'un consommateur ; retourne le nombre d'événements lus"""
+    with transaction.atomic():
+        checkpoint, _ = EventCheckpoint.objects.select_for_update().get_or_create(consumer=consumer.name)
+        events = read(checkpoint.position, limit)
+        if not events:
+            return 0
+        wanted = [event for event in events if consumer.kinds is None or event.kind in consumer.kinds]
+        if wanted:
+            consumer.handle(wanted)
+        checkpoint.position = events[-1].pk
+        checkpoint.save(update_fields=['position', 'updated_at'])
+    return len(events)
+
+
+def reset(consumer_name, position=0):
+    """Repositionner un consommateur (0 : rejouer tout le flux conservé)"""
+    EventCheckpoint.objects.update_or_create(consumer=consumer_name, defaults={'position': position})
+
+
+def prune():
+    """Supprimer les événements anciens déjà traités par tous les consommateurs"""
+    names = [consumer.name for consumer in get_consumers()]
+    positions = dict(EventCheckpoint.objects.filter(consumer__in=names).values_list('consumer', 'position'))
+    if len(positions) < len(names):
+        return 0
+    deleted, _ = Event.objects.filter(
+        pk__lte=min(positions.values(), default=0),
+        created_at__lt=timezone.now() - RETENTION,
+    ).delete()
+    return deleted
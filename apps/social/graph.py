@@ -0,0 +1,122 @@
+"""Index en mémoire du graphe d'abonnements.
+
+Pour chaque utilisateur consulté, la liste de ses abonnements et celle de ses
+abonnés sont gardées dans le processus sous forme de tableaux d'entiers triés
+(array('q')), partagés entre les requêtes. Les tests d'appartenance et les
+intersections se font par recherche dichotomique, sans requête SQL.
+
+Les signaux de Follow invalident les entrées du processus courant après la
+validation de la transaction (voir models.py) ; celles des autres processus expirent après FOLLOW_GRAPH_TTL secondes.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .models import Follow
+
+TTL = getattr(settings, 'FOLLOW_GRAPH_TTL', 30)
+MAX_USERS = getattr(settings, 'FOLLOW_GRAPH_MAX_USERS', 100000)
+
+
+def _contains(ids, value):
+    i = bisect_left(ids, value)
+    return i < len(ids) and ids[i] == value
+
+
+def _intersection_size(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(1 for value in a if _contains(b, value))
+
+
+class Adjacency:
+    """Listes d'adjacence d'un sens du graphe, avec expiration et éviction LRU"""
+
+    def __init__(self, key_field, value_field):
+        self.key_field = key_field
+        self.value_field = value_field
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, user_ids):
+        """Tableaux triés des voisins de chaque utilisateur, chargés en une requête si besoin"""
+        now = time.monotonic()
+        result = {}
+        missing = []
+        with self.lock:
+            for user_id in set(user_ids):
+                entry = self.entries.get(user_id)
+                if entry is not None and entry[0] > now:
+                    self.entries.move_to_end(user_id)
+                    result[user_id] = entry[1]
+                else:
+                    missing.append(user_id)
+
+        if missing:
+            loaded = {user_id: array('q') for user_id in missing}
+            rows = Follow.objects.filter(**{f'{self.key_field}__in': missing}).order_by(
+                self.key_field, self.value_field
+            ).values_list(self.key_field, self.value_field)
+            for user_id, neighbour_id in rows.iterator():
+                loaded[user_id].append(neighbour_id)
+
+            with self.lock:
+                for user_id, ids in loaded.items():
+                    self.entries[user_id] = (now + TTL, ids)
+                    self.entries.move_to_end(user_id)
+                while len(self.entries) > MAX_USERS:
+                    self.entries.popitem(last=False)
+            result.update(loaded)
+        return result
+
+    def get(self, user_id):
+        return self.get_many([user_id])[user_id]
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class FollowGraph:
+    def __init__(self):
+        self.following = Adjacency('follower_id', 'following_id')
+        self.followers = Adjacency('following_id', 'follower_id')
+
+    def following_ids(self, user_id):
+        return self.following.get(user_id)
+
+    def follower_ids(self, user_id):
+        return self.followers.get(user_id)
+
+    def is_following(self, user_id, target_id):
+        return _contains(self.following.get(user_id), target_id)
+
+    def following_among(self, user_id, target_ids):
+        """Sous-ensemble de `target_ids` suivi par l'utilisateur"""
+        ids = self.following.get(user_id)
+        return {target_id for target_id in target_ids if _contains(ids, target_id)}
+
+    def mutual_count(self, user_id, target_id):
+        """Nombre de comptes suivis à la fois par les deux utilisateurs"""
+        adjacency = self.following.get_many([user_id, target_id])
+        return _intersection_size(adjacency[user_id], adjacency[target_id])
+
+    def invalidate(self, follower_id, following_id):
+        """Un abonnement a été créé ou supprimé"""
+        self.following.invalidate(follower_id)
+        self.followers.invalidate(following_id)
+
+    def clear(self):
+        self.following.clear()
+        self.followers.clear()
+
+
+graph = FollowGraph()
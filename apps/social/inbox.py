@@ -0,0 +1,206 @@
+"""Boîte de réception : un résumé dénormalisé par conversation et par participant.
+
+ConversationSummary garde le dernier message, la date de dernière activité et les
+filigranes de réception et de lecture (« lu jusqu'au message X ») ; le nombre de
+non lus et l'état de chaque message en sont déduits. Les écritures du chat
+(chat_writer.py) le tiennent à jour dans la même transaction que les messages ;
+la liste des conversations est alors une seule requête sur l'index
+(user, -last_activity_at).
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DateTimeField, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from apps.api.pagination import CursorPaginator, encode_cursor
+from . import events
+from .models import Conversation, ConversationSummary, Message
+
+HISTORY_PAGE_SIZE = getattr(settings, 'CHAT_HISTORY_PAGE_SIZE', 30)
+HISTORY_MAX_PAGE_SIZE = 100
+
+
+def get_or_create_direct(user, other):
+    """Conversation à deux entre `user` et `other`, créée si besoin.
+
+    Retourne (conversation, created). La paire (user_low, user_high) est unique :
+    deux créations simultanées aboutissent à la même conversation.
+    """
+    user_low, user_high = sorted((user.id, other.id))
+    try:
+        return Conversation.objects.get(user_low_id=user_low, user_high_id=user_high), False
+    except Conversation.DoesNotExist:
+        pass
+
+    try:
+        with transaction.atomic():
+            conversation = Conversation.objects.create(user_low_id=user_low, user_high_id=user_high)
+            conversation.participants.add(user_low, user_high)
+        return conversation, True
+    except IntegrityError:
+        # Créée entre-temps par une autre requête
+        return Conversation.objects.get(user_low_id=user_low, user_high_id=user_high), False
+
+
+def sync_participants(conversation):
+    """Créer ou mettre à jour les résumés après un changement de participants"""
+    participant_ids = list(conversation.participants.values_list('id', flat=True))
+    last_message = conversation.messages.order_by('-created_at', '-id').first()
+    last_activity_at = last_message.created_at if last_message else conversation.created_at
+
+    with transaction.atomic():
+        ConversationSummary.objects.filter(conversation=conversation).exclude(user_id__in=participant_ids).delete()
+        ConversationSummary.objects.bulk_create(
+            [
+                ConversationSummary(
+                    conversation=conversation,
+                    user_id=user_id,
+                    last_message=last_message,
+                    last_activity_at=last_activity_at,
+                )
+                for user_id in participant_ids
+            ],
+            ignore_conflicts=True,
+        )
+        for user_id in participant_ids:
+            others = [other_id for other_id in participant_ids if other_id != user_id]
+            ConversationSummary.objects.filter(conversation=conversation, user_id=user_id).update(
+                other_participant_id=others[0] if len(others) == 1 else None
+            )
+
+
+def create_messages(items):
+    """Enregistrer des messages (conversation_id, expéditeur, contenu) en une transaction.
+
+    Les résumés des participants sont mis à jour une fois par conversation, quel
+    que soit le nombre de messages.
+    """
+    with transaction.atomic():
+        messages = Message.objects.bulk_create([
+            Message(conversation_id=conversation_id, sender=sender, content=content)
+            for conversation_id, sender, content in items
+        ])
+        events.record_many('message.sent', [
+            {'message_id': message.pk, 'conversation_id': message.conversation_id, 'sender_id': message.sender_id}
+            for message in messages
+        ])
+
+        latest = {message.conversation_id: message for message in messages}
+        for conversation_id, message in latest.items():
+            ConversationSummary.objects.filter(conversation_id=conversation_id).update(
+                last_message=message, last_activity_at=message.created_at
+            )
+    return messages
+
+
+def create_message(conversation_id, sender, content):
+    return create_messages([(conversation_id, sender, content)])[0]
+
+
+def mark_up_to(kind, conversation_id, user_id, message_id):
+    """Avancer le filigrane 'delivered' ou 'read' de `user_id` jusqu'à `message_id`.
+
+    Une seule mise à jour du résumé, quel que soit le nombre de messages couverts ;
+    un message lu est aussi remis. Retourne (filigrane avancé ?, horodatage).
+    """
+    now = timezone.now()
+    # Le filigrane ne peut pas dépasser un message qui n'existe pas encore
+    if not Message.objects.filter(conversation_id=conversation_id, id=message_id).exists():
+        return False, now
+
+    changes = {f'{kind}_up_to': message_id, f'{kind}_updated_at': now}
+    if kind == 'read':
+        changes['delivered_up_to'] = Greatest(F('delivered_up_to'), Value(message_id))
+        # Horodatage de remise avancé avec le filigrane (valeurs avant la mise à jour)
+        changes['delivered_updated_at'] = Case(
+            When(delivered_up_to__lt=message_id, then=Value(now, output_field=DateTimeField())),
+            default=F('delivered_updated_at'),
+        )
+    moved = ConversationSummary.objects.filter(
+        conversation_id=conversation_id, user_id=user_id, **{f'{kind}_up_to__lt': message_id}
+    ).update(**changes)
+    return bool(moved), now
+
+
+def unread_count():
+    """Expression : messages reçus après le filigrane de lecture d'un résumé"""
+    unread = Message.objects.filter(
+        conversation=OuterRef('conversation'),
+        id__gt=OuterRef('read_up_to')
+    ).exclude(sender=OuterRef('user')).order_by().values('conversation').annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(unread, output_field=IntegerField()), Value(0))
+
+
+def apply_receipts(messages, conversation_id):
+    """Renseigner delivered_at / read_at de chaque message d'après les filigranes.
+
+    Un message est remis (lu) quand tous les autres participants l'ont dépassé ;
+    l'horodatage est celui du dernier déplacement de leur filigrane.
+    """
+    summaries = list(ConversationSummary.objects.filter(conversation_id=conversation_id).values(
+        'user_id', 'delivered_up_to', 'delivered_updated_at', 'read_up_to', 'read_updated_at'
+    ))
+    for message in messages:
+        others = [summary for summary in summaries if summary['user_id'] != message.sender_id]
+        for kind in ('delivered', 'read'):
+            reached = others and all(summary[f'{kind}_up_to'] >= message.id for summary in others)
+            setattr(message, f'{kind}_at', max(
+                (summary[f'{kind}_updated_at'] for summary in others if summary[f'{kind}_updated_at']),
+                default=None
+            ) if reached else None)
+    return messages
+
+
+def inbox(user):
+    """Conversations à deux de l'utilisateur, de la plus récente à la plus ancienne"""
+    return ConversationSummary.objects.filter(
+        user=user,
+        other_participant__isnull=False
+    ).annotate(
+        unread_count=unread_count()
+    ).select_related(
+        'other_participant', 'other_participant__profile', 'last_message'
+    ).order_by('-last_activity_at', '-id')
+
+
+def serialize_message(message):
+    return {
+        'id': message.id,
+        'sender': message.sender.username,
+        'content': message.content,
+        'created_at': message.created_at.isoformat(),
+        'delivered_at': message.delivered_at.isoformat() if getattr(message, 'delivered_at', None) else None,
+        'read_at': message.read_at.isoformat() if getattr(message, 'read_at', None) else None,
+    }
+
+
+def message_history(conversation_id, before=None, limit=HISTORY_PAGE_SIZE):
+    """Messages précédant le curseur `before` (les plus récents sans curseur).
+
+    Retourne (messages du plus ancien au plus récent, curseur de la page précédente
+    ou None). Lève InvalidCursor si le curseur est illisible.
+    """
+    messages = Message.objects.filter(conversation_id=conversation_id).select_related('sender').order_by(
+        '-created_at', '-id'
+    )
+    page = CursorPaginator(messages, limit).page(before)
+    return apply_receipts(list(reversed(page.object_list)), conversation_id), page.next_cursor
+
+
+def messages_since(conversation_id, message_id, limit=HISTORY_MAX_PAGE_SIZE):
+    """Messages postérieurs à `message_id`, pour rattraper une reconnexion.
+
+    Retourne (messages du plus ancien au plus récent, reste-t-il des messages),
+    ou None si le message de référence n'appartient pas à la conversation.
+    """
+    anchor = Message.objects.filter(conversation_id=conversation_id, id=message_id).values_list(
+        'created_at', 'id'
+    ).first()
+    if anchor is None:
+        return None
+    messages = Message.objects.filter(conversation_id=conversation_id).select_related('sender').order_by(
+        'created_at', 'id'
+    )
+    page = CursorPaginator(messages, limit).page(encode_cursor(list(anchor)))
+    return apply_receipts(page.object_list, conversation_id), page.has_next()
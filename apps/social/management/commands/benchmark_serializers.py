@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from apps.api import fast
+from apps.posts.serializers import PostSerializer, post_list_queryset
+from apps.social.models import Notification
+from apps.social.serializers import NotificationSerializer
+from apps.users.models import CustomUser
+from apps.users.serializers import UserSerializer
+
+
+def drf_render(serializer_class, objects, context):
+    return JSONRenderer().render(serializer_class(objects, many=True, context=context).data)
+
+
+def fast_render(serializer_class, objects, context):
+    return fast.dumps(fast.plan_for(serializer_class).dump_many(objects, context))
+
+
+class Command(BaseCommand):
+    help = ("Compare le coût par objet des serializers DRF et de la lecture rapide "
+            "(apps/api/fast.py) sur les données de la base, et vérifie que les deux "
+            "sorties sont identiques")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=50, help="Objets par liste")
+        parser.add_argument('--repeat', type=int, default=20, help="Rendus mesurés par chemin")
+
+    def handle(self, *args, **options):
+        viewer = CustomUser.objects.order_by('pk').first()
+        if viewer is None:
+            raise CommandError("Base vide : aucun utilisateur")
+        request = RequestFactory().get('/api/')
+        request.user = viewer
+        context = {'request': request}
+        limit = options['limit']
+
+        cases = [
+            ('posts', PostSerializer, list(post_list_queryset()[:limit])),
+            ('notifications', NotificationSerializer, list(
+                Notification.objects.select_related('sender', 'sender__profile')[:limit])),
+            ('utilisateurs', UserSerializer, list(CustomUser.objects.select_related('profile')[:limit])),
+        ]
+        self.stdout.write(f"{'liste':<14} {'objets':>6} {'DRF µs/obj':>11} {'rapide µs/obj':>14} {'gain':>6}")
+        for label, serializer_class, objects in cases:
+            if not objects:
+                self.stdout.write(f"{label:<14} {0:>6}  (rien à mesurer)")
+                continue
+            expected = drf_render(serializer_class, objects, context)
+            if fast_render(serializer_class, objects, context) != expected:
+                raise CommandError(f"{label} : la lecture rapide diffère de la sortie DRF")
+
+            timings = [self.measure(render, serializer_class, objects, context, options['repeat'])
+                       for render in (drf_render, fast_render)]
+            drf_cost, fast_cost = (timing / len(objects) * 1e6 for timing in timings)
+            self.stdout.write(
+                f"{label:<14} {len(objects):>6} {drf_cost:>11.1f} {fast_cost:>14.1f} {drf_cost / fast_cost:>5.1f}x"
+            )
+
+    @staticmethod
+    def measure(render, serializer_class, objects, context, repeat):
+        """Meilleur temps d'un rendu complet (requêtes de préparation comprises)"""
+        best = float('inf')
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            render(serializer_class, objects, context)
+            best = min(best, time.perf_counter() - start)
+        return best
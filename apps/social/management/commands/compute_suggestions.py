@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users.models import CustomUser
+from apps.social import suggestions
+
+
+class Command(BaseCommand):
+    help = "Recalcule les suggestions d'utilisateurs à suivre à partir du graphe d'abonnements"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Nom de l'utilisateur à recalculer (tous par défaut)")
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = CustomUser.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"Utilisateur introuvable : {options['user']}")
+            total = suggestions.rebuild_for_user(user.id)
+        else:
+            total = suggestions.rebuild_all()
+
+        self.stdout.write(self.style.SUCCESS(f"{total} suggestions calculées"))
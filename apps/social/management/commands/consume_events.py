@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.social import events
+
+
+class Command(BaseCommand):
+    help = "Fait avancer les consommateurs du flux d'événements (EVENT_CONSUMERS)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', action='append',
+                            help="Ne faire tourner que ce consommateur (répétable)")
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Tourner en continu, en attendant N secondes quand le flux est à jour")
+        parser.add_argument('--batch', type=int, default=events.BATCH_SIZE,
+                            help="Nombre d'événements lus par lot")
+        parser.add_argument('--reset', type=int, metavar='POSITION',
+                            help="Repositionner les consommateurs avant de démarrer (0 : tout rejouer)")
+
+    def handle(self, *args, **options):
+        consumers = events.get_consumers()
+        if options['consumer']:
+            unknown = set(options['consumer']) - {consumer.name for consumer in consumers}
+            if unknown:
+                raise CommandError(f"Consommateur(s) inconnu(s) : {', '.join(sorted(unknown))}")
+            consumers = [consumer for consumer in consumers if consumer.name in options['consumer']]
+
+        if options['reset'] is not None:
+            for consumer in consumers:
+                events.reset(consumer.name, options['reset'])
+                self.stdout.write(f"{consumer.name} repositionné à {options['reset']}")
+
+        while True:
+            behind = False
+            for consumer in consumers:
+                read = events.run_batch(consumer, options['batch'])
+                if read:
+                    self.stdout.write(f"{consumer.name} : {read} événement(s)")
+                behind = behind or read >= options['batch']
+            if behind:
+                continue
+            # Flux à jour : ménage, puis attente (ou fin)
+            events.prune()
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
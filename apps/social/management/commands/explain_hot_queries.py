@@ -0,0 +1,105 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.posts.models import Comment, CommentLike, Post, PostLike
+from apps.posts.timeline import timeline_post_ids
+from apps.social import inbox, suggestions
+from apps.social.models import (
+    Conversation, CounterDelta, Event, Follow, Message, Notification, OutboxTask, Suggestion,
+)
+from apps.users.models import CustomUser
+
+# Parcours complet d'une table : « SCAN table » sans index (SQLite), « Seq Scan on table » (PostgreSQL)
+SQLITE_FULL_SCAN = re.compile(r'\bSCAN (?!CONSTANT ROW)(?!\()(\w+)\b(?! USING)')
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+def hot_queries(user_id, post_id, conversation_id):
+    """Requêtes des vues et des workers, telles qu'elles sont construites par le code"""
+    user = CustomUser(pk=user_id)
+    now = timezone.now()
+    entries, pulled = timeline_post_ids(user)
+    return [
+        ("fil : entrées matérialisées", entries[:11]),
+        ("fil : auteurs lus à la volée", pulled[:11]),
+        ("profil : posts de l'auteur", Post.objects.filter(author_id=user_id).order_by('-created_at', '-id')[:11]),
+        ("API : derniers posts", Post.objects.order_by('-created_at', '-id')[:11]),
+        ("tendances : posts récents", Post.objects.filter(
+            created_at__gte=now - timedelta(hours=1)).order_by('created_at')),
+        ("post : commentaires de premier niveau", Comment.objects.filter(
+            post_id=post_id, parent=None).order_by('-created_at', '-id')[:11]),
+        ("post : réponses", Comment.objects.filter(parent_id__in=[post_id])),
+        ("API : commentaires d'un post", Comment.objects.filter(post_id=post_id).order_by('-created_at', '-id')[:11]),
+        ("fils : réponses d'une page de commentaires", Comment.objects.filter(
+            root_id__in=[post_id], depth__gt=0, depth__lte=3).order_by('depth', '-created_at', '-id')),
+        ("likes de la page (posts)", PostLike.objects.filter(
+            user_id=user_id, post_id__in=[post_id]).values_list('post_id')),
+        ("likes de la page (commentaires)", CommentLike.objects.filter(
+            user_id=user_id, comment_id__in=[post_id]).values_list('comment_id')),
+        ("notifications", Notification.objects.filter(recipient_id=user_id)[:20]),
+        ("notifications non lues", Notification.objects.filter(
+            recipient_id=user_id, is_read=False).order_by().values('pk')),
+        ("regroupement des notifications", Notification.objects.filter(
+            recipient_id=user_id, group_key='post_like:1', updated_at__gte=now).order_by('-updated_at')[:1]),
+        ("boîte de réception", inbox.inbox(user)[:21]),
+        ("historique d'une conversation", Message.objects.filter(
+            conversation_id=conversation_id).order_by('-created_at', '-id')[:21]),
+        ("graphe : abonnements", Follow.objects.filter(
+            follower_id__in=[user_id]).order_by('follower_id', 'following_id').values_list('follower_id', 'following_id')),
+        ("graphe : abonnés", Follow.objects.filter(
+            following_id__in=[user_id]).order_by('following_id', 'follower_id').values_list('following_id', 'follower_id')),
+        ("API : abonnés d'un utilisateur", Follow.objects.filter(
+            following_id=user_id).order_by('-created_at', '-id')[:11]),
+        ("API : abonnements d'un utilisateur", Follow.objects.filter(
+            follower_id=user_id).order_by('-created_at', '-id')[:11]),
+        ("suggestions : amis d'amis", suggestions.mutual_candidates(user_id)),
+        ("suggestions", Suggestion.objects.filter(user_id=user_id).order_by('-score')[:10]),
+        ("compteurs en attente", CounterDelta.objects.filter(
+            model='posts.post', object_id__in=[post_id], field__in=['likes_count'])),
+        ("outbox : tâches dues", OutboxTask.objects.filter(
+            status='pending', run_after__lte=now).order_by('id').values_list('id')[:100]),
+        ("flux d'événements", Event.objects.filter(pk__gt=0).order_by('pk')[:500]),
+    ]
+
+
+class Command(BaseCommand):
+    help = ("Affiche le plan d'exécution des requêtes chaudes et échoue si l'une d'elles "
+            "parcourt une table entière")
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            full_scan = SQLITE_FULL_SCAN
+        elif connection.vendor == 'postgresql':
+            full_scan = POSTGRES_FULL_SCAN
+        else:
+            raise CommandError(f"Base {connection.vendor} non prise en charge")
+
+        user_id = CustomUser.objects.values_list('pk', flat=True).first() or 1
+        post_id = Post.objects.values_list('pk', flat=True).first() or 1
+        conversation_id = Conversation.objects.values_list('pk', flat=True).first() or 1
+
+        failures = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Sur de petites tables le planificateur préfère le parcours séquentiel :
+                # on vérifie qu'un index existe, pas le choix fait pour ce volume
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for label, queryset in hot_queries(user_id, post_id, conversation_id):
+                plan = queryset.explain()
+                tables = sorted(set(full_scan.findall(plan)))
+                if tables:
+                    failures.append(label)
+                    self.stdout.write(self.style.ERROR(f"ÉCHEC  {label} : parcours complet de {', '.join(tables)}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"OK     {label}"))
+                if tables or options['verbosity'] > 1:
+                    self.stdout.write('\n'.join(f'       {line}' for line in plan.splitlines()))
+
+        if failures:
+            raise CommandError(f"{len(failures)} requête(s) sans index : {', '.join(failures)}")
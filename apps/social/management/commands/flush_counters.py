@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.social import counters
+
+
+class Command(BaseCommand):
+    help = "Agrège les incréments de compteurs en attente dans Post, Comment et Profile"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Relancer l'agrégation toutes les N secondes (une seule fois par défaut)")
+
+    def handle(self, *args, **options):
+        while True:
+            updated = counters.flush()
+            self.stdout.write(f"{updated} compteur(s) mis à jour")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
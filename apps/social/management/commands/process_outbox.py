@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.social import outbox
+
+
+class Command(BaseCommand):
+    help = "Exécute les effets de bord en attente dans l'outbox (compteurs, notifications, fils)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Tourner en continu, en attendant N secondes quand la file est vide")
+        parser.add_argument('--batch', type=int, default=outbox.BATCH_SIZE,
+                            help="Nombre de tâches réservées à la fois")
+        parser.add_argument('--retry-failed', action='store_true',
+                            help="Remettre d'abord en file les tâches abandonnées")
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            self.stdout.write(f"{outbox.retry_failed()} tâche(s) remise(s) en file")
+
+        while True:
+            claimed, done = outbox.run_pending(options['batch'])
+            if claimed:
+                self.stdout.write(f"{done}/{claimed} tâche(s) exécutée(s)")
+            if claimed < options['batch']:
+                # File vide : ménage, puis attente (ou fin)
+                outbox.prune()
+                if not options['interval']:
+                    break
+                time.sleep(options['interval'])
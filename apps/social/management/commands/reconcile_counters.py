@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.social import counters
+
+
+class Command(BaseCommand):
+    help = "Recalcule tous les compteurs d'engagement depuis les tables PostLike, CommentLike, Follow, Post et Comment"
+
+    def handle(self, *args, **options):
+        counters.reconcile()
+        self.stdout.write(self.style.SUCCESS("Compteurs recalculés"))
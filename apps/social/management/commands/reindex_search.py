@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.models import CustomUser
+from apps.posts.models import Post
+from apps.social import search
+
+MODELS = {
+    'users': CustomUser,
+    'posts': Post,
+}
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte des utilisateurs et des posts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=MODELS.keys(), action='append',
+                            help="Index à reconstruire (tous par défaut)")
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help="Nombre de lignes lues et indexées par lot")
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        backend.create_tables()
+
+        for name in options['model'] or MODELS:
+            total = search.reindex(MODELS[name], chunk_size=options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f"{name} : {total} ligne(s) indexée(s)"))
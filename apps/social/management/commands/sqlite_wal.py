@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = ("Passe une base SQLite en journal WAL (les lectures ne bloquent plus les "
+            "écritures). Réglage persistant, enregistré dans le fichier : à lancer une "
+            "fois par base, pas à chaque connexion")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help="Alias de la base")
+        parser.add_argument('--off', action='store_true',
+                            help="Revenir au journal par défaut (DELETE)")
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"{options['database']} n'est pas une base SQLite")
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode={'DELETE' if options['off'] else 'WAL'}")
+            mode = cursor.fetchone()[0]
+        self.stdout.write(f"{connection.settings_dict['NAME']} : journal_mode={mode}")
@@ -0,0 +1,28 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import routers
+from .viewer_state import get_viewer_state
+
+
+class ViewerStateMiddleware:
+    """Attache `request.viewer_state`, le chargeur par lots de l'état du visiteur"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.viewer_state = SimpleLazyObject(lambda: get_viewer_state(request.user))
+        return self.get_response(request)
+
+
+class ReplicaPinMiddleware:
+    """Garde sur `default` les lectures d'un visiteur qui vient d'écrire (voir routers.py)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if routers.replica_enabled() and request.method not in routers.SAFE_METHODS:
+            response.set_cookie(routers.PIN_COOKIE, '1', max_age=routers.PIN_SECONDS, httponly=True, samesite='Lax')
+        return response
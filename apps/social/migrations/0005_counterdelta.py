@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0004_message_delivered_at_message_read_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CounterDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('field', models.CharField(max_length=50)),
+                ('delta', models.IntegerField()),
+                ('batch', models.UUIDField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'object_id', 'field'], name='counterdelta_target_idx'), models.Index(fields=['batch'], name='counterdelta_batch_idx')],
+            },
+        ),
+    ]
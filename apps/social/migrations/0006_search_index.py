@@ -0,0 +1,78 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:52
+
+from django.db import migrations
+
+# Tables d'index telles qu'elles étaient à la création de cette migration : le
+# code de apps.social.search peut évoluer, pas l'historique
+TABLES = {
+    'search_user': ('users', 'CustomUser', ('username', 'email', 'bio')),
+    'search_post': ('posts', 'Post', ('content',)),
+}
+CHUNK_SIZE = 1000
+
+
+def _create_table(cursor, vendor, table, fields):
+    if vendor == 'sqlite':
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+            f"{', '.join(fields)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+    else:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} (object_id bigint PRIMARY KEY, document tsvector NOT NULL)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_document_idx ON {table} USING GIN (document)")
+
+
+def _insert(cursor, vendor, table, fields, rows):
+    if vendor == 'sqlite':
+        cursor.executemany(
+            f"INSERT INTO {table} (rowid, {', '.join(fields)}) VALUES (%s, {', '.join(['%s'] * len(fields))})",
+            [tuple('' if value is None else value for value in row) for row in rows]
+        )
+    else:
+        cursor.executemany(
+            f"INSERT INTO {table} (object_id, document) VALUES (%s, to_tsvector('simple', unaccent(%s)))",
+            [(row[0], ' '.join(str(value) for value in row[1:] if value)) for row in rows]
+        )
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    # Autres bases : recherche par LIKE, sans index
+    if vendor not in ('sqlite', 'postgresql'):
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'postgresql':
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+        for table, (app_label, model_name, fields) in TABLES.items():
+            _create_table(cursor, vendor, table, fields)
+            rows = apps.get_model(app_label, model_name).objects.order_by('pk').values_list('pk', *fields)
+            chunk = []
+            for row in rows.iterator(chunk_size=CHUNK_SIZE):
+                chunk.append(row)
+                if len(chunk) >= CHUNK_SIZE:
+                    _insert(cursor, vendor, table, fields, chunk)
+                    chunk = []
+            if chunk:
+                _insert(cursor, vendor, table, fields, chunk)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_timelineentry'),
+        ('social', '0005_counterdelta'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_summaries(apps, schema_editor):
+    Conversation = apps.get_model('social', 'Conversation')
+    ConversationSummary = apps.get_model('social', 'ConversationSummary')
+    Message = apps.get_model('social', 'Message')
+
+    summaries = []
+    for conversation in Conversation.objects.prefetch_related('participants').iterator(chunk_size=500):
+        participant_ids = [user.id for user in conversation.participants.all()]
+        last_message = Message.objects.filter(conversation=conversation).order_by('-created_at', '-id').first()
+        for user_id in participant_ids:
+            others = [other_id for other_id in participant_ids if other_id != user_id]
+            summaries.append(ConversationSummary(
+                conversation=conversation,
+                user_id=user_id,
+                other_participant_id=others[0] if len(others) == 1 else None,
+                last_message=last_message,
+                last_activity_at=last_message.created_at if last_message else conversation.created_at,
+                unread_count=Message.objects.filter(
+                    conversation=conversation, read_at__isnull=True
+                ).exclude(sender_id=user_id).count(),
+            ))
+    ConversationSummary.objects.bulk_create(summaries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0007_suggestion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_activity_at', models.DateTimeField()),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='social.conversation')),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='social.message')),
+                ('other_participant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-last_activity_at', '-id'], name='inbox_user_activity_idx')],
+                'unique_together': {('conversation', 'user')},
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
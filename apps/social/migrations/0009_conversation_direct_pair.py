@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def merge_direct_conversations(apps, schema_editor):
+    """Fusionner les conversations à deux en double, puis renseigner la paire canonique"""
+    Conversation = apps.get_model('social', 'Conversation')
+    ConversationSummary = apps.get_model('social', 'ConversationSummary')
+    Message = apps.get_model('social', 'Message')
+
+    pairs = {}
+    for conversation in Conversation.objects.prefetch_related('participants').order_by('id').iterator(chunk_size=500):
+        participant_ids = sorted(user.id for user in conversation.participants.all())
+        if len(participant_ids) == 2:
+            pairs.setdefault(tuple(participant_ids), []).append(conversation.id)
+
+    for (user_low, user_high), conversation_ids in pairs.items():
+        keeper, duplicates = conversation_ids[0], conversation_ids[1:]
+        Conversation.objects.filter(id=keeper).update(user_low_id=user_low, user_high_id=user_high)
+        if not duplicates:
+            continue
+
+        # La plus ancienne conversation récupère les messages des autres
+        Message.objects.filter(conversation_id__in=duplicates).update(conversation_id=keeper)
+        Conversation.objects.filter(id__in=duplicates).delete()
+
+        last_message = Message.objects.filter(conversation_id=keeper).order_by('-created_at', '-id').first()
+        for user_id in (user_low, user_high):
+            ConversationSummary.objects.filter(conversation_id=keeper, user_id=user_id).update(
+                last_message=last_message,
+                last_activity_at=last_message.created_at if last_message else Conversation.objects.get(id=keeper).created_at,
+                unread_count=Message.objects.filter(
+                    conversation_id=keeper, read_at__isnull=True
+                ).exclude(sender_id=user_id).count(),
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0008_conversationsummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='user_high',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='user_low',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(merge_direct_conversations, migrations.RunPython.noop),
+    ]
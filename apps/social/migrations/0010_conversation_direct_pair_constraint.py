@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0009_conversation_direct_pair'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(fields=('user_low', 'user_high'), name='conversation_direct_pair'),
+        ),
+    ]
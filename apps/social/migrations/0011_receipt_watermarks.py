@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:49
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def build_watermarks(apps, schema_editor):
+    """Filigranes initiaux : dernier message reçu marqué remis / lu par participant"""
+    ConversationSummary = apps.get_model('social', 'ConversationSummary')
+    Message = apps.get_model('social', 'Message')
+
+    for summary in ConversationSummary.objects.iterator(chunk_size=500):
+        received = Message.objects.filter(conversation_id=summary.conversation_id).exclude(sender_id=summary.user_id)
+        for kind in ('delivered', 'read'):
+            marks = received.filter(**{f'{kind}_at__isnull': False}).aggregate(
+                up_to=Max('id'), updated_at=Max(f'{kind}_at')
+            )
+            setattr(summary, f'{kind}_up_to', marks['up_to'] or 0)
+            setattr(summary, f'{kind}_updated_at', marks['updated_at'])
+        summary.delivered_up_to = max(summary.delivered_up_to, summary.read_up_to)
+        summary.save(update_fields=['delivered_up_to', 'delivered_updated_at', 'read_up_to', 'read_updated_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0010_conversation_direct_pair_constraint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationsummary',
+            name='delivered_up_to',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversationsummary',
+            name='delivered_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversationsummary',
+            name='read_up_to',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversationsummary',
+            name='read_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(build_watermarks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:49
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0011_receipt_watermarks'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='conversationsummary',
+            name='unread_count',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='delivered_at',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='read_at',
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:53
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_groups(apps, schema_editor):
+    """Notifications existantes : un auteur chacune, clé de regroupement déduite du type"""
+    Notification = apps.get_model('social', 'Notification')
+
+    for notification in Notification.objects.select_related('sender').iterator(chunk_size=500):
+        if notification.notification_type == 'follow':
+            group_key = 'follow'
+        elif notification.notification_type == 'like' and 'partagé' in notification.message:
+            group_key = f'post_share:{notification.post_id}'
+        elif notification.notification_type == 'like' and notification.comment_id:
+            group_key = f'comment_like:{notification.comment_id}'
+        elif notification.notification_type == 'like':
+            group_key = f'post_like:{notification.post_id}'
+        elif notification.notification_type == 'comment' and 'répondu' in notification.message:
+            group_key = ''  # Le commentaire parent n'est pas connu
+        elif notification.notification_type == 'comment':
+            group_key = f'post_comment:{notification.post_id}'
+        else:
+            group_key = ''
+        Notification.objects.filter(pk=notification.pk).update(
+            group_key=group_key,
+            notification_type='share' if group_key.startswith('post_share') else notification.notification_type,
+            recent_actors=[[notification.sender_id, notification.sender.username]],
+            updated_at=notification.created_at,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_timelineentry'),
+        ('social', '0012_remove_per_message_receipts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='notification',
+            options={'ordering': ['-updated_at']},
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='actor_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='group_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='recent_actors',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-updated_at'], name='notification_recipient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'group_key', '-updated_at'], name='notification_group_idx'),
+        ),
+        migrations.RunPython(backfill_groups, migrations.RunPython.noop),
+    ]
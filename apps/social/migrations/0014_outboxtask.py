@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:57
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0013_notification_grouping'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(max_length=200)),
+                ('payload', models.JSONField(default=dict)),
+                ('idempotency_key', models.CharField(max_length=200, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claim', models.UUIDField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after', 'id'], name='outbox_pending_idx')],
+            },
+        ),
+    ]
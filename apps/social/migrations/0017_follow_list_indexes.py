@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0016_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['following', '-created_at', '-id'], name='follow_following_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['follower', '-created_at', '-id'], name='follow_follower_created_idx'),
+        ),
+    ]
@@ -1,4 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from apps.users.models import CustomUser
 
 
@@ -9,11 +13,64 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ('follower', 'following')
+        indexes = [
+            # Abonnés d'un utilisateur, triés (graph.py) ; l'index unique sert l'autre sens
+            models.Index(fields=['following', 'follower'], name='follow_following_idx'),
+            # Listes paginées des abonnés et des abonnements (API)
+            models.Index(fields=['following', '-created_at', '-id'], name='follow_following_created_idx'),
+            models.Index(fields=['follower', '-created_at', '-id'], name='follow_follower_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.follower.username} follows {self.following.username}"
 
 
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        from . import events, outbox, tasks
+        from .graph import graph
+        # Après validation : un lecteur concurrent remettrait sinon en cache l'ancien graphe
+        transaction.on_commit(lambda: graph.invalidate(instance.follower_id, instance.following_id))
+        events.record('follow.created', follower_id=instance.follower_id, following_id=instance.following_id)
+        outbox.enqueue(tasks.follow_edge_added, key=instance.pk,
+                       follower_id=instance.follower_id, following_id=instance.following_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    from . import events, outbox, tasks
+    from .graph import graph
+    transaction.on_commit(lambda: graph.invalidate(instance.follower_id, instance.following_id))
+    events.record('follow.deleted', follower_id=instance.follower_id, following_id=instance.following_id)
+    outbox.enqueue(tasks.follow_edge_removed, key=instance.pk,
+                   follower_id=instance.follower_id, following_id=instance.following_id)
+
+
+@receiver(post_save, sender=CustomUser)
+def user_created(sender, instance, created, **kwargs):
+    if created:
+        from . import outbox, tasks
+        outbox.enqueue(tasks.user_joined, key=instance.pk, user_id=instance.pk)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender='posts.Post')
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    from .search import INDEXES, index_instance
+    # Une connexion ne modifie que last_login : rien à réindexer
+    if update_fields and not set(update_fields) & set(INDEXES[instance._meta.label_lower][1]):
+        return
+    index_instance(instance)
+
+
+@receiver(post_delete, sender=CustomUser)
+@receiver(post_delete, sender='posts.Post')
+def remove_from_search_index(sender, instance, **kwargs):
+    from .search import remove_instance
+    remove_instance(instance)
+
+
 class Notification(models.Model):
     NOTIFICATION_TYPES = (
         ('like', 'Like'),
@@ -31,18 +88,50 @@ class Notification(models.Model):
     message = models.CharField(max_length=255)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Regroupement : un seul enregistrement par (destinataire, group_key) sur la fenêtre
+    group_key = models.CharField(max_length=64, blank=True, default='')
+    actor_count = models.PositiveIntegerField(default=1)
+    recent_actors = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['recipient', '-updated_at'], name='notification_recipient_idx'),
+            models.Index(fields=['recipient', 'group_key', '-updated_at'], name='notification_group_idx'),
+            # Compteur et marquage des non lues
+            models.Index(fields=['recipient'], condition=Q(is_read=False), name='notification_unread_idx'),
+        ]
 
     def __str__(self):
         return f"Notification for {self.recipient.username}: {self.message}"
 
 
+@receiver(post_save, sender=Notification)
+def notification_created(sender, instance, created, **kwargs):
+    if created:
+        from .notifier import notification_created
+        notification_created(instance)
+
+
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    from .notifier import notification_deleted
+    notification_deleted(instance)
+
+
 class Conversation(models.Model):
     participants = models.ManyToManyField(CustomUser, related_name='conversations')
+    # Conversation à deux : paire canonique (plus petit id, plus grand id), unique
+    user_low = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    user_high = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_low', 'user_high'], name='conversation_direct_pair'),
+        ]
+
     def __str__(self):
         return f"Conversation {self.id} ({', '.join([u.username for u in self.participants.all()])})"
 
@@ -52,11 +141,137 @@ class Message(models.Model):
     sender = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='sent_messages')
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
-    delivered_at = models.DateTimeField(null=True, blank=True)
-    read_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Historique paginé d'une conversation
+            models.Index(fields=['conversation', '-created_at', '-id'], name='message_history_idx'),
+            # Non lus après un filigrane (inbox.unread_count) : l'index couvre aussi l'expéditeur
+            models.Index(fields=['conversation', 'id', 'sender'], name='message_unread_idx'),
+        ]
+
+    def __str__(self):
+        return f"Message {self.id} by {self.sender.username}"
+
+
+class ConversationSummary(models.Model):
+    """Résumé d'une conversation pour un participant (boîte de réception)"""
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='summaries')
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='conversation_summaries')
+    # Renseigné uniquement pour les conversations à deux
+    other_participant = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    last_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_activity_at = models.DateTimeField()
+    # Accusés de réception : messages reçus remis / lus jusqu'à cet id inclus
+    delivered_up_to = models.PositiveBigIntegerField(default=0)
+    delivered_updated_at = models.DateTimeField(null=True, blank=True)
+    read_up_to = models.PositiveBigIntegerField(default=0)
+    read_updated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('conversation', 'user')
+        indexes = [
+            models.Index(fields=['user', '-last_activity_at', '-id'], name='inbox_user_activity_idx'),
+        ]
+
+    def __str__(self):
+        return f"Conversation {self.conversation_id} for {self.user_id} (read up to {self.read_up_to})"
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def conversation_participants_changed(sender, instance, action, reverse, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        from .inbox import sync_participants
+        sync_participants(instance)
+
+
+class Suggestion(models.Model):
+    """Compte suggéré à un utilisateur, précalculé depuis le graphe d'abonnements"""
+    REASONS = (
+        ('mutual', 'Mutual'),
+        ('popular', 'Popular'),
+        ('new', 'New'),
+    )
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='suggestions')
+    candidate = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    mutual_count = models.IntegerField(default=0)
+    reason = models.CharField(max_length=10, choices=REASONS)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'candidate')
+        indexes = [
+            models.Index(fields=['user', '-score'], name='suggestion_user_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.candidate_id} suggested to {self.user_id} ({self.score:.1f})"
+
+
+class CounterDelta(models.Model):
+    """Incrément de compteur en attente d'agrégation (table append-only)"""
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    field = models.CharField(max_length=50)
+    delta = models.IntegerField()
+    batch = models.UUIDField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'object_id', 'field'], name='counterdelta_target_idx'),
+            models.Index(fields=['batch'], name='counterdelta_batch_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model}#{self.object_id}.{self.field} {self.delta:+d}"
+
+
+class OutboxTask(models.Model):
+    """Effet de bord différé, exécuté par `manage.py process_outbox` (voir outbox.py)"""
+    STATUSES = (
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    task = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict)
+    idempotency_key = models.CharField(max_length=200, unique=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    claim = models.UUIDField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after', 'id'], name='outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} [{self.idempotency_key}] {self.status}"
+
+
+class Event(models.Model):
+    """Événement du domaine (table append-only) ; l'id sert de position dans le flux (voir events.py)"""
+    kind = models.CharField(max_length=50)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind}"
+
+
+class EventCheckpoint(models.Model):
+    """Dernière position du flux traitée par un consommateur"""
+    consumer = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"Message {self.id} by {self.sender.username}"
\ No newline at end of file
+        return f"{self.consumer} @ {self.position}"
@@ -0,0 +1,227 @@
+"""Notifications regroupées, en temps réel, et compteur de non lues en cache.
+
+Les événements de même nature sur la même cible (likes d'un post, abonnements...)
+sont regroupés par destinataire sur NOTIFICATION_GROUP_WINDOW_HOURS : un seul
+enregistrement porte le nombre d'auteurs et les derniers d'entre eux
+(« alice et 41 autres personnes ont aimé votre post »), mis à jour sur place et
+décrémenté à l'annulation (unlike, désabonnement, fin de partage).
+
+Le nombre de notifications non lues de chaque utilisateur est gardé en cache,
+incrémenté à la création et décrémenté à la lecture, une fois la transaction
+validée : le badge ne compte jamais la table. Chaque nouvelle notification est poussée au groupe
+`notifications_<id>` que rejoint NotificationConsumer.
+"""
+import logging
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+# Le cache se recale sur la table à expiration (suppressions en cascade, redémarrages)
+CACHE_TIMEOUT = getattr(settings, 'NOTIFICATION_COUNT_CACHE_TIMEOUT', 24 * 3600)
+GROUP_WINDOW = timedelta(hours=getattr(settings, 'NOTIFICATION_GROUP_WINDOW_HOURS', 24))
+RECENT_ACTORS = 3
+
+# Nature -> (notification_type, texte pour un auteur, texte pour plusieurs)
+KINDS = {
+    'post_like': ('like', "a aimé votre post", "ont aimé votre post"),
+    'comment_like': ('like', "a aimé votre commentaire", "ont aimé votre commentaire"),
+    'post_comment': ('comment', "a commenté votre post", "ont commenté votre post"),
+    'comment_reply': ('comment', "a répondu à votre commentaire", "ont répondu à votre commentaire"),
+    'post_share': ('share', "a partagé votre post", "ont partagé votre post"),
+    'follow': ('follow', "vous suit maintenant", "vous suivent maintenant"),
+}
+
+
+def group_name(user_id):
+    return f'notifications_{user_id}'
+
+
+def _cache_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def _count(user_id):
+    key = _cache_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+        cache.add(key, count, CACHE_TIMEOUT)
+    return count
+
+
+def unread_count(user):
+    """Nombre de notifications non lues, depuis le cache (recompté si absent)"""
+    return _count(user.pk)
+
+
+def _adjust(user_id, delta):
+    try:
+        return max(cache.incr(_cache_key(user_id), delta), 0)
+    except ValueError:
+        # Pas en cache : recompter (appelé après validation, la table est à jour)
+        return _count(user_id)
+
+
+def serialize(notification):
+    return {
+        'id': notification.id,
+        'sender': notification.sender.username,
+        'notification_type': notification.notification_type,
+        'post': notification.post_id,
+        'comment': notification.comment_id,
+        'message': notification.message,
+        'actor_count': notification.actor_count,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.isoformat(),
+        'updated_at': notification.updated_at.isoformat(),
+    }
+
+
+def _push(user_id, payload):
+    try:
+        async_to_sync(get_channel_layer().group_send)(group_name(user_id), {
+            'type': 'notification.push',
+            'payload': payload,
+        })
+    except Exception:
+        # Couche de canaux indisponible : la notification reste visible au rechargement
+        logger.warning("Notification non poussée à l'utilisateur %s", user_id, exc_info=True)
+
+
+def _publish(notification, delta):
+    # Compteur ajusté et notification poussée après validation : une transaction
+    # annulée ne laisse rien en cache
+    recipient_id = notification.recipient_id
+    payload = {'event': 'notification', 'notification': serialize(notification)}
+
+    def publish():
+        payload['unread_count'] = _adjust(recipient_id, delta) if delta else _count(recipient_id)
+        _push(recipient_id, payload)
+    transaction.on_commit(publish)
+
+
+def notification_created(notification):
+    _publish(notification, 0 if notification.is_read else 1)
+
+
+def _group_key(kind, target):
+    return f'{kind}:{target.pk}' if target is not None else kind
+
+
+def _message(kind, actors, actor_count):
+    _, single, plural = KINDS[kind]
+    names = [username for _, username in actors]
+    if actor_count == 1 and names:
+        return f"{names[0]} {single}"
+    if actor_count == 2 and len(names) == 2:
+        return f"{names[0]} et {names[1]} {plural}"
+    if names:
+        others = actor_count - 1
+        return f"{names[0]} et {others} autre{'s' if others > 1 else ''} personne{'s' if others > 1 else ''} {plural}"
+    if actor_count == 1:
+        return f"1 personne {single}"
+    return f"{actor_count} personnes {plural}"
+
+
+def notify(kind, recipient, sender, target=None, post=None, comment=None):
+    """Notifier `recipient` qu'un nouvel auteur a agi sur `target`.
+
+    Met à jour la notification regroupée de la fenêtre en cours, ou en crée une.
+    """
+    if recipient.pk == sender.pk:
+        return None
+    group_key = _group_key(kind, target)
+    now = timezone.now()
+
+    with transaction.atomic():
+        notification = Notification.objects.select_for_update().filter(
+            recipient=recipient, group_key=group_key, updated_at__gte=now - GROUP_WINDOW
+        ).order_by('-updated_at').first()
+
+        if notification is None:
+            return Notification.objects.create(
+                recipient=recipient,
+                sender=sender,
+                notification_type=KINDS[kind][0],
+                post=post,
+                comment=comment,
+                group_key=group_key,
+                recent_actors=[[sender.pk, sender.username]],
+                message=_message(kind, [[sender.pk, sender.username]], 1),
+                updated_at=now,
+            )
+
+        actors = [actor for actor in notification.recent_actors if actor[0] != sender.pk]
+        if len(actors) == len(notification.recent_actors):
+            notification.actor_count += 1
+        notification.recent_actors = [[sender.pk, sender.username]] + actors[:RECENT_ACTORS - 1]
+        notification.sender = sender
+        notification.post = post
+        notification.comment = comment
+        notification.message = _message(kind, notification.recent_actors, notification.actor_count)
+        notification.updated_at = now
+        was_read, notification.is_read = notification.is_read, False
+        notification.save()
+
+    _publish(notification, 1 if was_read else 0)
+    return notification
+
+
+def retract(kind, recipient, sender, target=None):
+    """Retirer `sender` de la notification regroupée (unlike, désabonnement...)"""
+    group_key = _group_key(kind, target)
+    with transaction.atomic():
+        notification = Notification.objects.select_for_update().filter(
+            recipient=recipient, group_key=group_key
+        ).order_by('-updated_at').first()
+        if notification is None:
+            return
+
+        actors = [actor for actor in notification.recent_actors if actor[0] != sender.pk]
+        if len(actors) == notification.actor_count:
+            # Tous les auteurs sont connus et sender n'en fait pas partie
+            return
+        if notification.actor_count <= 1:
+            # Le signal post_delete met à jour le compteur de non lues
+            notification.delete()
+            return
+
+        notification.actor_count -= 1
+        notification.recent_actors = actors
+        if actors and notification.sender_id == sender.pk:
+            notification.sender_id = actors[0][0]
+        notification.message = _message(kind, actors, notification.actor_count)
+        notification.save(update_fields=['actor_count', 'recent_actors', 'sender', 'message'])
+
+
+def _decrement(user_id):
+    try:
+        cache.decr(_cache_key(user_id))
+    except ValueError:
+        pass
+
+
+def notification_deleted(notification):
+    if not notification.is_read:
+        recipient_id = notification.recipient_id
+        transaction.on_commit(lambda: _decrement(recipient_id))
+
+
+def mark_read(user, queryset=None):
+    """Marquer comme lues les notifications de `user` (toutes, ou celles du queryset)"""
+    queryset = Notification.objects.filter(recipient=user) if queryset is None else queryset
+    updated = queryset.filter(recipient=user, is_read=False).update(is_read=True)
+    if updated:
+        transaction.on_commit(
+            lambda: _push(user.pk, {'event': 'unread', 'unread_count': _adjust(user.pk, -updated)})
+        )
+    return updated
@@ -0,0 +1,121 @@
+"""File locale des effets de bord des écritures (outbox).
+
+Une vue n'écrit que sa donnée principale et dépose, dans la même transaction,
+une OutboxTask décrivant le reste (compteurs, notifications, fils...). Le worker
+`manage.py process_outbox` réserve les tâches dues par lots et les exécute, sans
+broker externe :
+- une tâche s'exécute dans une transaction qui l'acquitte aussi : ses écritures
+  et son passage à « done » sont validés ensemble, ou pas du tout ;
+- la clé d'idempotence est unique : redéposer la même tâche est sans effet ;
+- une tâche en erreur est relancée avec un délai exponentiel, puis marquée
+  « failed » après OUTBOX_MAX_ATTEMPTS essais ;
+- une tâche réservée par un worker arrêté redevient due après OUTBOX_LEASE_SECONDS.
+"""
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboxTask
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'OUTBOX_BATCH_SIZE', 100)
+MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+RETRY_DELAY = getattr(settings, 'OUTBOX_RETRY_DELAY_SECONDS', 2)
+LEASE = timedelta(seconds=getattr(settings, 'OUTBOX_LEASE_SECONDS', 300))
+RETENTION = timedelta(days=getattr(settings, 'OUTBOX_RETENTION_DAYS', 7))
+
+
+class LeaseLost(Exception):
+    """La tâche a été reprise par un autre worker pendant son exécution"""
+
+
+def task_path(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, key=None, **payload):
+    """Déposer l'appel différé `func(**payload)`.
+
+    `key` identifie l'événement pour cette tâche (id du like, du post...) : une
+    tâche déjà déposée avec la même clé n'est pas redéposée. Le payload doit
+    être sérialisable en JSON.
+    """
+    name = task_path(func)
+    key = f'{name}:{key if key is not None else uuid.uuid4()}'
+    OutboxTask.objects.bulk_create(
+        [OutboxTask(task=name, payload=payload, idempotency_key=key)],
+        ignore_conflicts=True,
+    )
+
+
+def claim(limit=BATCH_SIZE):
+    """Réserver jusqu'à `limit` tâches dues, dans l'ordre de dépôt"""
+    now = timezone.now()
+    token = uuid.uuid4()
+    due = list(
+        OutboxTask.objects.filter(status='pending', run_after__lte=now).order_by('id').values_list('id', flat=True)[:limit]
+    )
+    if not due:
+        return []
+    # La condition sur run_after écarte les lignes réservées entre-temps par un autre worker
+    OutboxTask.objects.filter(pk__in=due, status='pending', run_after__lte=now).update(
+        claim=token, run_after=now + LEASE
+    )
+    return list(OutboxTask.objects.filter(claim=token).order_by('id'))
+
+
+def execute(task):
+    """Exécuter une tâche réservée ; retourne True si elle est acquittée"""
+    try:
+        with transaction.atomic():
+            import_string(task.task)(**task.payload)
+            acked = OutboxTask.objects.filter(pk=task.pk, claim=task.claim).update(
+                status='done', attempts=task.attempts + 1, last_error=''
+            )
+            if not acked:
+                raise LeaseLost()
+    except LeaseLost:
+        logger.warning("Tâche %s reprise par un autre worker, écritures annulées", task.idempotency_key)
+        return False
+    except Exception:
+        attempts = task.attempts + 1
+        failed = attempts >= MAX_ATTEMPTS
+        logger.exception("Échec de la tâche %s (essai %d)", task.idempotency_key, attempts)
+        OutboxTask.objects.filter(pk=task.pk, claim=task.claim).update(
+            status='failed' if failed else 'pending',
+            attempts=attempts,
+            run_after=timezone.now() + timedelta(seconds=RETRY_DELAY * 2 ** (attempts - 1)),
+            last_error=traceback.format_exc()[-4000:],
+        )
+        return False
+    return True
+
+
+def run_pending(limit=BATCH_SIZE):
+    """Réserver et exécuter un lot ; retourne (tâches réservées, tâches acquittées)"""
+    tasks = claim(limit)
+    done = sum(1 for task in tasks if execute(task))
+    return len(tasks), done
+
+
+def prune():
+    """Supprimer les tâches faites depuis plus de OUTBOX_RETENTION_DAYS.
+
+    Tant qu'elles sont gardées, leur clé empêche de redéposer la même tâche.
+    """
+    deleted, _ = OutboxTask.objects.filter(status='done', run_after__lt=timezone.now() - RETENTION).delete()
+    return deleted
+
+
+def retry_failed():
+    """Remettre en file les tâches abandonnées"""
+    return OutboxTask.objects.filter(status='failed').update(
+        status='pending', attempts=0, run_after=timezone.now(), claim=None
+    )
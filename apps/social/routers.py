@@ -0,0 +1,86 @@
+"""Lecture sur la réplique pour les vues en lecture seule.
+
+Quand un alias `replica` est déclaré dans DATABASES, les vues décorées par
+`replica_view` (ou utilisant ReplicaReadMixin) lisent sur la réplique pour les
+requêtes GET/HEAD/OPTIONS. Le reste du code (écritures, workers, consumers,
+blocs atomiques) reste sur `default`.
+
+La réplique peut être en retard : après une écriture (POST, PUT...), un cookie
+garde le visiteur sur `default` pendant DATABASE_REPLICA_PIN_SECONDS pour qu'il
+relise ce qu'il vient d'écrire.
+"""
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+PIN_COOKIE = 'db_primary'
+PIN_SECONDS = getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 5)
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_enabled():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def read_replica():
+    """Lire sur la réplique dans ce bloc"""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def replica_requested():
+    """Le contexte courant lit sur la réplique (voir read_replica)"""
+    return _use_replica.get()
+
+
+def _replica_allowed(request):
+    return replica_enabled() and request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES
+
+
+def replica_view(view):
+    """Décorateur d'une vue fonction : lectures sur la réplique pour les méthodes sûres"""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _replica_allowed(request):
+            return view(request, *args, **kwargs)
+        with read_replica():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaReadMixin:
+    """Équivalent de `replica_view` pour les vues classes et les ViewSets"""
+
+    def dispatch(self, request, *args, **kwargs):
+        if not _replica_allowed(request):
+            return super().dispatch(request, *args, **kwargs)
+        with read_replica():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # Dans une transaction, on relit ce qu'on vient d'écrire
+        if _use_replica.get() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
+
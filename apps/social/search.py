@@ -0,0 +1,225 @@
+"""Index de recherche plein texte des utilisateurs et des posts.
+
+Le backend dépend de la base : table virtuelle FTS5 sous SQLite, table tsvector
++ index GIN sous PostgreSQL, et repli sur `icontains` ailleurs. L'index est tenu
+à jour par les signaux (voir models.py) et reconstruit par `manage.py reindex_search`.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+# Modèle indexé -> (table d'index, champs indexés)
+INDEXES = {
+    'users.customuser': ('search_user', ('username', 'email', 'bio')),
+    'posts.post': ('search_post', ('content',)),
+}
+
+
+def _terms(query):
+    """Découper la requête en mots, sans la syntaxe propre au moteur"""
+    return re.findall(r'\w+', query.lower())
+
+
+def _outer_pk(queryset):
+    """Clé primaire de la table du queryset, pour une sous-requête corrélée"""
+    quote = connection.ops.quote_name
+    return f'{quote(queryset.model._meta.db_table)}.{quote(queryset.model._meta.pk.column)}'
+
+
+class BaseSearchBackend:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create_tables(self):
+        pass
+
+    def drop_tables(self):
+        pass
+
+    def index(self, label, rows):
+        """Indexer (ou réindexer) des lignes (id, champ1, champ2...)"""
+        pass
+
+    def remove(self, label, ids):
+        pass
+
+    def clear(self, label):
+        pass
+
+    def match(self, queryset, query):
+        """Restreindre le queryset (déjà filtré) aux lignes correspondant à la requête,
+        annotées de `search_rank` : croissant, du plus pertinent au moins pertinent
+        """
+        raise NotImplementedError
+
+
+class LikeSearchBackend(BaseSearchBackend):
+    """Repli sans index : LIKE '%q%' sur chaque champ"""
+
+    def match(self, queryset, query):
+        fields = INDEXES[queryset.model._meta.label_lower][1]
+        condition = Q()
+        for term in _terms(query):
+            term_condition = Q()
+            for field in fields:
+                term_condition |= Q(**{f'{field}__icontains': term})
+            condition &= term_condition
+        return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+class SqliteFTS5Backend(BaseSearchBackend):
+    def create_tables(self):
+        with self.connection.cursor() as cursor:
+            for table, fields in INDEXES.values():
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+                    f"{', '.join(fields)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                )
+
+    def drop_tables(self):
+        with self.connection.cursor() as cursor:
+            for table, _ in INDEXES.values():
+                cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+    def index(self, label, rows):
+        table, fields = INDEXES[label]
+        rows = [tuple('' if value is None else value for value in row) for row in rows]
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {table} WHERE rowid = %s", [(row[0],) for row in rows])
+            cursor.executemany(
+                f"INSERT INTO {table} (rowid, {', '.join(fields)}) "
+                f"VALUES (%s, {', '.join(['%s'] * len(fields))})",
+                rows
+            )
+
+    def remove(self, label, ids):
+        table = INDEXES[label][0]
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {table} WHERE rowid = %s", [(pk,) for pk in ids])
+
+    def clear(self, label):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {INDEXES[label][0]}")
+
+    def match(self, queryset, query):
+        terms = _terms(query)
+        if not terms:
+            return queryset.none()
+        table = INDEXES[queryset.model._meta.label_lower][0]
+        # Chaque mot est cherché comme préfixe : "dja"* trouve "django"
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [match])
+        ).annotate(search_rank=RawSQL(
+            f"SELECT rank FROM {table} WHERE {table} MATCH %s AND rowid = {_outer_pk(queryset)}",
+            [match], output_field=FloatField()
+        ))
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    def create_tables(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+            for table, fields in INDEXES.values():
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} (object_id bigint PRIMARY KEY, document tsvector NOT NULL)"
+                )
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_document_idx ON {table} USING GIN (document)")
+
+    def drop_tables(self):
+        with self.connection.cursor() as cursor:
+            for table, _ in INDEXES.values():
+                cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+    def index(self, label, rows):
+        table = INDEXES[label][0]
+        rows = [(row[0], ' '.join(str(value) for value in row[1:] if value)) for row in rows]
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table} (object_id, document) VALUES (%s, to_tsvector('simple', unaccent(%s))) "
+                f"ON CONFLICT (object_id) DO UPDATE SET document = EXCLUDED.document",
+                rows
+            )
+
+    def remove(self, label, ids):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {INDEXES[label][0]} WHERE object_id = ANY(%s)", [list(ids)])
+
+    def clear(self, label):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {INDEXES[label][0]}")
+
+    def match(self, queryset, query):
+        terms = _terms(query)
+        if not terms:
+            return queryset.none()
+        table = INDEXES[queryset.model._meta.label_lower][0]
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT object_id FROM {table} WHERE document @@ to_tsquery('simple', unaccent(%s))", [tsquery]
+        )).annotate(search_rank=RawSQL(
+            f"SELECT -ts_rank(document, to_tsquery('simple', unaccent(%s))) FROM {table} "
+            f"WHERE object_id = {_outer_pk(queryset)}",
+            [tsquery], output_field=FloatField()
+        ))
+
+
+BACKENDS = {
+    'sqlite': SqliteFTS5Backend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend(using=None):
+    """Backend configuré (SEARCH_BACKEND) ou choisi d'après la base"""
+    conn = using or connection
+    if getattr(settings, 'SEARCH_BACKEND', None):
+        return import_string(settings.SEARCH_BACKEND)(conn)
+    return BACKENDS.get(conn.vendor, LikeSearchBackend)(conn)
+
+
+def index_instance(instance):
+    label = instance._meta.label_lower
+    fields = INDEXES[label][1]
+    get_backend().index(label, [(instance.pk, *(getattr(instance, field) for field in fields))])
+
+
+def remove_instance(instance):
+    get_backend().remove(instance._meta.label_lower, [instance.pk])
+
+
+def ranked(queryset, query):
+    """Restreindre le queryset aux résultats de la recherche, triés par pertinence.
+
+    La correspondance est évaluée dans le queryset lui-même : les filtres de la vue
+    s'appliquent avant toute limite (pagination).
+    """
+    return get_backend().match(queryset, query).order_by('search_rank', '-pk')
+
+
+def reindex(model, chunk_size=1000, using=None):
+    """Reconstruire l'index d'un modèle en parcourant la table par lots"""
+    label = model._meta.label_lower
+    fields = INDEXES[label][1]
+    backend = get_backend(using)
+    backend.clear(label)
+
+    total = 0
+    chunk = []
+    rows = model._default_manager.order_by('pk').values_list('pk', *fields)
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            backend.index(label, chunk)
+            total += len(chunk)
+            chunk = []
+    backend.index(label, chunk)
+    return total + len(chunk)
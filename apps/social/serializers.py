@@ -1,9 +1,18 @@
 from rest_framework import serializers
 from .models import Follow, Notification
-from apps.users.serializers import UserSerializer
+from apps.api.fieldsets import SparseFieldsMixin
+from apps.users.serializers import LiveProfilesListSerializer, UserSerializer
 
 
-class FollowSerializer(serializers.ModelSerializer):
+class FollowListSerializer(LiveProfilesListSerializer):
+    user_fields = ('follower', 'following')
+
+
+class NotificationListSerializer(LiveProfilesListSerializer):
+    user_fields = ('sender',)
+
+
+class FollowSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     follower = UserSerializer(read_only=True)
     following = UserSerializer(read_only=True)
 
@@ -11,13 +20,17 @@ class FollowSerializer(serializers.ModelSerializer):
         model = Follow
         fields = ['id', 'follower', 'following', 'created_at']
         read_only_fields = ['follower', 'created_at']
+        expandable_fields = ['follower', 'following']
+        list_serializer_class = FollowListSerializer
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     sender = UserSerializer(read_only=True)
 
     class Meta:
         model = Notification
         fields = ['id', 'recipient', 'sender', 'notification_type',
-                  'post', 'comment', 'message', 'is_read', 'created_at']
-        read_only_fields = ['sender', 'created_at']
\ No newline at end of file
+                  'post', 'comment', 'message', 'actor_count', 'is_read', 'created_at', 'updated_at']
+        read_only_fields = ['sender', 'actor_count', 'created_at', 'updated_at']
+        expandable_fields = ['sender']
+        list_serializer_class = NotificationListSerializer
\ No newline at end of file
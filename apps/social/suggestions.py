@@ -0,0 +1,195 @@
+"""Suggestions « vous connaissez peut-être » précalculées.
+
+Pour chaque utilisateur, les SUGGESTIONS_PER_USER meilleurs candidats sont stockés
+dans Suggestion : amis d'amis (pondérés par le nombre d'abonnements en commun),
+complétés par les comptes populaires puis les nouveaux comptes. Le calcul complet
+est fait par `manage.py compute_suggestions` ; les ajouts et suppressions
+d'abonnements et les inscriptions mettent à jour les utilisateurs concernés, dans
+le worker de l'outbox (voir models.py). Les calculs lisent la table Follow, pas
+l'index en mémoire du graphe, qui peut être en retard sur les autres processus.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from apps.users.models import CustomUser, Profile
+from apps.users.serializers import prime_profiles
+from .models import Follow, Suggestion
+
+SUGGESTIONS_PER_USER = getattr(settings, 'SUGGESTIONS_PER_USER', 20)
+MUTUAL_WEIGHT = 10.0
+NEW_USER_SCORE = 0.5
+POOL_SIZE = 100
+POOL_CACHE_KEY = 'suggestions:pools'
+POOL_CACHE_TIMEOUT = 600
+
+
+def _popularity(followers_count):
+    return math.log1p(max(followers_count, 0))
+
+
+def candidate_pools():
+    """Comptes populaires et nouveaux comptes, communs à tous les utilisateurs"""
+    pools = cache.get(POOL_CACHE_KEY)
+    if pools is None:
+        popular = list(
+            Profile.objects.order_by('-followers_count', 'user_id').values_list('user_id', 'followers_count')[:POOL_SIZE]
+        )
+        newest = list(CustomUser.objects.order_by('-date_joined').values_list('id', flat=True)[:POOL_SIZE])
+        pools = (popular, newest)
+        cache.set(POOL_CACHE_KEY, pools, POOL_CACHE_TIMEOUT)
+    return pools
+
+
+def mutual_candidates(user_id, limit=SUGGESTIONS_PER_USER):
+    """Amis d'amis : comptes suivis par les comptes que l'on suit (hors soi et comptes
+    déjà suivis), avec le nombre d'abonnements en commun"""
+    following = Follow.objects.filter(follower_id=user_id).values('following_id')
+    return Follow.objects.filter(follower_id__in=following).exclude(following_id=user_id).exclude(
+        following_id__in=following
+    ).values('following_id').annotate(mutual=Count('*')).order_by('-mutual', 'following_id')[:limit]
+
+
+def compute_for_user(user_id, pools=None):
+    """Meilleurs candidats d'un utilisateur : liste de Suggestion non enregistrées"""
+    mutual = {row['following_id']: row['mutual'] for row in mutual_candidates(user_id)}
+    followers = dict(Profile.objects.filter(user_id__in=list(mutual)).values_list('user_id', 'followers_count'))
+
+    candidates = {
+        candidate_id: Suggestion(
+            user_id=user_id,
+            candidate_id=candidate_id,
+            score=count * MUTUAL_WEIGHT + _popularity(followers.get(candidate_id, 0)),
+            mutual_count=count,
+            reason='mutual',
+        )
+        for candidate_id, count in mutual.items()
+    }
+
+    if len(candidates) < SUGGESTIONS_PER_USER:
+        popular, newest = pools or candidate_pools()
+        pool_ids = {candidate_id for candidate_id, _ in popular} | set(newest)
+        excluded = set(candidates) | {user_id} | set(
+            Follow.objects.filter(follower_id=user_id, following_id__in=pool_ids).values_list('following_id', flat=True)
+        )
+        fallback = [
+            (candidate_id, _popularity(count), 'popular') for candidate_id, count in popular
+        ] + [
+            (candidate_id, NEW_USER_SCORE, 'new') for candidate_id in newest
+        ]
+        for candidate_id, score, reason in fallback:
+            if len(candidates) >= SUGGESTIONS_PER_USER:
+                break
+            if candidate_id not in excluded:
+                excluded.add(candidate_id)
+                candidates[candidate_id] = Suggestion(
+                    user_id=user_id, candidate_id=candidate_id, score=score, reason=reason
+                )
+
+    return sorted(candidates.values(), key=lambda suggestion: -suggestion.score)
+
+
+def rebuild_for_user(user_id, pools=None):
+    suggestions = compute_for_user(user_id, pools)
+    with transaction.atomic():
+        Suggestion.objects.filter(user_id=user_id).delete()
+        Suggestion.objects.bulk_create(suggestions)
+    return len(suggestions)
+
+
+def rebuild_all(chunk_size=1000):
+    """Recalculer les suggestions de tous les utilisateurs"""
+    cache.delete(POOL_CACHE_KEY)
+    pools = candidate_pools()
+    total = 0
+    for user_id in CustomUser.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=chunk_size):
+        total += rebuild_for_user(user_id, pools)
+    return total
+
+
+def _trim(user_ids):
+    """Ne garder que les SUGGESTIONS_PER_USER meilleures lignes de chaque utilisateur"""
+    extra = Suggestion.objects.filter(user_id__in=user_ids).annotate(rank=Window(
+        RowNumber(), partition_by=[F('user_id')], order_by=[F('score').desc(), F('candidate_id').asc()]
+    )).filter(rank__gt=SUGGESTIONS_PER_USER).values_list('pk', flat=True)
+    Suggestion.objects.filter(pk__in=list(extra)).delete()
+
+
+def _watchers(via_id, candidate_id):
+    """Abonnés de `via_id` pour qui `candidate_id` est un ami d'ami"""
+    return Follow.objects.filter(following_id=via_id).exclude(follower_id=candidate_id).values('follower_id')
+
+
+def _refresh_candidate(via_id, candidate_id):
+    """Recalculer depuis la table Follow la suggestion de `candidate_id` aux abonnés de
+    `via_id`. Le résultat ne dépend que de l'état courant : l'ordre dans lequel le
+    worker traite les abonnements est indifférent.
+    """
+    watchers = _watchers(via_id, candidate_id)
+    already_following = Follow.objects.filter(following_id=candidate_id).values('follower_id')
+    # Abonnements des abonnés de via_id qui suivent eux-mêmes candidate_id
+    mutual = Follow.objects.filter(
+        follower_id__in=watchers, following__following__following_id=candidate_id
+    ).exclude(follower_id__in=already_following)
+
+    # Plus aucun abonnement en commun : la suggestion disparaît
+    Suggestion.objects.filter(user_id__in=watchers, candidate_id=candidate_id, reason='mutual').exclude(
+        user_id__in=mutual.values('follower_id')
+    ).delete()
+
+    followers_count = Profile.objects.filter(user_id=candidate_id).values_list('followers_count', flat=True).first()
+    popularity = _popularity(followers_count or 0)
+    counts = mutual.order_by().values('follower_id').annotate(count=Count('*')).values_list('follower_id', 'count')
+    Suggestion.objects.bulk_create(
+        [
+            Suggestion(
+                user_id=user_id,
+                candidate_id=candidate_id,
+                score=count * MUTUAL_WEIGHT + popularity,
+                mutual_count=count,
+                reason='mutual',
+            )
+            for user_id, count in counts.iterator()
+        ],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['user', 'candidate'],
+        update_fields=['score', 'mutual_count', 'reason'],
+    )
+    _trim(watchers)
+
+
+def follow_edge_added(follower_id, following_id):
+    rebuild_for_user(follower_id)
+    # Les abonnés du follower ont désormais un abonnement en commun de plus avec following
+    _refresh_candidate(follower_id, following_id)
+
+
+def follow_edge_removed(follower_id, following_id):
+    rebuild_for_user(follower_id)
+    _refresh_candidate(follower_id, following_id)
+
+
+def suggestions_for(user, limit=10):
+    """Comptes suggérés à l'utilisateur, lus depuis la table précalculée"""
+    rows = Suggestion.objects.filter(user=user).select_related('candidate__profile').order_by('-score')
+    page = list(rows[:limit])
+    if not page:
+        # Pas encore calculé (inscription pas encore traitée par le worker) : calcul
+        # à la volée, sans écriture sur un chemin de lecture
+        page = compute_for_user(user.id)[:limit]
+        candidates = CustomUser.objects.select_related('profile').in_bulk([row.candidate_id for row in page])
+        page = [row for row in page if row.candidate_id in candidates]
+        for row in page:
+            row.candidate = candidates[row.candidate_id]
+
+    users = []
+    for row in page:
+        row.candidate.mutual_friends = row.mutual_count
+        users.append(row.candidate)
+    prime_profiles(users)
+    return users
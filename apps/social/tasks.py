@@ -0,0 +1,43 @@
+"""Effets de bord des abonnements, exécutés par le worker de l'outbox"""
+from apps.users.models import CustomUser, Profile
+from . import counters, notifier, suggestions
+from .models import Follow
+
+
+def _profile(user_id):
+    return Profile.objects.filter(user_id=user_id).only('pk').first()
+
+
+def _count_follow(follower_id, following_id, delta):
+    for user_id, field in ((follower_id, 'following_count'), (following_id, 'followers_count')):
+        profile = _profile(user_id)
+        if profile is not None:
+            counters.increment(profile, field, delta)
+
+
+def user_followed(follower_id, following_id):
+    _count_follow(follower_id, following_id, 1)
+    # Désabonnement déjà passé : pas de notification
+    if Follow.objects.filter(follower_id=follower_id, following_id=following_id).exists():
+        users = CustomUser.objects.in_bulk([follower_id, following_id])
+        if len(users) == 2:
+            notifier.notify('follow', users[following_id], users[follower_id])
+
+
+def user_unfollowed(follower_id, following_id):
+    _count_follow(follower_id, following_id, -1)
+    notifier.retract('follow', CustomUser(pk=following_id), CustomUser(pk=follower_id))
+
+
+def follow_edge_added(follower_id, following_id):
+    """Suggestions du nouvel abonné et de ses abonnés (déposé par le signal de Follow)"""
+    suggestions.follow_edge_added(follower_id, following_id)
+
+
+def follow_edge_removed(follower_id, following_id):
+    suggestions.follow_edge_removed(follower_id, following_id)
+
+
+def user_joined(user_id):
+    """Premières suggestions d'un nouveau compte (déposé par le signal de CustomUser)"""
+    suggestions.rebuild_for_user(user_id)
@@ -1,7 +1,7 @@
 from django import template
-from django.db.models import Count
-from apps.users.models import CustomUser
-from apps.social.models import Follow
+from apps.social.graph import graph
+from apps.social.suggestions import suggestions_for
+from apps.social.viewer_state import get_viewer_state
 
 register = template.Library()
 
@@ -12,21 +12,23 @@ def get_suggestions(user, limit=5):
     if not user.is_authenticated:
         return []
 
-    # Récupérer les utilisateurs déjà suivis
-    following_ids = Follow.objects.filter(
-        follower=user
-    ).values_list('following_id', flat=True)
+    return suggestions_for(user, limit)
 
-    # Suggestions basées sur les utilisateurs populaires
-    suggestions = CustomUser.objects.exclude(
-        id__in=following_ids
-    ).exclude(
-        id=user.id
-    ).annotate(
-        followers_count_real=Count('followers')
-    ).order_by('-followers_count_real')[:limit]
 
-    return suggestions
+@register.simple_tag
+def get_trending_topics(limit=5):
+    """Obtenir les hashtags tendance des dernières 24 heures"""
+    from apps.posts.trending import engine
+    return engine.top(limit)
+
+
+@register.simple_tag
+def get_unread_notifications_count(user):
+    """Nombre de notifications non lues (compteur en cache)"""
+    if not user.is_authenticated:
+        return 0
+    from apps.social.notifier import unread_count
+    return unread_count(user)
 
 
 @register.filter
@@ -35,10 +37,7 @@ def is_following(user, target_user):
     if not user.is_authenticated:
         return False
 
-    return Follow.objects.filter(
-        follower=user,
-        following=target_user
-    ).exists()
+    return get_viewer_state(user).is_following(target_user.id)
 
 
 @register.filter
@@ -47,12 +46,7 @@ def has_liked_post(user, post):
     if not user.is_authenticated:
         return False
 
-    from apps.posts.models import Like
-    return Like.objects.filter(
-        user=user,
-        content_type='post',
-        post=post
-    ).exists()
+    return get_viewer_state(user).has_liked_post(post.id)
 
 
 @register.filter
@@ -61,12 +55,7 @@ def has_liked_comment(user, comment):
     if not user.is_authenticated:
         return False
 
-    from apps.posts.models import Like
-    return Like.objects.filter(
-        user=user,
-        content_type='comment',
-        comment=comment
-    ).exists()
+    return get_viewer_state(user).has_liked_comment(comment.id)
 
 
 @register.simple_tag
@@ -75,12 +64,4 @@ def get_mutual_friends_count(user, target_user):
     if not user.is_authenticated:
         return 0
 
-    user_following = set(Follow.objects.filter(
-        follower=user
-    ).values_list('following_id', flat=True))
-
-    target_following = set(Follow.objects.filter(
-        follower=target_user
-    ).values_list('following_id', flat=True))
-
-    return len(user_following.intersection(target_following))
\ No newline at end of file
+    return graph.mutual_count(user.id, target_user.id)
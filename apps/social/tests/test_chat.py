@@ -0,0 +1,83 @@
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TransactionTestCase
+
+from apps.social import inbox
+from apps.social.models import ConversationSummary, Message
+from apps.social.routing import websocket_urlpatterns
+from apps.users.models import CustomUser
+
+
+class ChatBatchingTest(TransactionTestCase):
+    """Messages et accusés du chat enregistrés et diffusés par lots"""
+
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        self.bob = CustomUser.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        self.conversation, _ = inbox.get_or_create_direct(self.alice, self.bob)
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.conversation.id}/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def receive(self, communicator, count):
+        """Les `count` prochains événements, hors présence"""
+        events = []
+        while len(events) < count:
+            event = await communicator.receive_json_from(timeout=2)
+            if event['event'] != 'presence':
+                events.append(event)
+        return events
+
+    async def test_messages_are_written_and_broadcast_in_one_batch(self):
+        alice, bob = await self.connect(self.alice), await self.connect(self.bob)
+        with mock.patch.object(inbox, 'create_messages', wraps=inbox.create_messages) as create_messages:
+            for i in range(3):
+                await alice.send_json_to({'action': 'send', 'message': f'message {i}', 'temp_id': f't{i}'})
+            received = await self.receive(bob, 3)
+
+        create_messages.assert_called_once()
+        self.assertEqual([event['message']['content'] for event in received], ['message 0', 'message 1', 'message 2'])
+        echoed = await self.receive(alice, 3)
+        self.assertEqual([event['temp_id'] for event in echoed], ['t0', 't1', 't2'])
+        self.assertEqual(await sync_to_async(Message.objects.count)(), 3)
+        await alice.disconnect()
+        await bob.disconnect()
+
+    async def test_acks_are_merged_into_one_watermark_per_reader(self):
+        messages = await sync_to_async(inbox.create_messages)(
+            [(self.conversation.id, self.alice, f'message {i}') for i in range(3)]
+        )
+        alice, bob = await self.connect(self.alice), await self.connect(self.bob)
+        with mock.patch.object(inbox, 'mark_up_to', wraps=inbox.mark_up_to) as mark_up_to:
+            for message in messages:
+                await bob.send_json_to({'action': 'delivered', 'message_id': message.id})
+            await bob.send_json_to({'action': 'read', 'message_id': messages[1].id})
+            received = await self.receive(alice, 2)
+
+        self.assertEqual(mark_up_to.call_count, 2)
+        self.assertEqual(
+            sorted((event['event'], event['message_id']) for event in received),
+            [('delivered_up_to', messages[2].id), ('read_up_to', messages[1].id)],
+        )
+        summary = await sync_to_async(ConversationSummary.objects.get)(conversation=self.conversation, user=self.bob)
+        self.assertEqual((summary.delivered_up_to, summary.read_up_to), (messages[2].id, messages[1].id))
+        self.assertIsNotNone(summary.delivered_updated_at)
+        await alice.disconnect()
+        await bob.disconnect()
+
+    async def test_non_participant_is_rejected(self):
+        carol = await sync_to_async(CustomUser.objects.create_user)(
+            username='carol', email='carol@example.com', password='pw'
+        )
+        communicator = await self.connect(carol)
+        await communicator.send_json_to({'action': 'send', 'message': 'hello'})
+        self.assertEqual((await self.receive(communicator, 1))[0]['event'], 'error')
+        self.assertEqual(await sync_to_async(Message.objects.count)(), 0)
+        await communicator.disconnect()
@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.social import events
+from apps.social.models import Event, EventCheckpoint
+
+
+class RecordingConsumer(events.Consumer):
+    name = 'test.recording'
+    kinds = {'test.kept'}
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.seen = []
+
+    def handle(self, batch):
+        self.seen.extend(event.data['n'] for event in batch)
+        if self.fail:
+            raise RuntimeError("échec simulé")
+
+
+class EventCheckpointTest(TestCase):
+    """Reprise d'un consommateur du flux à sa position enregistrée"""
+
+    def record(self, *numbers, kind='test.kept'):
+        return [events.record(kind, n=n) for n in numbers]
+
+    def position(self):
+        return EventCheckpoint.objects.get(consumer=RecordingConsumer.name).position
+
+    def test_resumes_after_the_last_processed_event(self):
+        recorded = self.record(1, 2, 3, 4, 5)
+        first = RecordingConsumer()
+        self.assertEqual(events.run_batch(first, limit=2), 2)
+        self.assertEqual(first.seen, [1, 2])
+        self.assertEqual(self.position(), recorded[1].pk)
+
+        # Nouveau processus : la lecture reprend au checkpoint, sans rejouer ni sauter
+        restarted = RecordingConsumer()
+        while events.run_batch(restarted, limit=2):
+            pass
+        self.assertEqual(restarted.seen, [3, 4, 5])
+        self.assertEqual(self.position(), recorded[-1].pk)
+
+    def test_failed_batch_does_not_move_the_checkpoint(self):
+        self.record(1, 2)
+        with self.assertRaises(RuntimeError):
+            events.run_batch(RecordingConsumer(fail=True))
+        self.assertEqual(EventCheckpoint.objects.filter(consumer=RecordingConsumer.name).count(), 0)
+
+        retried = RecordingConsumer()
+        events.run_batch(retried)
+        self.assertEqual(retried.seen, [1, 2])
+
+    def test_other_kinds_advance_the_checkpoint_without_being_handled(self):
+        self.record(1)
+        skipped = self.record(2, kind='test.other')
+        consumer = RecordingConsumer()
+        self.assertEqual(events.run_batch(consumer), 2)
+        self.assertEqual(consumer.seen, [1])
+        self.assertEqual(self.position(), skipped[0].pk)
+
+    def test_recent_gap_stops_reading_until_it_expires(self):
+        recorded = self.record(1, 2, 3)
+        # Id manquant : transaction peut-être encore en cours
+        Event.objects.filter(pk=recorded[1].pk).delete()
+        consumer = RecordingConsumer()
+        events.run_batch(consumer)
+        self.assertEqual(consumer.seen, [1])
+
+        Event.objects.filter(pk=recorded[2].pk).update(
+            created_at=timezone.now() - events.GAP_TIMEOUT - timedelta(seconds=1)
+        )
+        events.run_batch(consumer)
+        self.assertEqual(consumer.seen, [1, 3])
+
+    def test_reset_replays_the_stream(self):
+        self.record(1, 2)
+        events.run_batch(RecordingConsumer())
+        events.reset(RecordingConsumer.name)
+        replayed = RecordingConsumer()
+        events.run_batch(replayed)
+        self.assertEqual(replayed.seen, [1, 2])
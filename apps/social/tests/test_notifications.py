@@ -0,0 +1,51 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.posts.models import Post
+from apps.social.models import Notification
+from apps.users.models import CustomUser
+
+
+class NotificationCoalescingTest(TestCase):
+    """Likes d'un même post regroupés en une notification, décrémentée à l'unlike"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='author', email='author@example.com', password='pw')
+        cls.post = Post.objects.create(author=cls.author, content='post')
+        cls.fans = [
+            CustomUser.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com', password='pw')
+            for i in range(5)
+        ]
+
+    def toggle_like(self, user):
+        self.client.force_login(user)
+        self.assertEqual(self.client.post(f'/post/{self.post.pk}/like/').status_code, 200)
+        call_command('process_outbox', stdout=StringIO())
+
+    def test_likes_are_coalesced_into_one_notification(self):
+        for fan in self.fans:
+            self.toggle_like(fan)
+
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.actor_count, 5)
+        self.assertEqual(notification.sender, self.fans[-1])
+        self.assertEqual(notification.message, "fan4 et 4 autres personnes ont aimé votre post")
+
+    def test_unlike_retracts_the_actor(self):
+        for fan in self.fans[:2]:
+            self.toggle_like(fan)
+        self.toggle_like(self.fans[1])
+
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.actor_count, 1)
+        self.assertEqual(notification.message, "fan0 a aimé votre post")
+
+        self.toggle_like(self.fans[0])
+        self.assertFalse(Notification.objects.filter(recipient=self.author).exists())
+
+    def test_own_like_is_not_notified(self):
+        self.toggle_like(self.author)
+        self.assertFalse(Notification.objects.exists())
@@ -0,0 +1,73 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.social import outbox
+from apps.social.models import OutboxTask
+from apps.users.models import CustomUser
+
+failures_left = 0
+
+
+def flaky_task(username):
+    """Tâche de test : écrit une ligne, puis échoue tant que `failures_left` > 0"""
+    global failures_left
+    CustomUser.objects.create_user(username=username, email=f'{username}@example.com', password='pw')
+    if failures_left:
+        failures_left -= 1
+        raise RuntimeError("échec simulé")
+
+
+class OutboxRetryTest(TestCase):
+    def setUp(self):
+        global failures_left
+        failures_left = 0
+
+    def make_due(self):
+        OutboxTask.objects.update(run_after=timezone.now())
+
+    def test_failed_task_is_rolled_back_and_retried(self):
+        global failures_left
+        failures_left = 1
+        outbox.enqueue(flaky_task, key='a', username='first')
+
+        with self.assertLogs('apps.social.outbox', 'ERROR'):
+            self.assertEqual(outbox.run_pending(), (1, 0))
+        task = OutboxTask.objects.get()
+        self.assertEqual((task.status, task.attempts), ('pending', 1))
+        self.assertGreater(task.run_after, timezone.now())
+        self.assertIn("échec simulé", task.last_error)
+        # Les écritures de l'essai raté sont annulées avec lui
+        self.assertFalse(CustomUser.objects.filter(username='first').exists())
+
+        # Pas encore due : le délai de relance est respecté
+        self.assertEqual(outbox.run_pending(), (0, 0))
+
+        self.make_due()
+        self.assertEqual(outbox.run_pending(), (1, 1))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts, task.last_error), ('done', 2, ''))
+        self.assertTrue(CustomUser.objects.filter(username='first').exists())
+
+    def test_task_is_abandoned_after_max_attempts(self):
+        global failures_left
+        failures_left = 10
+        outbox.enqueue(flaky_task, key='b', username='second')
+        with mock.patch.object(outbox, 'MAX_ATTEMPTS', 2), self.assertLogs('apps.social.outbox', 'ERROR'):
+            outbox.run_pending()
+            self.make_due()
+            outbox.run_pending()
+        task = OutboxTask.objects.get()
+        self.assertEqual((task.status, task.attempts), ('failed', 2))
+
+        self.make_due()
+        self.assertEqual(outbox.run_pending(), (0, 0))
+        self.assertEqual(outbox.retry_failed(), 1)
+        failures_left = 0
+        self.assertEqual(outbox.run_pending(), (1, 1))
+
+    def test_same_key_is_enqueued_once(self):
+        outbox.enqueue(flaky_task, key='c', username='third')
+        outbox.enqueue(flaky_task, key='c', username='third')
+        self.assertEqual(OutboxTask.objects.count(), 1)
@@ -0,0 +1,43 @@
+from django.test import TestCase
+
+from apps.posts.models import Post
+from apps.users.models import CustomUser
+
+
+class PostSearchTest(TestCase):
+    """Recherche plein texte des posts de l'API : rang, filtres et tri explicite"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = CustomUser.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        cls.bob = CustomUser.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        # Créés du moins pertinent au plus pertinent : le rang doit inverser l'ordre chronologique
+        cls.weak = Post.objects.create(
+            author=cls.alice, content='Une longue journée au bord du lac, avec un peu de Django le soir'
+        )
+        cls.strong = Post.objects.create(author=cls.alice, content='Django, Django et encore Django')
+        cls.other = Post.objects.create(author=cls.bob, content='Django pour tout le monde')
+        Post.objects.create(author=cls.alice, content='Rien à voir')
+
+    def setUp(self):
+        self.client.force_login(self.alice)
+
+    def ids(self, query):
+        response = self.client.get(f'/api/posts/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [post['id'] for post in response.json()['results']]
+
+    def test_results_are_ordered_by_rank(self):
+        ids = self.ids(f'search=django&author={self.alice.pk}')
+        self.assertEqual(ids, [self.strong.pk, self.weak.pk])
+
+    def test_match_is_applied_inside_the_filtered_queryset(self):
+        self.assertEqual(self.ids(f'search=django&author={self.bob.pk}'), [self.other.pk])
+
+    def test_explicit_ordering_overrides_rank(self):
+        ids = self.ids(f'search=django&author={self.alice.pk}&ordering=created_at')
+        self.assertEqual(ids, [self.weak.pk, self.strong.pk])
+
+    def test_prefix_and_accents(self):
+        Post.objects.create(author=self.bob, content='Soirée crêpes')
+        self.assertEqual(len(self.ids('search=crepe')), 1)
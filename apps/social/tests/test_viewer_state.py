@@ -0,0 +1,61 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.posts.models import Comment, CommentLike, Post, PostLike
+from apps.social.models import Follow
+from apps.users.models import CustomUser
+
+
+class ViewerStateQueryCountTest(TestCase):
+    """L'état "liké" / "suivi" d'une page se charge en un nombre fixe de requêtes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = CustomUser.objects.create_user(username='viewer', email='viewer@example.com', password='pw')
+        cls.author = CustomUser.objects.create_user(username='author', email='author@example.com', password='pw')
+        Follow.objects.create(follower=cls.viewer, following=cls.author)
+
+    def setUp(self):
+        self.client.force_login(self.viewer)
+
+    def add_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(author=self.author, content=f'post {i}')
+            comment = Comment.objects.create(post=post, author=self.author, content='comment')
+            if i % 2:
+                PostLike.objects.create(post=post, user=self.viewer)
+                CommentLike.objects.create(comment=comment, user=self.viewer)
+        # Fan-out des nouveaux posts dans le fil du visiteur
+        call_command('consume_events', stdout=StringIO())
+
+    def queries(self, url):
+        # Premier appel : caches (compteurs, graphe) remplis, seul le rendu est mesuré
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def assert_constant(self, url):
+        self.add_posts(2)
+        small = self.queries(url)
+        self.add_posts(8)
+        self.assertEqual(self.queries(url), small)
+
+    def test_profile_page(self):
+        self.assert_constant(f'/users/profile/{self.author.username}/')
+
+    def test_api_post_list(self):
+        self.assert_constant('/api/posts/')
+
+    def test_feed_page(self):
+        self.assert_constant('/')
+        self.assertEqual(len(self.client.get('/').context['posts']), 10)
+
+    def test_api_feed(self):
+        self.assert_constant('/api/posts/feed/')
+        self.assertEqual(len(self.client.get('/api/posts/feed/').json()['results']), 10)
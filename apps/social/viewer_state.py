@@ -0,0 +1,74 @@
+"""État du visiteur (likes, abonnements) chargé par lots, à la manière d'un DataLoader.
+
+Les vues et les serializers déclarent (`prime_*`) les objets qu'ils vont afficher ;
+la première question posée charge alors la réponse pour toute la page en une
+requête par relation, au lieu d'un EXISTS par objet. Les abonnements sont lus
+dans l'index en mémoire du graphe (graph.py).
+"""
+from apps.posts.models import CommentLike, PostLike
+from .graph import graph
+
+
+class ViewerStateLoader:
+    def __init__(self, user):
+        self.user = user
+        self._pending = {'post': set(), 'comment': set(), 'user': set()}
+        self._loaded = {'post': {}, 'comment': {}, 'user': {}}
+
+    def prime_posts(self, posts):
+        for post in posts:
+            self._pending['post'].add(post.id)
+            if post.shared_post_id:
+                self._pending['post'].add(post.shared_post_id)
+
+    def prime_comments(self, comments):
+        for comment in comments:
+            self._pending['comment'].add(comment.id)
+
+    def prime_users(self, users):
+        for user in users:
+            self._pending['user'].add(user.id)
+
+    def has_liked_post(self, post_id):
+        return self._get('post', post_id)
+
+    def has_liked_comment(self, comment_id):
+        return self._get('comment', comment_id)
+
+    def is_following(self, user_id):
+        return self._get('user', user_id)
+
+    def _get(self, kind, key):
+        if key not in self._loaded[kind]:
+            self._pending[kind].add(key)
+            self._load(kind)
+        return self._loaded[kind][key]
+
+    def _load(self, kind):
+        ids = self._pending[kind] - self._loaded[kind].keys()
+        self._pending[kind] = set()
+        if not ids:
+            return
+
+        found = set()
+        if self.user.is_authenticated:
+            if kind == 'user':
+                found = graph.following_among(self.user.id, ids)
+            else:
+                model = PostLike if kind == 'post' else CommentLike
+                found = set(model.objects.filter(
+                    user=self.user,
+                    **{f'{kind}_id__in': ids}
+                ).values_list(f'{kind}_id', flat=True))
+
+        for key in ids:
+            self._loaded[kind][key] = key in found
+
+
+def get_viewer_state(user):
+    """Chargeur associé à l'utilisateur de la requête (une instance par requête)"""
+    loader = getattr(user, '_viewer_state', None)
+    if loader is None:
+        loader = ViewerStateLoader(user)
+        user._viewer_state = loader
+    return loader
@@ -1,9 +1,14 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.http import JsonResponse
-from django.db.models import Q, Count, Max
 from apps.users.models import CustomUser
-from .models import Follow, Notification, Conversation, Message
+from .models import Follow, Notification
+from apps.api.pagination import CursorPaginator
+from . import counters, inbox, notifier, outbox, search, tasks
+from .graph import graph
+from .routers import replica_view
+from .suggestions import suggestions_for
 
 
 @login_required
@@ -15,47 +20,40 @@ def follow_user(request, username):
         if user_to_follow == request.user:
             return JsonResponse({'error': 'Cannot follow yourself'}, status=400)
 
-        follow, created = Follow.objects.get_or_create(
-            follower=request.user,
-            following=user_to_follow
-        )
-
-        if not created:
-            # Unfollow
-            follow.delete()
-            request.user.profile.following_count -= 1
-            user_to_follow.profile.followers_count -= 1
-            following = False
-        else:
-            # Follow
-            request.user.profile.following_count += 1
-            user_to_follow.profile.followers_count += 1
-            following = True
-
-            # Créer une notification
-            Notification.objects.create(
-                recipient=user_to_follow,
-                sender=request.user,
-                notification_type='follow',
-                message=f"{request.user.username} vous suit maintenant"
+        # Compteurs et notification mis à jour par le worker : la réponse donne la valeur attendue
+        followers_count = counters.get_count(user_to_follow.profile, 'followers_count')
+        with transaction.atomic():
+            follow, created = Follow.objects.get_or_create(
+                follower=request.user,
+                following=user_to_follow
             )
 
-        request.user.profile.save()
-        user_to_follow.profile.save()
+            if not created:
+                # Unfollow
+                outbox.enqueue(tasks.user_unfollowed, key=follow.pk,
+                               follower_id=request.user.id, following_id=user_to_follow.id)
+                follow.delete()
+                following = False
+            else:
+                # Follow
+                outbox.enqueue(tasks.user_followed, key=follow.pk,
+                               follower_id=request.user.id, following_id=user_to_follow.id)
+                following = True
 
         return JsonResponse({
             'following': following,
-            'followers_count': user_to_follow.profile.followers_count
+            'followers_count': max(followers_count + (1 if following else -1), 0)
         })
 
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 
 @login_required
+@replica_view
 def notifications(request):
     """Liste des notifications"""
     notifications = request.user.notifications.all()[:20]
-    unread_count = request.user.notifications.filter(is_read=False).count()
+    unread_count = notifier.unread_count(request.user)
 
     context = {
         'notifications': notifications,
@@ -68,105 +66,56 @@ def notifications(request):
 def mark_notification_read(request, pk):
     """Marquer une notification comme lue"""
     notification = get_object_or_404(Notification, pk=pk, recipient=request.user)
-    notification.is_read = True
-    notification.save()
+    notifier.mark_read(request.user, Notification.objects.filter(pk=notification.pk))
     return JsonResponse({'success': True})
 
 
 @login_required
+@replica_view
 def followers_list(request, username):
     """Liste des abonnés d'un utilisateur"""
     user = get_object_or_404(CustomUser, username=username)
-    followers = Follow.objects.filter(following=user).select_related('follower', 'follower__profile')
+    followers = list(Follow.objects.filter(following=user).select_related('follower', 'follower__profile'))
 
     # Vérifier quels followers l'utilisateur connecté suit
-    if request.user.is_authenticated:
-        user_following_ids = Follow.objects.filter(
-            follower=request.user
-        ).values_list('following_id', flat=True)
-    else:
-        user_following_ids = []
+    user_following_ids = graph.following_among(request.user.id, [follow.follower_id for follow in followers])
+    counters.apply_live_counts([user.profile])
 
     context = {
         'profile_user': user,
         'followers': followers,
-        'user_following_ids': list(user_following_ids),
+        'user_following_ids': user_following_ids,
         'tab': 'followers'
     }
     return render(request, 'social/followers_list.html', context)
 
 
 @login_required
+@replica_view
 def following_list(request, username):
     """Liste des abonnements d'un utilisateur"""
     user = get_object_or_404(CustomUser, username=username)
-    following = Follow.objects.filter(follower=user).select_related('following', 'following__profile')
+    following = list(Follow.objects.filter(follower=user).select_related('following', 'following__profile'))
 
     # Vérifier quels utilisateurs l'utilisateur connecté suit
-    if request.user.is_authenticated:
-        user_following_ids = Follow.objects.filter(
-            follower=request.user
-        ).values_list('following_id', flat=True)
-    else:
-        user_following_ids = []
+    user_following_ids = graph.following_among(request.user.id, [follow.following_id for follow in following])
+    counters.apply_live_counts([user.profile])
 
     context = {
         'profile_user': user,
         'following': following,
-        'user_following_ids': list(user_following_ids),
+        'user_following_ids': user_following_ids,
         'tab': 'following'
     }
     return render(request, 'social/following_list.html', context)
 
 
 @login_required
+@replica_view
 def suggestions(request):
     """Suggestions d'utilisateurs à suivre"""
-    # Récupérer les utilisateurs que l'on suit déjà
-    following_ids = Follow.objects.filter(
-        follower=request.user
-    ).values_list('following_id', flat=True)
-
-    # Récupérer les suggestions basées sur :
-    # 1. Les utilisateurs suivis par les personnes qu'on suit
-    # 2. Les utilisateurs populaires (avec le plus de followers)
-    # 3. Les nouveaux utilisateurs
-
-    # Suggestions des amis d'amis
-    friends_of_friends = CustomUser.objects.filter(
-        followers__follower_id__in=following_ids
-    ).exclude(
-        id__in=following_ids
-    ).exclude(
-        id=request.user.id
-    ).annotate(
-        mutual_friends=Count('followers')
-    ).order_by('-mutual_friends')[:5]
-
-    # Utilisateurs populaires
-    popular_users = CustomUser.objects.exclude(
-        id__in=following_ids
-    ).exclude(
-        id=request.user.id
-    ).annotate(
-        followers_count_real=Count('followers')
-    ).order_by('-followers_count_real')[:5]
-
-    # Nouveaux utilisateurs
-    new_users = CustomUser.objects.exclude(
-        id__in=following_ids
-    ).exclude(
-        id=request.user.id
-    ).order_by('-date_joined')[:5]
-
-    # Combiner et dédupliquer
-    suggestions_set = set()
-    suggestions_list = []
-
-    for user in list(friends_of_friends) + list(popular_users) + list(new_users):
-        if user.id not in suggestions_set and len(suggestions_list) < 10:
-            suggestions_set.add(user.id)
-            suggestions_list.append(user)
+    # Amis d'amis, puis comptes populaires et nouveaux comptes (précalculés)
+    suggestions_list = suggestions_for(request.user, 10)
 
     context = {
         'suggestions': suggestions_list,
@@ -175,86 +124,40 @@ def suggestions(request):
 
 
 @login_required
+@replica_view
 def search_users(request):
     """Recherche d'utilisateurs"""
     query = request.GET.get('q', '')
 
     if query:
-        users = CustomUser.objects.filter(
-            Q(username__icontains=query) |
-            Q(email__icontains=query) |
-            Q(bio__icontains=query)
-        ).exclude(id=request.user.id).select_related('profile')[:20]
+        # Index plein texte : résultats triés par pertinence, recherche par préfixe
+        users = search.ranked(
+            CustomUser.objects.exclude(id=request.user.id).select_related('profile'),
+            query
+        )[:20]
+        users = list(users)
     else:
-        users = CustomUser.objects.none()
+        users = []
 
     # Vérifier quels utilisateurs l'utilisateur connecté suit
-    user_following_ids = Follow.objects.filter(
-        follower=request.user
-    ).values_list('following_id', flat=True)
+    user_following_ids = graph.following_among(request.user.id, [user.id for user in users])
 
     context = {
         'users': users,
         'query': query,
-        'user_following_ids': list(user_following_ids),
+        'user_following_ids': user_following_ids,
     }
     return render(request, 'social/search_users.html', context)
 
 
 @login_required
+@replica_view
 def list_conversations(request):
     """Liste toutes les conversations de l'utilisateur connecté"""
-    # Récupérer toutes les conversations où l'utilisateur est participant
-    # Filtrer uniquement les conversations avec exactement 2 participants
-    conversations = Conversation.objects.filter(participants=request.user).annotate(
-        participant_count=Count('participants'),
-        last_message_time=Max('messages__created_at')
-    ).filter(participant_count=2).prefetch_related('participants', 'participants__profile', 'messages__sender')
-    
-    # Préparer les données pour chaque conversation
-    conversations_list = []
-    for conv in conversations:
-        # Trouver l'autre participant (celui qui n'est pas l'utilisateur connecté)
-        other_participant = None
-        for participant in conv.participants.all():
-            if participant.id != request.user.id:
-                other_participant = participant
-                break
-        
-        # Si pas d'autre participant, passer à la suivante
-        if not other_participant:
-            continue
-        
-        # Récupérer le dernier message
-        last_message = conv.messages.order_by('-created_at').first()
-        
-        # Compter les messages non lus (seulement ceux de l'autre participant)
-        unread_count = conv.messages.filter(
-            sender=other_participant,
-            read_at__isnull=True
-        ).count()
-        
-        # Déterminer si le dernier message est envoyé par l'utilisateur connecté
-        is_sender = last_message and last_message.sender.id == request.user.id if last_message else False
-        
-        conversations_list.append({
-            'conversation': conv,
-            'other_participant': other_participant,
-            'last_message': last_message,
-            'is_sender': is_sender,
-            'unread_count': unread_count,
-        })
-    
-    # Trier par date du dernier message (ou date de création si pas de message)
-    from django.utils import timezone
-    def get_sort_date(item):
-        conv = item['conversation']
-        if hasattr(conv, 'last_message_time') and conv.last_message_time:
-            return conv.last_message_time
-        return getattr(conv, 'created_at', timezone.now())
-    
-    conversations_list.sort(key=get_sort_date, reverse=True)
-    
+    # Un résumé par conversation, tenu à jour à chaque message (voir inbox.py)
+    paginator = CursorPaginator(inbox.inbox(request.user), 20)
+    conversations_list = paginator.get_page(request.GET.get('cursor'))
+
     context = {
         'conversations_list': conversations_list,
     }
@@ -270,34 +173,17 @@ def start_chat(request, username):
     if user_to_chat == request.user:
         return redirect('users:profile', username=request.user.username)
 
-    # Trouver une conversation existante entre les deux utilisateurs (avec filtrage direct)
-    conversations = Conversation.objects.filter(participants=request.user).filter(participants=user_to_chat)
-    # Filtrer celles avec exactement 2 participants
-    conversation = None
-    for conv in conversations:
-        if conv.participants.count() == 2:
-            conversation = conv
-            break
-    
-    if not conversation:
-        conversation = Conversation.objects.create()
-        conversation.participants.add(request.user, user_to_chat)
-
-    # Récupérer les messages existants
-    msgs = Message.objects.filter(conversation=conversation).select_related('sender')
-    messages = [
-        {
-            'id': m.id,
-            'sender': m.sender.username,
-            'content': m.content,
-            'created_at': m.created_at.isoformat()
-        }
-        for m in msgs
-    ]
+    # Conversation à deux : une recherche sur la paire canonique (user_low, user_high)
+    conversation, _ = inbox.get_or_create_direct(request.user, user_to_chat)
+
+    # Derniers messages seulement : l'historique plus ancien est chargé par le WebSocket
+    msgs, history_cursor = inbox.message_history(conversation.id)
+    messages = [inbox.serialize_message(m) for m in msgs]
 
     context = {
         'target_user': user_to_chat,
         'conversation': conversation,
         'messages': messages,
+        'history_cursor': history_cursor,
     }
     return render(request, 'social/start_chat.html', context)
\ No newline at end of file
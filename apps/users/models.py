@@ -15,6 +15,12 @@ class CustomUser(AbstractUser):
         return self.username
 
 
+# Colonnes écrites par save() : les compteurs ne sont modifiés que par
+# apps.social.counters (UPDATE col = col + delta), un save() complet écraserait
+# une agrégation concurrente
+PROFILE_SAVE_FIELDS = ['profile_picture', 'cover_photo', 'updated_at']
+
+
 class Profile(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='profile')
     profile_picture = models.ImageField(upload_to='profile_pics/', default='profile_pics/default.jpg')
@@ -37,4 +43,4 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=CustomUser)
 def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+    instance.profile.save(update_fields=PROFILE_SAVE_FIELDS)
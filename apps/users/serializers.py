@@ -1,15 +1,52 @@
+from django.db import models
 from rest_framework import serializers
+from apps.api.fieldsets import SparseFieldsMixin
+from apps.social import counters
 from .models import CustomUser, Profile
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+def _loaded(obj, name):
+    """Relation déjà chargée (select_related), sans requête supplémentaire"""
+    field = obj._meta.get_field(name)
+    return field.get_cached_value(obj) if field.is_cached(obj) else None
+
+
+def prime_profiles(objects, user_field=None):
+    """Compteurs à jour (apps.social.counters) sur les profils déjà chargés.
+
+    `user_field` : relation vers l'utilisateur (author, sender...) quand les
+    objets ne sont pas eux-mêmes des utilisateurs.
+    """
+    users = objects if user_field is None else (_loaded(obj, user_field) for obj in objects)
+    counters.apply_live_counts(
+        profile for profile in (_loaded(user, 'profile') for user in users if user is not None)
+        if profile is not None
+    )
+
+
+class LiveProfilesListSerializer(serializers.ListSerializer):
+    """Liste dont les profils des utilisateurs (`user_fields`, ou les objets
+    eux-mêmes) sont servis avec leurs compteurs à jour, en une lecture du cache"""
+    user_fields = (None,)
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        self.prepare(iterable)
+        return super().to_representation(iterable)
+
+    def prepare(self, objects):
+        for user_field in self.user_fields:
+            prime_profiles(objects, user_field)
+
+
+class ProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Profile
         fields = ['profile_picture', 'cover_photo', 'followers_count',
                   'following_count', 'posts_count', 'created_at']
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     profile = ProfileSerializer(read_only=True)
 
     class Meta:
@@ -17,6 +54,7 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'bio', 'location',
                   'website', 'birth_date', 'profile', 'date_joined']
         read_only_fields = ['date_joined']
+        list_serializer_class = LiveProfilesListSerializer
 
 
 class UserCreateSerializer(serializers.ModelSerializer):
@@ -3,9 +3,12 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate, logout
 from django.contrib import messages
 from django.http import JsonResponse
-from .models import CustomUser, Profile
+from .models import PROFILE_SAVE_FIELDS, CustomUser, Profile
 from apps.posts.models import Post
-from apps.social.models import Follow
+from apps.posts.serializers import prime_post_counts
+from apps.social import counters
+from apps.social.routers import replica_view
+from apps.api.pagination import CursorPaginator
 from .forms import UserRegisterForm, UserUpdateForm, ProfileUpdateForm
 
 
@@ -25,21 +28,24 @@ def register(request):
 
 
 @login_required
+@replica_view
 def profile(request, username):
     """Profil utilisateur"""
     user = get_object_or_404(CustomUser, username=username)
     posts = Post.objects.filter(author=user).select_related('author__profile')
+    paginator = CursorPaginator(posts, 10)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    request.viewer_state.prime_posts(page_obj)
+    prime_post_counts(page_obj)
+    counters.apply_live_counts([user.profile])
 
     is_following = False
     if request.user.is_authenticated and request.user != user:
-        is_following = Follow.objects.filter(
-            follower=request.user,
-            following=user
-        ).exists()
+        is_following = request.viewer_state.is_following(user.id)
 
     context = {
         'profile_user': user,
-        'posts': posts,
+        'posts': page_obj,
         'is_following': is_following,
     }
     return render(request, 'users/profile.html', context)
@@ -54,7 +60,7 @@ def edit_profile(request):
 
         if u_form.is_valid() and p_form.is_valid():
             u_form.save()
-            p_form.save()
+            p_form.save(commit=False).save(update_fields=PROFILE_SAVE_FIELDS)
             messages.success(request, 'Votre profil a été mis à jour!')
             return redirect('users:profile', username=request.user.username)
     else:
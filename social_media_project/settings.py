@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
+from decouple import config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -60,6 +63,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.social.middleware.ViewerStateMiddleware',
+    'apps.social.middleware.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -89,25 +94,94 @@ WSGI_APPLICATION = 'social_media_project.wsgi.application'
 ASGI_APPLICATION = 'social_media_project.asgi.application'
 
 # Channels layer using Redis (requires channels-redis and a running Redis server)
+REDIS_URL = config('REDIS_URL', default='redis://127.0.0.1:6379/0')
+
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
-            'hosts': [('127.0.0.1', 6379)],
+            'hosts': [REDIS_URL],
         },
     },
 }
 
+# Cache partagé par le serveur web et les workers (compteurs en direct, badge des
+# notifications non lues...) : un cache local au processus ne verrait pas leurs écritures
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_URL', default=REDIS_URL),
+    },
+}
+
+# `manage.py test` : cache et channel layer en mémoire, sans serveur Redis
+if sys.argv[1:2] == ['test']:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Base de données choisie par l'environnement (ou un fichier .env) : DB_ENGINE=sqlite|postgresql
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+
+if DB_ENGINE == 'postgresql':
+    _postgres = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': config('DB_NAME', default='social_media'),
+        'USER': config('DB_USER', default=''),
+        'PASSWORD': config('DB_PASSWORD', default=''),
+        'HOST': config('DB_HOST', default=''),
+        'PORT': config('DB_PORT', default=''),
+        'CONN_HEALTH_CHECKS': True,
+    }
+    if config('DB_POOL', default=False, cast=bool):
+        # Pool de connexions de Django (psycopg[pool]), incompatible avec CONN_MAX_AGE
+        _postgres['CONN_MAX_AGE'] = 0
+        _postgres['OPTIONS'] = {'pool': {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+        }}
+    else:
+        # Connexions persistantes, une par thread
+        _postgres['CONN_MAX_AGE'] = config('DB_CONN_MAX_AGE', default=60, cast=int)
+    DATABASES = {'default': _postgres}
+
+    # Réplique en lecture pour les vues en lecture seule (voir apps/social/routers.py)
+    if config('DB_REPLICA_HOST', default=''):
+        DATABASES['replica'] = {
+            **_postgres,
+            'HOST': config('DB_REPLICA_HOST'),
+            'PORT': config('DB_REPLICA_PORT', default=_postgres['PORT']),
+            'TEST': {'MIRROR': 'default'},
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+            'OPTIONS': {
+                # Verrou d'écriture pris dès le BEGIN : une transaction attend (timeout, en
+                # secondes) au lieu d'échouer en « database is locked » en cours de route
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': config('DB_SQLITE_TIMEOUT', default=20, cast=int),
+                # Réglages de connexion uniquement : le mode WAL est persistant dans le
+                # fichier et s'active une fois par `manage.py sqlite_wal`
+                'init_command': (
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA mmap_size=134217728;'
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA temp_store=MEMORY'
+                ),
+            },
+        }
     }
-}
+
+DATABASE_ROUTERS = ['apps.social.routers.ReplicaRouter']
+# Après une écriture, durée (secondes) pendant laquelle le visiteur lit sur `default`
+DATABASE_REPLICA_PIN_SECONDS = 5
 
 
 # Password validation
@@ -192,6 +266,66 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:3000",
 ]
 
+# Fil d'actualités matérialisé (fan-out à l'écriture)
+# Au-delà de ce nombre d'abonnés, les posts d'un auteur sont lus à la volée
+TIMELINE_FANOUT_THRESHOLD = 5000
+# Nombre de posts récents d'un auteur ajoutés au fil lors d'un nouvel abonnement
+TIMELINE_BACKFILL_PER_AUTHOR = 50
+
+# Compteurs d'engagement (écriture différée, voir apps/social/counters.py)
+# Durée de vie en cache des valeurs à jour ; `manage.py flush_counters` agrège les deltas
+COUNTER_CACHE_TIMEOUT = 300
+
+# Recherche plein texte (FTS5 sous SQLite, tsvector sous PostgreSQL)
+# SEARCH_BACKEND = 'apps.social.search.LikeSearchBackend'  # pour forcer un backend
+
+# Tendances : fenêtre glissante (minutes) et fréquence de lecture des posts des autres processus
+TRENDING_WINDOW_MINUTES = 24 * 60
+TRENDING_SYNC_SECONDS = 30
+
+# Suggestions « vous connaissez peut-être » : candidats conservés par utilisateur
+# (`manage.py compute_suggestions` pour un recalcul complet)
+SUGGESTIONS_PER_USER = 20
+
+# Index en mémoire du graphe d'abonnements (par processus)
+# Durée de validité d'une liste d'adjacence et nombre maximal d'utilisateurs gardés
+FOLLOW_GRAPH_TTL = 30
+FOLLOW_GRAPH_MAX_USERS = 100000
+
+# Chat : nombre de messages affichés à l'ouverture et par page d'historique
+CHAT_HISTORY_PAGE_SIZE = 30
+# Écriture groupée des messages et accusés du chat (délai d'attente et taille maximale d'un lot)
+CHAT_WRITER_DELAY_MS = 5
+CHAT_WRITER_MAX_BATCH = 200
+
+# Notifications : durée de vie du compteur de non lues en cache (recompté ensuite)
+NOTIFICATION_COUNT_CACHE_TIMEOUT = 24 * 3600
+# Regroupement des notifications de même nature sur la même cible (en heures)
+NOTIFICATION_GROUP_WINDOW_HOURS = 24
+
+# Outbox : effets de bord exécutés hors requête par `manage.py process_outbox --interval 1`
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_DELAY_SECONDS = 2  # doublé à chaque essai
+OUTBOX_LEASE_SECONDS = 300
+OUTBOX_RETENTION_DAYS = 7
+
+# Flux d'événements : consommateurs lancés par `manage.py consume_events --interval 1`
+EVENT_CONSUMERS = [
+    'apps.posts.timeline.TimelineConsumer',
+]
+EVENT_BATCH_SIZE = 500
+EVENT_GAP_TIMEOUT_SECONDS = 30  # au-delà, un id manquant est considéré comme annulé
+EVENT_RETENTION_DAYS = 30
+
+# API : nombre de commentaires de premier niveau inclus dans chaque post d'une liste
+POST_COMMENT_PREVIEW_SIZE = 3
+# Arbres de commentaires : profondeur et nombre de réponses par branche avant « voir plus »
+COMMENT_TREE_MAX_DEPTH = 3
+COMMENT_TREE_REPLIES_PER_BRANCH = 5
+# API : objets lus par requête dans les exports en flux (`?export=1`)
+API_EXPORT_CHUNK_SIZE = 500
+
 # Email Configuration (pour les notifications par email)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 